@@ -0,0 +1,238 @@
+# -*- coding: utf-8 -*-
+# ###
+# Copyright (c) 2026, Rice University
+# This software is subject to the provisions of the GNU Affero General
+# Public License version 3 (AGPLv3).
+# See LICENCE.txt for details.
+# ###
+"""An in-process stand-in for psycopg2 connections, to time dbmigrator
+without the database.
+
+It keeps schema_migrations in memory and answers the statements dbmigrator
+runs on it.  Any other statement, e.g. the statements of the migrations,
+does nothing and returns no rows.
+"""
+
+from contextlib import contextmanager
+import datetime
+import hashlib
+import re
+
+import psycopg2
+
+
+__all__ = ('FakeDatabase',)
+
+
+COLUMNS = ('version', 'applied', 'duration', 'checksum', 'host', 'db_time',
+           'row_count', 'peak_memory')
+
+
+def _normalize(query):
+    if not isinstance(query, str):
+        # e.g. psycopg2.sql.Composed, which needs a real connection
+        query = repr(query)
+    return ' '.join(query.split())
+
+
+class FakeCursor(object):
+    def __init__(self, connection):
+        self.connection = connection
+        self.description = None
+        self.rowcount = -1
+        self._rows = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        pass
+
+    def _result(self, rows, description=None):
+        self._rows = list(rows)
+        self.rowcount = len(self._rows)
+        self.description = description
+
+    def execute(self, query, params=None):
+        query = _normalize(query)
+        self._result([])
+        for pattern, method in self.connection.database.statements:
+            m = re.match(pattern, query)
+            if m:
+                method(self, params, *m.groups())
+                return
+
+    def executemany(self, query, params_seq):
+        for params in params_seq:
+            self.execute(query, params)
+
+    def callproc(self, name, params=None):
+        self._result([])
+
+    def fetchone(self):
+        if self._rows:
+            return self._rows.pop(0)
+
+    def fetchall(self):
+        rows, self._rows = self._rows, []
+        return rows
+
+    def __iter__(self):
+        return iter(self.fetchall())
+
+
+class FakeConnection(object):
+    closed = False
+    autocommit = False
+
+    def __init__(self, database):
+        self.database = database
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, *args):
+        if exc_type is None:
+            self.commit()
+        else:
+            self.rollback()
+
+    def cursor(self):
+        return FakeCursor(self)
+
+    def commit(self):
+        self.database.commits += 1
+
+    def rollback(self):
+        pass
+
+    def reset(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+
+class FakeDatabase(object):
+    """A database with (or without) a schema_migrations table."""
+
+    def __init__(self):
+        self.table = None
+        self.commits = 0
+        self.statements = (
+            (r'SELECT \* FROM schema_migrations ORDER BY (\w+)$',
+             FakeDatabase._select),
+            (r'SELECT count\(DISTINCT version\)', FakeDatabase._fingerprint),
+            (r'UPDATE schema_migrations SET applied = (\w+)',
+             FakeDatabase._update),
+            (r'INSERT INTO schema_migrations \(version, applied.*VALUES '
+             r'\([^,]+, (\w+)', FakeDatabase._insert),
+            (r'INSERT INTO schema_migrations \(version\)()',
+             FakeDatabase._insert),
+            (r'DELETE FROM schema_migrations WHERE version',
+             FakeDatabase._delete),
+            (r'CREATE TABLE schema_migrations', FakeDatabase._create),
+            (r'SELECT obj_description', FakeDatabase._bookkeeping_version),
+            (r'SELECT pg_(try_)?advisory_(un)?lock', FakeDatabase._true),
+            (r'SHOW ', FakeDatabase._show),
+            )
+
+    def connect(self, *args, **kwargs):
+        return FakeConnection(self)
+
+    @contextmanager
+    def installed(self):
+        """Make psycopg2.connect return connections to this database."""
+        connect = psycopg2.connect
+        psycopg2.connect = self.connect
+        try:
+            yield self
+        finally:
+            psycopg2.connect = connect
+
+    def _check_table(self):
+        if self.table is None:
+            raise psycopg2.ProgrammingError(
+                'relation "schema_migrations" does not exist')
+
+    @staticmethod
+    def _select(cursor, params, order_by):
+        self = cursor.connection.database
+        self._check_table()
+        rows = sorted(self.table.values(),
+                      key=lambda row: (row[COLUMNS.index(order_by)] is None,
+                                       row[COLUMNS.index(order_by)]))
+        cursor._result(rows, [(c,) for c in COLUMNS])
+
+    @staticmethod
+    def _fingerprint(cursor, params):
+        self = cursor.connection.database
+        self._check_table()
+        versions = sorted(self.table)
+        cursor._result([(len(versions), versions and versions[-1] or None,
+                         hashlib.md5(','.join(versions).encode('utf-8'))
+                         .hexdigest())])
+
+    @staticmethod
+    def _applied(value):
+        if value == 'NULL':
+            return None
+        return datetime.datetime.now()
+
+    @staticmethod
+    def _update(cursor, params, applied):
+        self = cursor.connection.database
+        self._check_table()
+        row = self.table.get(params['version'])
+        if row is None:
+            cursor._result([])
+            return
+        row[1] = FakeDatabase._applied(applied)
+        for column, value in params.items():
+            row[COLUMNS.index(column)] = value
+        cursor._result([(row[1],)])
+
+    @staticmethod
+    def _insert(cursor, params, applied):
+        self = cursor.connection.database
+        self._check_table()
+        if isinstance(params, dict):
+            version = params['version']
+        else:
+            version = params[0]
+        row = [version, FakeDatabase._applied(applied or 'now')] + [None] * 6
+        if isinstance(params, dict):
+            for column, value in params.items():
+                row[COLUMNS.index(column)] = value
+        self.table[version] = row
+        cursor._result([(row[1],)])
+
+    @staticmethod
+    def _delete(cursor, params):
+        self = cursor.connection.database
+        self._check_table()
+        self.table.pop(params[0], None)
+
+    @staticmethod
+    def _create(cursor, params):
+        cursor.connection.database.table = {}
+
+    @staticmethod
+    def _bookkeeping_version(cursor, params):
+        from dbmigrator import utils
+        from dbmigrator.commands.init import BOOKKEEPING_COMMENT
+
+        if cursor.connection.database.table is not None:
+            cursor._result([(BOOKKEEPING_COMMENT.format(
+                utils.BOOKKEEPING_VERSION),)])
+
+    @staticmethod
+    def _true(cursor, params, *groups):
+        cursor._result([(True,)])
+
+    @staticmethod
+    def _show(cursor, params):
+        cursor._result([('0',)])
@@ -0,0 +1,226 @@
+# -*- coding: utf-8 -*-
+# ###
+# Copyright (c) 2026, Rice University
+# This software is subject to the provisions of the GNU Affero General
+# Public License version 3 (AGPLv3).
+# See LICENCE.txt for details.
+# ###
+"""Time the dbmigrator commands with synthetic migrations directories of
+growing sizes, against PostgreSQL or an in-process fake database.
+
+    $ python benchmarks/run.py --sizes 100,1000,10000 -o before.json
+    $ python benchmarks/run.py --sizes 100,1000,10000 --compare before.json
+
+See benchmarks/README.rst.
+"""
+
+from __future__ import print_function
+import argparse
+from contextlib import contextmanager
+import json
+import math
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+import fakedb
+import synthetic
+
+
+here = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(here))
+
+from dbmigrator import __version__, cli, utils  # noqa: E402
+
+
+def _scenario(versions):
+    """Return the steps of a run, (name, dbmigrator arguments), in order,
+    for a migrations directory with ``versions``.
+    """
+    last = versions[-1]
+    return [
+        ('init', ['init', '--version', '0']),
+        ('status (all pending)', ['status']),
+        ('status --check (all pending)', ['status', '--check']),
+        ('migrate (all pending)', ['migrate']),
+        ('list', ['list']),
+        ('list --stats', ['list', '--stats']),
+        ('status', ['status']),
+        ('status --check', ['status', '--check']),
+        ('mark', ['mark', '-f', last]),
+        ('migrate (one pending)', ['migrate']),
+        ('rollback', ['rollback']),
+        ('migrate --run-deferred', ['migrate', '--run-deferred']),
+        ('generate', ['generate', 'benchmark']),
+        ]
+
+
+@contextmanager
+def _quiet():
+    with open(os.devnull, 'w') as devnull:
+        stdout, sys.stdout = sys.stdout, devnull
+        try:
+            yield
+        finally:
+            sys.stdout = stdout
+
+
+@contextmanager
+def _backend(db_connection_string):
+    if db_connection_string is None:
+        database = fakedb.FakeDatabase()
+        with database.installed():
+            yield 'fake', 'dbname=fake'
+        return
+    with utils.db_connect(db_connection_string) as db_conn:
+        with db_conn.cursor() as cursor:
+            cursor.execute('DROP TABLE IF EXISTS schema_migrations')
+    yield 'postgresql', db_connection_string
+
+
+def run_size(size, db_connection_string, commands=None):
+    """Time the scenario for ``size`` migrations and return the results,
+    [(step, seconds)].
+    """
+    tmp_dir = tempfile.mkdtemp()
+    cache_dir = os.path.join(tmp_dir, 'cache')
+    migrations_directory = os.path.join(tmp_dir, 'migrations')
+    environ = dict(os.environ)
+    os.environ['DBMIGRATOR_CACHE_DIR'] = cache_dir
+    results = []
+    try:
+        versions = synthetic.generate_tree(migrations_directory, size)
+
+        # discovery with and without the manifest
+        for name in ('discovery (cold)', 'discovery (warm)'):
+            start = time.time()
+            list(utils.get_migrations([migrations_directory],
+                                      import_modules=True))
+            results.append((name, time.time() - start))
+
+        with _backend(db_connection_string) as (backend, dsn):
+            args = ['-q', '--db-connection-string', dsn,
+                    '--migrations-directory', migrations_directory,
+                    '--schema-diff', 'off']
+            for name, argv in _scenario(versions):
+                start = time.time()
+                with _quiet():
+                    cli.main(args + argv)
+                # every step runs, each depends on the ones before
+                if not commands or argv[0] in commands:
+                    results.append((name, time.time() - start))
+    finally:
+        os.environ.clear()
+        os.environ.update(environ)
+        shutil.rmtree(tmp_dir)
+    return backend, results
+
+
+def _git_revision():
+    try:
+        return subprocess.check_output(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=here,
+            stderr=subprocess.STDOUT).decode('utf-8').strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _slope(points):
+    """Return the slope of log(seconds) over log(size), e.g. 1 if the time
+    grows linearly with the number of migrations.
+    """
+    points = [(s, t) for s, t in points if t > 0]
+    if len(points) < 2:
+        return None
+    (s0, t0), (s1, t1) = points[0], points[-1]
+    return math.log(t1 / t0) / math.log(float(s1) / s0)
+
+
+def report(run, compare=None):
+    sizes = sorted(set(r['size'] for r in run['results']))
+    steps = []
+    for r in run['results']:
+        if r['step'] not in steps:
+            steps.append(r['step'])
+    times = dict(((r['step'], r['size']), r['seconds'])
+                 for r in run['results'])
+    old_times = {}
+    if compare:
+        old_times = dict(((r['step'], r['size']), r['seconds'])
+                         for r in compare['results'])
+
+    print('{} backend, dbmigrator {} ({})'.format(
+        run['backend'], run['version'], run['revision']))
+    print('{:<30}'.format('seconds') +
+          ''.join('{:>18}'.format(size) for size in sizes) + '   slope')
+    for step in steps:
+        line = '{:<30}'.format(step)
+        for size in sizes:
+            seconds = times.get((step, size))
+            cell = '' if seconds is None else '{:.3f}'.format(seconds)
+            old = old_times.get((step, size))
+            if seconds is not None and old:
+                cell += ' ({:+.0f}%)'.format((seconds - old) / old * 100)
+            line += '{:>18}'.format(cell)
+        slope = _slope([(size, times[step, size]) for size in sizes
+                        if (step, size) in times])
+        line += '   {}'.format('' if slope is None else '{:.2f}'.format(slope))
+        print(line)
+
+
+def main(argv=sys.argv[1:]):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--sizes', default='100,1000,10000',
+                        help='The numbers of migrations, comma separated, '
+                             'default 100,1000,10000')
+    parser.add_argument('--db-connection-string',
+                        help='Run against this PostgreSQL database (its '
+                             'schema_migrations table is dropped) instead '
+                             'of the fake database')
+    parser.add_argument('--repeat', type=int, default=3,
+                        help='Run each size REPEAT times and keep the '
+                             'fastest time of each step, default 3')
+    parser.add_argument('--command', action='append', dest='commands',
+                        help='Only show the times of COMMAND (repeatable)')
+    parser.add_argument('-o', '--output',
+                        help='Save the results to OUTPUT as json')
+    parser.add_argument('--compare', metavar='FILE',
+                        help='Show the changes from the results in FILE')
+    args = parser.parse_args(argv)
+
+    run = {
+        'version': __version__,
+        'revision': _git_revision(),
+        'python': platform.python_version(),
+        'repeat': args.repeat,
+        'results': [],
+        }
+    for size in [int(s) for s in args.sizes.split(',')]:
+        # the fastest of the runs, the least disturbed by everything else
+        fastest = {}
+        for i in range(args.repeat):
+            backend, results = run_size(size, args.db_connection_string,
+                                        args.commands)
+            for step, seconds in results:
+                fastest[step] = min(seconds, fastest.get(step, seconds))
+        run['backend'] = backend
+        run['results'].extend({'size': size, 'step': step,
+                               'seconds': fastest[step]}
+                              for step, _ in results)
+
+    compare = None
+    if args.compare:
+        with open(args.compare) as f:
+            compare = json.load(f)
+    report(run, compare)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(run, f, indent=2, sort_keys=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,73 @@
+# -*- coding: utf-8 -*-
+# ###
+# Copyright (c) 2026, Rice University
+# This software is subject to the provisions of the GNU Affero General
+# Public License version 3 (AGPLv3).
+# See LICENCE.txt for details.
+# ###
+"""Time how long dbmigrator takes to start, before any database work.
+
+Each command line is run ``--repeat`` times in a new python process, and the
+fastest and median times are shown::
+
+    $ python benchmarks/startup.py --context mypackage
+"""
+
+from __future__ import print_function
+import argparse
+import subprocess
+import sys
+import time
+
+
+RUN_CLI = 'import sys; from dbmigrator.cli import main; main(sys.argv[1:])'
+RESOLVE_ENTRY_POINTS = ('import sys; from dbmigrator import utils; '
+                        'utils.get_settings_from_entry_points({}, '
+                        'sys.argv[1:])')
+
+COMMAND_LINES = (
+    ['-V'],
+    ['-h'],
+    ['migrate', '-h'],
+    )
+
+
+def time_python(code, argv, repeat):
+    """Return the sorted times of running ``code`` with ``argv`` in a new
+    python process ``repeat`` times.
+    """
+    times = []
+    for i in range(repeat):
+        start = time.time()
+        subprocess.call([sys.executable, '-c', code] + argv,
+                        stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        times.append(time.time() - start)
+    return sorted(times)
+
+
+def report(name, times):
+    print('{:<40} min {:7.1f}ms  median {:7.1f}ms'.format(
+        name, times[0] * 1000, times[len(times) // 2] * 1000))
+
+
+def main(argv=sys.argv[1:]):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--repeat', type=int, default=10)
+    parser.add_argument('--context', action='append', default=[],
+                        help='Also time reading the settings of CONTEXT '
+                             'from its entry points')
+    args = parser.parse_args(argv)
+
+    # python itself, for comparison
+    report('python', time_python('pass', [], args.repeat))
+    for command_line in COMMAND_LINES:
+        report('dbmigrator {}'.format(' '.join(command_line)),
+               time_python(RUN_CLI, command_line, args.repeat))
+    if args.context:
+        # the first run caches the settings, see dbmigrator.entry_points
+        report('entry points of {}'.format(', '.join(args.context)),
+               time_python(RESOLVE_ENTRY_POINTS, args.context, args.repeat))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,84 @@
+# -*- coding: utf-8 -*-
+# ###
+# Copyright (c) 2026, Rice University
+# This software is subject to the provisions of the GNU Affero General
+# Public License version 3 (AGPLv3).
+# See LICENCE.txt for details.
+# ###
+"""Generate a migrations directory with any number of migrations, a mix of
+plain, repeat and deferred migrations.
+"""
+
+import datetime
+import os
+
+
+PLAIN = '''\
+# -*- coding: utf-8 -*-
+
+
+def up(cursor):
+    cursor.execute('SELECT {n}')
+
+
+def down(cursor):
+    cursor.execute('SELECT -{n}')
+'''
+
+REPEAT = '''\
+# -*- coding: utf-8 -*-
+
+
+def should_run(cursor):
+    return True
+
+
+def up(cursor):
+    cursor.execute('SELECT {n}')
+
+
+def down(cursor):
+    pass
+'''
+
+DEFERRED = '''\
+# -*- coding: utf-8 -*-
+
+from dbmigrator import deferred
+
+
+@deferred
+def up(cursor):
+    cursor.execute('SELECT {n}')
+
+
+def down(cursor):
+    pass
+'''
+
+# The first version, versions are a second apart
+START = datetime.datetime(2015, 1, 1)
+
+
+def generate_tree(directory, count, repeat_every=20, deferred_every=20):
+    """Write ``count`` migrations to ``directory``, one in ``repeat_every``
+    a repeat migration and one in ``deferred_every`` a deferred migration
+    (none if 0).  Return the versions.
+    """
+    if not os.path.isdir(directory):
+        os.makedirs(directory)
+    versions = []
+    for n in range(count):
+        version = (START + datetime.timedelta(seconds=n)).strftime(
+            '%Y%m%d%H%M%S')
+        if repeat_every and n % repeat_every == repeat_every - 1:
+            kind, template = 'repeat', REPEAT
+        elif deferred_every and n % deferred_every == deferred_every // 2:
+            kind, template = 'deferred', DEFERRED
+        else:
+            kind, template = 'plain', PLAIN
+        path = os.path.join(directory, '{}_{}_{}.py'.format(version, kind, n))
+        with open(path, 'w') as f:
+            f.write(template.format(n=n))
+        versions.append(version)
+    return versions
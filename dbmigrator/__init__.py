@@ -1,8 +1,10 @@
 # -*- coding: utf-8 -*-
 
-from .utils import logger, super_user, deferred
+from .utils import logger, super_user, deferred, timeouts, batched
+from .bulk import copy_rows
 
 __version__ = '1.1.0'
 
 
-__all__ = ('logger', 'super_user', 'deferred', '__version__')
+__all__ = ('logger', 'super_user', 'deferred', 'timeouts', 'batched',
+           'copy_rows', '__version__')
@@ -0,0 +1,305 @@
+# -*- coding: utf-8 -*-
+# ###
+# Copyright (c) 2026, Rice University
+# This software is subject to the provisions of the GNU Affero General
+# Public License version 3 (AGPLv3).
+# See LICENCE.txt for details.
+# ###
+"""An asyncio API, to migrate the database when an asyncio application
+starts, with a connection of its own psycopg 3 pool (Python 3.7+)::
+
+    from dbmigrator import aio
+
+
+    async def startup(pool):
+        await aio.migrate(pool, ['migrations'])
+        unapplied = await aio.status(pool, ['migrations'])
+
+``pool`` is a ``psycopg_pool.AsyncConnectionPool`` or a
+``psycopg.AsyncConnection``, not in autocommit mode.
+
+The migrations are found and run as with ``dbmigrator migrate``, in a worker
+thread, so their ``up``, ``down`` and ``should_run`` don't change.  The
+cursor they are given sends each statement to the event loop, where it runs
+on the async connection: the database I/O is asynchronous and the event loop
+is never blocked.  Cancelling ``migrate`` cancels the running statement
+(psycopg sends a cancel request to the server), rolls back the migration
+that was running and releases the migration lock.
+
+``super_user()`` opens an async connection too, as ``super_user`` with the
+connection string ``db_connection_string``, by default the one of the
+connection migrating (without its password, so use ``PGPASSWORD`` or a
+``.pgpass`` file, or pass ``db_connection_string``).
+"""
+
+import asyncio
+from contextlib import asynccontextmanager, contextmanager
+import threading
+
+from . import logger, utils
+
+
+__all__ = ('migrate', 'status')
+
+
+class _SyncConnection(object):
+    """A blocking interface to the async connection ``db_conn``, for a worker
+    thread, running the coroutines of ``db_conn`` on ``loop``.
+    """
+
+    def __init__(self, db_conn, loop):
+        self._db_conn = db_conn
+        self._loop = loop
+        self._lock = threading.Lock()
+        self._future = None
+        self._cancelled = False
+        # the connections made with ``connect``
+        self._connections = []
+
+    def run(self, coroutine):
+        """Run ``coroutine`` on the event loop and return its result."""
+        with self._lock:
+            if self._cancelled:
+                coroutine.close()
+                raise asyncio.CancelledError()
+            future = self._future = asyncio.run_coroutine_threadsafe(
+                coroutine, self._loop)
+        try:
+            return future.result()
+        finally:
+            self._future = None
+
+    def cancel(self):
+        """Cancel the running coroutine and the coroutines run after it, on
+        this connection and the connections made with ``connect``.
+        """
+        with self._lock:
+            self._cancelled = True
+            if self._future is not None:
+                self._future.cancel()
+            connections = list(self._connections)
+        for connection in connections:
+            connection.cancel()
+
+    @contextmanager
+    def connect(self, dsn, **kwargs):
+        """Open another async connection, e.g. for ``super_user()``, and
+        commit it at the end of this context, or roll it back on error.
+        """
+        import psycopg
+        db_conn = self.run(psycopg.AsyncConnection.connect(dsn, **kwargs))
+        connection = _SyncConnection(db_conn, self._loop)
+        with self._lock:
+            self._connections.append(connection)
+        if self._cancelled:
+            connection.cancel()
+        try:
+            with utils.get_driver().transaction(connection):
+                yield connection
+        finally:
+            with self._lock:
+                self._connections.remove(connection)
+            # even when cancelled
+            asyncio.run_coroutine_threadsafe(
+                db_conn.close(), self._loop).result()
+
+    @contextmanager
+    def enter(self, manager):
+        """Enter the async context manager ``manager``."""
+        value = self.run(manager.__aenter__())
+        try:
+            yield value
+        except BaseException as e:
+            if not self.run(manager.__aexit__(type(e), e, e.__traceback__)):
+                raise
+        else:
+            self.run(manager.__aexit__(None, None, None))
+
+    @property
+    def closed(self):
+        return self._db_conn.closed
+
+    def commit(self):
+        self.run(self._db_conn.commit())
+
+    def rollback(self):
+        self.run(self._db_conn.rollback())
+
+    def cursor(self):
+        import psycopg
+        return _SyncCursor(self, psycopg.AsyncClientCursor(self._db_conn))
+
+    def pipeline(self):
+        return self.enter(self._db_conn.pipeline())
+
+    def __getattr__(self, name):
+        return getattr(self._db_conn, name)
+
+
+class _SyncCopy(object):
+    def __init__(self, connection, copy):
+        self._connection = connection
+        self._copy = copy
+
+    def write(self, data):
+        self._connection.run(self._copy.write(data))
+
+
+class _SyncCursor(object):
+    """A blocking interface to the async cursor ``cursor``."""
+
+    def __init__(self, connection, cursor):
+        self.connection = connection
+        self._cursor = cursor
+
+    def execute(self, query, vars=None):
+        self.connection.run(self._cursor.execute(query, vars))
+
+    def executemany(self, query, vars_list):
+        self.connection.run(self._cursor.executemany(query, vars_list))
+
+    def fetchone(self):
+        return self.connection.run(self._cursor.fetchone())
+
+    def fetchmany(self, size=0):
+        return self.connection.run(self._cursor.fetchmany(size))
+
+    def fetchall(self):
+        return self.connection.run(self._cursor.fetchall())
+
+    @contextmanager
+    def copy(self, statement):
+        with self.connection.enter(self._cursor.copy(statement)) as copy:
+            yield _SyncCopy(self.connection, copy)
+
+    def close(self):
+        self.connection.run(self._cursor.close())
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __iter__(self):
+        return iter(self.fetchall())
+
+    def __getattr__(self, name):
+        # e.g. description, rowcount, mogrify
+        return getattr(self._cursor, name)
+
+
+@asynccontextmanager
+async def _connection(pool):
+    import psycopg
+    if isinstance(pool, psycopg.AsyncConnection):
+        yield pool
+        return
+    async with pool.connection() as db_conn:
+        yield db_conn
+
+
+async def _run_in_thread(db_conn, func, *args, **settings):
+    """Return ``func(cursor, *args)``, run in a worker thread with a cursor
+    of the async connection ``db_conn`` and ``settings`` (see
+    ``utils.get_settings``).  If cancelled, cancel the running statement and
+    wait for ``func`` to stop.
+    """
+    if db_conn.autocommit:
+        raise Exception('The connection must not be in autocommit mode')
+    loop = asyncio.get_running_loop()
+    connection = _SyncConnection(db_conn, loop)
+    settings = dict(utils.get_settings(), **dict(
+        (name, value) for name, value in settings.items()
+        if value is not None))
+    if not settings.get('db_connection_string'):
+        settings['db_connection_string'] = db_conn.info.dsn
+    wrappers = list(utils.cursor_wrappers())
+
+    def run():
+        with utils.thread_driver('psycopg'), \
+                utils.thread_settings(settings, connection.connect), \
+                utils.thread_cursor_wrappers(wrappers):
+            return func(connection.cursor(), *args)
+
+    future = loop.run_in_executor(None, run)
+    try:
+        return await asyncio.shield(future)
+    except asyncio.CancelledError:
+        connection.cancel()
+        # the connection is used until func stops
+        await asyncio.wait([future])
+        if not future.cancelled():
+            future.exception()
+        raise
+
+
+async def _reset(db_conn):
+    """Roll back ``db_conn`` and release the migration lock, if it holds it.
+    """
+    import psycopg
+    await db_conn.rollback()
+    async with psycopg.AsyncClientCursor(db_conn) as cursor:
+        await cursor.execute(
+            'SELECT pg_advisory_unlock(%s) FROM pg_locks '
+            'WHERE pid = pg_backend_pid() AND locktype = %s '
+            'AND (classid::bigint << 32 | objid::bigint) = %s',
+            (utils.MIGRATION_LOCK_KEY, 'advisory', utils.MIGRATION_LOCK_KEY))
+    await db_conn.commit()
+
+
+def _migrate(cursor, migrations_directories, version, run_deferred,
+             lock_wait_timeout):
+    migrated = []
+    with utils.migration_lock(cursor, lock_wait_timeout):
+        state = utils.MigrationState.load(cursor)
+        for migration_version, migration_name, migration in \
+                utils.get_pending_migrations(
+                    migrations_directories, cursor, import_modules=True,
+                    up_to_version=version, include_defers=True,
+                    state=state):
+            if utils.run_migration(cursor, migration_version,
+                                   migration_name, migration, run_deferred,
+                                   state=state) is not None:
+                migrated.append((migration_version, migration_name))
+    if not migrated:
+        logger.info('No pending migrations.  Database is up to date.')
+    return migrated
+
+
+async def migrate(pool, migrations_directories, version=None,
+                  run_deferred=False, lock_wait_timeout=None,
+                  super_user=None, db_connection_string=None):
+    """Run the pending migrations, up to ``version`` if given, as
+    ``dbmigrator migrate``, with a connection of ``pool``.  Return the
+    (version, migration_name) of the migrations run.
+
+    ``super_user()`` connects as ``super_user`` ("postgres" by default) to
+    ``db_connection_string``, by default the database of ``pool``.
+    """
+    async with _connection(pool) as db_conn:
+        try:
+            return await _run_in_thread(
+                db_conn, _migrate, migrations_directories, version,
+                run_deferred, lock_wait_timeout, super_user=super_user,
+                db_connection_string=db_connection_string)
+        except BaseException:
+            await _reset(db_conn)
+            raise
+
+
+def _status(cursor, migrations_directories):
+    return [(version, migration_name) for version, migration_name, _ in
+            utils.get_unapplied_migrations(migrations_directories, cursor)]
+
+
+async def status(pool, migrations_directories):
+    """Return the (version, migration_name) of the migrations ``migrate``
+    would run, as ``dbmigrator status``, with a connection of ``pool``.
+    """
+    async with _connection(pool) as db_conn:
+        try:
+            return await _run_in_thread(db_conn, _status,
+                                        migrations_directories)
+        finally:
+            await db_conn.rollback()
@@ -0,0 +1,98 @@
+# -*- coding: utf-8 -*-
+# ###
+# Copyright (c) 2026, Rice University
+# This software is subject to the provisions of the GNU Affero General
+# Public License version 3 (AGPLv3).
+# See LICENCE.txt for details.
+# ###
+"""Baselines: the schema and seed data of a database migrated up to a
+version, written by ``dbmigrator squash`` and loaded by
+``dbmigrator init --baseline``.
+
+A baseline is a SQL file from pg_dump, starting with a comment holding the
+versions it contains::
+
+    -- dbmigrator baseline {"version": "20170810093842", ...}
+"""
+
+import io
+import json
+import re
+import subprocess
+
+from . import utils
+
+
+__all__ = ('write_baseline', 'read_baseline', 'load_baseline')
+
+
+HEADER = '-- dbmigrator baseline '
+
+# The tables of dbmigrator, which are never part of a baseline
+EXCLUDED_TABLES = ('schema_migrations', 'dbmigrator_checkpoints')
+
+
+# The psql meta-commands added by pg_dump since 17.6 (and 16.10, 15.14...),
+# which cursor.execute can't run
+META_COMMAND = re.compile(r'^\\(un)?restrict [^\n]*\n?', re.MULTILINE)
+
+
+def _strip_meta_commands(statements):
+    return META_COMMAND.sub(u'', statements)
+
+
+def _pg_dump(db_connection_string, *options):
+    return _strip_meta_commands(subprocess.check_output(
+        ['pg_dump', '--no-owner'] + list(options) +
+        [db_connection_string]).decode('utf-8'))
+
+
+def write_baseline(path, db_connection_string, version, state,
+                   data_tables=()):
+    """Write the schema of the database and the rows of ``data_tables`` to
+    ``path``, as the baseline of the versions up to ``version`` in
+    ``state``, a ``utils.MigrationState``.
+    """
+    versions = sorted(v for v in state if v <= version)
+    header = {
+        'version': version,
+        'versions': [v for v in versions if state[v] is not None],
+        'deferred': [v for v in versions if state[v] is None],
+        }
+    excluded = []
+    for table in EXCLUDED_TABLES:
+        excluded.extend(['--exclude-table', table])
+    schema = _pg_dump(db_connection_string, '--schema-only', *excluded)
+    data = ''
+    if data_tables:
+        tables = []
+        for table in data_tables:
+            tables.extend(['--table', table])
+        # INSERT statements instead of COPY, so cursor.execute can run it
+        data = _pg_dump(db_connection_string, '--data-only', '--inserts',
+                        *tables)
+    with io.open(path, 'w', encoding='utf-8') as f:
+        f.write(u'{}{}\n'.format(HEADER, json.dumps(header, sort_keys=True)))
+        f.write(schema)
+        f.write(data)
+    return header
+
+
+def read_baseline(path):
+    """Return the header of the baseline at ``path`` and its SQL."""
+    with io.open(path, encoding='utf-8') as f:
+        first_line = f.readline()
+        if not first_line.startswith(HEADER):
+            raise Exception('{} is not a dbmigrator baseline'.format(path))
+        return json.loads(first_line[len(HEADER):]), f.read()
+
+
+def load_baseline(cursor, path):
+    """Run the baseline at ``path`` and return its header."""
+    header, statements = read_baseline(path)
+    utils.logger.info('Loading baseline up to {}'.format(header['version']))
+    # baselines written before the meta-commands were removed
+    cursor.execute(_strip_meta_commands(statements))
+    # pg_dump changes the search_path and other settings of the session
+    cursor.execute('RESET ALL')
+    return header
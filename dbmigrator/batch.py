@@ -0,0 +1,150 @@
+# -*- coding: utf-8 -*-
+# ###
+# Copyright (c) 2026, Rice University
+# This software is subject to the provisions of the GNU Affero General
+# Public License version 3 (AGPLv3).
+# See LICENCE.txt for details.
+# ###
+"""Change a large table in batches, committing after each batch, so locks
+are held briefly and an interrupted migration resumes where it stopped.
+
+For example, in a migration::
+
+    from dbmigrator import batch
+
+
+    def up(cursor):
+        batch.backfill(cursor, 'users', '''
+            UPDATE users SET email = lower(email)
+            WHERE id BETWEEN %(start)s AND %(end)s''')
+
+The rows are visited in order of ``key``, which should be unique and
+indexed.  After each batch, the last key is saved in the
+dbmigrator_checkpoints table, in the same transaction as the batch, as the
+checkpoint of the migration and the table.
+"""
+
+import time
+
+from . import utils
+
+
+__all__ = ('backfill',)
+
+
+CHECKPOINT_TABLE = 'dbmigrator_checkpoints'
+
+
+def _create_checkpoint_table(cursor):
+    cursor.execute("""\
+        CREATE TABLE IF NOT EXISTS {} (
+            name TEXT PRIMARY KEY,
+            last_key TEXT NOT NULL,
+            row_count BIGINT NOT NULL,
+            updated TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
+        )""".format(CHECKPOINT_TABLE))
+
+
+def _get_checkpoint(cursor, name):
+    cursor.execute('SELECT last_key, row_count FROM {} WHERE name = %s'
+                   .format(CHECKPOINT_TABLE), (name,))
+    row = cursor.fetchone()
+    if row is None:
+        return None, 0
+    return row
+
+
+def _set_checkpoint(cursor, name, last_key, row_count):
+    checkpoint = {'name': name, 'last_key': last_key, 'row_count': row_count}
+    cursor.execute("""\
+        UPDATE {} SET last_key = %(last_key)s, row_count = %(row_count)s,
+                      updated = CURRENT_TIMESTAMP
+        WHERE name = %(name)s""".format(CHECKPOINT_TABLE), checkpoint)
+    if not cursor.rowcount:
+        cursor.execute("""\
+            INSERT INTO {} (name, last_key, row_count)
+            VALUES (%(name)s, %(last_key)s, %(row_count)s)"""
+                       .format(CHECKPOINT_TABLE), checkpoint)
+
+
+def backfill(cursor, table, statement, key='id', batch_size=1000,
+             name=None, progress=None, progress_interval=10):
+    """Run ``statement`` for every batch of ``batch_size`` rows of ``table``
+    ordered by ``key``, committing after each batch.  Return the number of
+    rows visited.
+
+    ``statement`` is either SQL run with the parameters ``start`` and
+    ``end``, the first and last key of the batch, or a function called with
+    ``(cursor, start, end)``.
+
+    The checkpoint is saved as ``name``, by default the version of the
+    migration running and ``table``, e.g. "20160107200351 users", and
+    removed once all the rows have been visited.  Every ``progress_interval``
+    seconds and at the end, the progress is logged and
+    ``progress(row_count, rows_per_second)`` is called if given.
+
+    This commits, so it can't be used with ``migrate --single-transaction``,
+    ``--plan`` or timeouts, see ``utils.forbid_commits``.
+    """
+    utils.check_commit('batch.backfill')
+    if name is None:
+        version = utils.current_migration()
+        if version is None:
+            raise Exception('backfill needs a name outside of a migration')
+        name = '{} {}'.format(version, table)
+    sql = utils.get_driver().sql
+    select_batch = sql.SQL("""\
+        SELECT min(k), max(k), count(*) FROM (
+            SELECT {key} AS k FROM {table} {where}
+            ORDER BY {key} LIMIT %(batch_size)s) batch""")
+    parameters = {
+        'key': utils.sql_identifier(key),
+        'table': utils.sql_identifier(table),
+        }
+    first_batch = select_batch.format(where=sql.SQL(''), **parameters)
+    next_batch = select_batch.format(
+        where=sql.SQL('WHERE {key} > %(last_key)s').format(**parameters),
+        **parameters)
+
+    _create_checkpoint_table(cursor)
+    last_key, row_count = _get_checkpoint(cursor, name)
+    if last_key is not None:
+        utils.logger.info('Resuming {} after {} ({} rows)'.format(
+            name, last_key, row_count))
+
+    start_time = last_report = time.time()
+    start_row_count = row_count
+
+    def report():
+        elapsed = time.time() - start_time
+        rate = elapsed and (row_count - start_row_count) / elapsed or 0
+        utils.logger.info('{}: {} rows, {:.0f} rows/s'.format(
+            name, row_count, rate))
+        if progress is not None:
+            progress(row_count, rate)
+
+    while True:
+        cursor.execute(last_key is None and first_batch or next_batch,
+                       {'last_key': last_key, 'batch_size': batch_size})
+        start, end, count = cursor.fetchone()
+        if not count:
+            break
+        if callable(statement):
+            statement(cursor, start, end)
+        else:
+            cursor.execute(statement, {'start': start, 'end': end})
+        last_key = str(end)
+        row_count += count
+        _set_checkpoint(cursor, name, last_key, row_count)
+        cursor.connection.commit()
+        if count < batch_size:
+            break
+        if time.time() - last_report >= progress_interval:
+            report()
+            last_report = time.time()
+
+    cursor.execute('DELETE FROM {} WHERE name = %s'.format(CHECKPOINT_TABLE),
+                   (name,))
+    cursor.connection.commit()
+    report()
+    return row_count
@@ -0,0 +1,190 @@
+# -*- coding: utf-8 -*-
+# ###
+# Copyright (c) 2026, Rice University
+# This software is subject to the provisions of the GNU Affero General
+# Public License version 3 (AGPLv3).
+# See LICENCE.txt for details.
+# ###
+"""Load rows into a table with COPY, e.g. in a data migration::
+
+    from dbmigrator import copy_rows
+
+
+    def up(cursor):
+        copy_rows(cursor, 'users', ({'id': i, 'name': name}
+                                    for i, name in read_users()))
+
+The rows are streamed to the database as they are produced, so only a
+chunk of them is in memory at a time.
+
+Lists and tuples are copied as arrays, dictionaries as json (pass
+``json.dumps(value)`` for a json array), bytes as bytea.
+"""
+
+import binascii
+import json
+
+from . import utils
+
+
+__all__ = ('copy_rows',)
+
+
+# The values copied to bytea columns, str is text in python 2
+BINARY_TYPES = (bytearray, memoryview) + ((bytes,) if bytes is not str else ())
+
+
+def _text_value(value):
+    """Return ``value``, not ``None``, as text."""
+    if isinstance(value, bool):
+        return value and u't' or u'f'
+    if isinstance(value, dict):
+        return json.dumps(value)
+    if isinstance(value, (list, tuple)):
+        return _array_value(value)
+    if isinstance(value, BINARY_TYPES):
+        # the bytea hex format
+        return u'\\x' + binascii.hexlify(bytearray(value)).decode('ascii')
+    return u'{}'.format(value)
+
+
+def _array_value(values):
+    """Return ``values`` as an array literal, e.g. {"a","b",NULL}."""
+    elements = []
+    for value in values:
+        if value is None:
+            elements.append(u'NULL')
+        elif isinstance(value, (list, tuple)):
+            # a multidimensional array
+            elements.append(_array_value(value))
+        else:
+            elements.append(u'"{}"'.format(
+                _text_value(value).replace(u'\\', u'\\\\')
+                .replace(u'"', u'\\"')))
+    return u'{{{}}}'.format(u','.join(elements))
+
+
+def _copy_value(value):
+    """Return ``value`` in the COPY text format."""
+    if value is None:
+        return u'\\N'
+    value = _text_value(value)
+    return (value.replace(u'\\', u'\\\\').replace(u'\t', u'\\t')
+            .replace(u'\n', u'\\n').replace(u'\r', u'\\r'))
+
+
+class _RowStream(object):
+    """A file-like object reading ``rows`` in the COPY text format."""
+
+    def __init__(self, rows, columns):
+        self._rows = rows
+        self._columns = columns
+        self._buffer = b''
+        self.row_count = 0
+
+    def _line(self, row):
+        if isinstance(row, dict):
+            row = [row.get(column) for column in self._columns]
+        self.row_count += 1
+        return (u'\t'.join(_copy_value(v) for v in row) + u'\n'
+                ).encode('utf-8')
+
+    def read(self, size=-1):
+        lines = [self._buffer]
+        length = len(self._buffer)
+        for row in self._rows:
+            line = self._line(row)
+            lines.append(line)
+            length += len(line)
+            if 0 <= size <= length:
+                break
+        data = b''.join(lines)
+        if size < 0:
+            size = len(data)
+        data, self._buffer = data[:size], data[size:]
+        return data
+
+    def readline(self, size=-1):
+        return self.read(size)
+
+
+def copy_rows(cursor, table, rows, columns=None, conflict_columns=None,
+              chunk_size=8192):
+    """Copy ``rows``, an iterable of tuples or dictionaries, into ``table``
+    and return the number of rows copied.
+
+    ``columns`` defaults to the keys of the first row if the rows are
+    dictionaries, or all the columns of the table.  The rows are sent
+    ``chunk_size`` bytes at a time.
+
+    With ``conflict_columns``, the rows are copied into a temporary table
+    first, then inserted into ``table`` updating the rows with the same
+    ``conflict_columns`` (INSERT ... ON CONFLICT, PostgreSQL 9.5+).  Of the
+    rows copied with the same ``conflict_columns``, the last one is used.
+    """
+    rows = iter(rows)
+    try:
+        first_row = next(rows)
+    except StopIteration:
+        return 0
+    if columns is None and isinstance(first_row, dict):
+        columns = sorted(first_row)
+    driver = utils.get_driver()
+    sql = driver.sql
+
+    def chain():
+        yield first_row
+        for row in rows:
+            yield row
+
+    stream = _RowStream(chain(), columns)
+    column_list = sql.SQL('')
+    if columns:
+        column_list = sql.SQL('({})').format(
+            sql.SQL(', ').join(sql.Identifier(c) for c in columns))
+
+    target = utils.sql_identifier(table)
+    if conflict_columns:
+        copy_into = sql.Identifier('dbmigrator_copy_staging')
+        cursor.execute(sql.SQL(
+            'CREATE TEMPORARY TABLE {} (LIKE {} INCLUDING DEFAULTS) '
+            'ON COMMIT DROP').format(copy_into, target))
+    else:
+        copy_into = target
+
+    driver.copy_from(cursor, sql.SQL('COPY {} {} FROM STDIN').format(
+        copy_into, column_list), stream, chunk_size)
+
+    if conflict_columns:
+        if not columns:
+            cursor.execute(sql.SQL('SELECT * FROM {} LIMIT 0')
+                           .format(copy_into))
+            columns = [c[0] for c in cursor.description]
+            column_list = sql.SQL('({})').format(
+                sql.SQL(', ').join(sql.Identifier(c) for c in columns))
+        updates = [c for c in columns if c not in conflict_columns]
+        if updates:
+            on_conflict = sql.SQL('DO UPDATE SET {}').format(
+                sql.SQL(', ').join(
+                    sql.SQL('{0} = EXCLUDED.{0}').format(sql.Identifier(c))
+                    for c in updates))
+        else:
+            on_conflict = sql.SQL('DO NOTHING')
+        # ON CONFLICT can't update a row twice: the last of the rows with
+        # the same conflict_columns wins, the staging rows being in the
+        # order they were copied
+        cursor.execute(sql.SQL(
+            'INSERT INTO {target} {columns} SELECT {select} FROM ('
+            'SELECT DISTINCT ON ({conflict}) * FROM {staging} '
+            'ORDER BY {conflict}, ctid DESC) AS staged '
+            'ON CONFLICT ({conflict}) {on_conflict}').format(
+                target=target, columns=column_list,
+                select=sql.SQL(', ').join(
+                    sql.Identifier(c) for c in columns),
+                staging=copy_into,
+                conflict=sql.SQL(', ').join(
+                    sql.Identifier(c) for c in conflict_columns),
+                on_conflict=on_conflict))
+        cursor.execute(sql.SQL('DROP TABLE {}').format(copy_into))
+
+    return stream.row_count
@@ -12,10 +12,9 @@ import os
 import signal
 import sys
 
-import pkg_resources
-import psycopg2
-
-from . import commands, utils, logger
+from . import (
+    __version__, commands, drivers, profiling, schema, tracing, utils,
+    logger)
 
 
 DEFAULTS = {
@@ -23,12 +22,6 @@ DEFAULTS = {
 
 
 def main(argv=sys.argv[1:]):
-    # psycopg2 / libpq doesn't respond to SIGINT (ctrl-c):
-    # https://github.com/psycopg/psycopg2/issues/333
-    # To get around this problem, using code from:
-    # http://initd.org/psycopg/articles/2014/07/20/cancelling-postgresql-statements-python/ # noqa
-    psycopg2.extensions.set_wait_callback(utils.wait_select_inter)
-
     parser = argparse.ArgumentParser(description='DB Migrator')
 
     parser.add_argument('--verbose', '-v', action='store_true')
@@ -41,7 +34,12 @@ def main(argv=sys.argv[1:]):
     parser.add_argument('--config')
 
     parser.add_argument('--db-connection-string',
-                        help='a psycopg2 db connection string')
+                        help='a libpq db connection string')
+
+    parser.add_argument('--driver',
+                        choices=sorted(drivers.DRIVERS),
+                        help='The database driver, psycopg2 (default) or '
+                             'psycopg (psycopg 3)')
 
     parser.add_argument('--db-config-ini-key',
                         help='the name of the ini key for the db connection '
@@ -59,12 +57,80 @@ def main(argv=sys.argv[1:]):
         default=[],
         help='Name of the python package containing the migrations')
 
-    version = pkg_resources.require('db-migrator')[0].version
-    parser.add_argument('-V', action='version', version=version,
+    parser.add_argument(
+        '--schema-diff',
+        default='full',
+        choices=schema.SCHEMA_DIFF_MODES,
+        help='How migrate and rollback show schema changes: "full" diffs '
+             'every object (default), "touched" only the schemas and tables '
+             'referenced by the migration, "summary" lists the changed '
+             'objects and "off" skips the comparison')
+
+    parser.add_argument(
+        '--lock-wait-timeout',
+        type=float,
+        metavar='SECONDS',
+        help='How long migrate, rollback and mark wait for another '
+             'dbmigrator running on the same database, default forever')
+
+    parser.add_argument(
+        '--lock-timeout',
+        metavar='TIMEOUT',
+        help='The lock_timeout of the migrations, e.g. "5s" or 500 '
+             '(milliseconds), so a migration waiting for a lock fails '
+             'instead of blocking the queries queued behind it')
+
+    parser.add_argument(
+        '--statement-timeout',
+        metavar='TIMEOUT',
+        help='The statement_timeout of the migrations, e.g. "1min" or '
+             '60000 (milliseconds)')
+
+    parser.add_argument(
+        '--retries',
+        type=int,
+        default=0,
+        metavar='N',
+        help='Retry a migration failing on a lock timeout, deadlock or '
+             'serialization failure up to N times, with an exponential '
+             'backoff, default 0')
+
+    parser.add_argument(
+        '--trace-sql',
+        action='store_true',
+        help='Log every statement executed by the migrations with its '
+             'duration, rows and number and size of parameters')
+
+    parser.add_argument(
+        '--slow-statement-ms',
+        type=float,
+        metavar='MS',
+        help='Log the statements executed by the migrations taking at least '
+             'MS milliseconds as warnings')
+
+    parser.add_argument(
+        '--measure-memory',
+        action='store_true',
+        help='Measure the peak memory of each migration with tracemalloc, '
+             'which slows python down, not with migrate --jobs')
+
+    parser.add_argument(
+        '--profile',
+        metavar='DIR',
+        help='Write a cProfile dump and a Chrome trace event timeline of the '
+             'command to DIR')
+
+    parser.add_argument('-V', action='version', version=__version__,
                         help='Show version information')
 
     subparsers = parser.add_subparsers(help='commands')
-    commands.load_cli(subparsers)
+    command_parsers = commands.load_cli(subparsers)
+
+    # Only import the command being run
+    command_name = getattr(parser.parse_known_args(argv)[0],
+                           'command_name', None)
+    if command_name is not None:
+        commands.load_command(command_parsers[command_name], command_name)
 
     args = parser.parse_args(argv)
     args = vars(args)
@@ -112,5 +178,15 @@ def main(argv=sys.argv[1:]):
 
     logger.debug('args: {}'.format(args))
     utils.set_settings(args)
-
-    return args['cmmd'](**args)
+    if args.get('driver'):
+        utils.set_driver(args['driver'])
+    utils.get_driver().install_cancel_handler()
+
+    command = args['cmmd']
+    if args.get('profile'):
+        command = profiling.profiled(command, args['profile'])
+
+    if args.get('trace_sql') or args.get('slow_statement_ms') is not None:
+        with tracing.trace_sql(args['trace_sql'], args['slow_statement_ms']):
+            return command(**args)
+    return command(**args)
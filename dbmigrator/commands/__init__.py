@@ -11,7 +11,7 @@ import os
 import sys
 
 
-__all__ = ('available_commands', 'load_cli')
+__all__ = ('available_commands', 'load_cli', 'load_command')
 
 
 def available_commands():
@@ -40,13 +40,30 @@ def _import_loader(module_name):
 
 
 def load_cli(subparsers):
-    """Given a parser, load the CLI subcommands"""
+    """Given a parser, add a parser for each CLI subcommand, without
+    importing them.  Return the parsers by command name.
+
+    The parsers only know their command's name until the command is loaded
+    with ``load_command``, so only the command being run is imported.
+    """
+    parsers = {}
     for command_name in available_commands():
-        module = '{}.{}'.format(__package__, command_name)
-        loader, description = _import_loader(module)
-        parser = subparsers.add_parser(command_name,
-                                       description=description)
-        command = loader(parser)
-        if command is None:
-            raise RuntimeError('Failed to load "{}".'.format(command_name))
-        parser.set_defaults(cmmd=command)
+        parser = subparsers.add_parser(command_name, add_help=False)
+        parser.set_defaults(command_name=command_name)
+        parsers[command_name] = parser
+    return parsers
+
+
+def load_command(parser, command_name):
+    """Import the CLI subcommand ``command_name`` and add its arguments to
+    its ``parser``.
+    """
+    module = '{}.{}'.format(__package__, command_name)
+    loader, description = _import_loader(module)
+    parser.description = description
+    parser.add_argument('-h', '--help', action='help',
+                        help='show this help message and exit')
+    command = loader(parser)
+    if command is None:
+        raise RuntimeError('Failed to load "{}".'.format(command_name))
+    parser.set_defaults(cmmd=command)
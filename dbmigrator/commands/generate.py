@@ -32,6 +32,13 @@ def cli_command(migration_name='', **kwargs):
 # -*- coding: utf-8 -*-
 
 
+# Uncomment to let "dbmigrator migrate --jobs N" run this migration at the
+# same time as others, after the migrations it depends on and the earlier
+# migrations touching the same objects
+# depends_on = []
+# touches = []
+
+
 # Uncomment should_run if this is a repeat migration
 # def should_run(cursor):
 #     # TODO return True if migration should run
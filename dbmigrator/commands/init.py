@@ -7,38 +7,172 @@
 # ###
 """Initialize schema migrations table."""
 
-from .. import logger, utils
+import re
+
+from .. import baseline as baselines, logger, utils
 
 
 __all__ = ('cli_loader',)
 
 
-@utils.with_cursor
-def cli_command(cursor, migrations_directory='', version=None, **kwargs):
+BOOKKEEPING_COMMENT = 'dbmigrator bookkeeping version {}'
+
+
+def get_bookkeeping_version(cursor):
+    """Return the version of the schema_migrations table, 0 if it doesn't
+    exist and 1 for the original table without a primary key.  Version 2
+    added duration, checksum and host, version 3 db_time, row_count and
+    peak_memory.
+    """
     cursor.execute("""\
-        SELECT 1 FROM information_schema.tables
-        WHERE table_name = 'schema_migrations'""")
-    table_exists = cursor.fetchone()
-    if table_exists:
-        logger.info('Schema migrations already initialized.')
-        return
+        SELECT obj_description(c.oid, 'pg_class') FROM pg_class c
+        WHERE c.oid = to_regclass('schema_migrations')""")
+    row = cursor.fetchone()
+    if row is None:
+        return 0
+    m = re.match(BOOKKEEPING_COMMENT.format(r'(\d+)$'), row[0] or '')
+    if m:
+        return int(m.group(1))
+    return 1
 
+
+def create_table(cursor):
     cursor.execute("""\
         CREATE TABLE schema_migrations (
             version TEXT NOT NULL,
-            applied TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
+            applied TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+            duration INTERVAL,
+            checksum TEXT,
+            host TEXT,
+            db_time INTERVAL,
+            row_count BIGINT,
+            peak_memory BIGINT,
+            CONSTRAINT schema_migrations_pkey PRIMARY KEY (version)
         )""")
-    versions = []
+    cursor.execute("""\
+        CREATE INDEX schema_migrations_applied_idx
+            ON schema_migrations (applied)""")
+    cursor.execute('COMMENT ON TABLE schema_migrations IS %s',
+                   (BOOKKEEPING_COMMENT.format(utils.BOOKKEEPING_VERSION),))
+
+
+def _index_is_valid(cursor, name):
+    cursor.execute("""\
+        SELECT i.indisvalid FROM pg_index i
+        WHERE i.indexrelid = to_regclass(%s)""", (name,))
+    row = cursor.fetchone()
+    return row and row[0]
+
+
+def _create_index_concurrently(cursor, name, statement):
+    if _index_is_valid(cursor, name) is False:
+        # left behind by an interrupted upgrade
+        cursor.execute('DROP INDEX CONCURRENTLY {}'.format(name))
+    if not _index_is_valid(cursor, name):
+        cursor.execute(statement)
+
+
+def upgrade_table(cursor):
+    """Upgrade the original schema_migrations table without rewriting or
+    locking it for longer than adding a column takes.
+    """
+    cursor.execute("SET LOCAL lock_timeout = '10s'")
+    cursor.execute("""\
+        SELECT column_name FROM information_schema.columns
+        WHERE table_name = 'schema_migrations'""")
+    columns = set(row[0] for row in cursor.fetchall())
+    for column, column_type in (('duration', 'INTERVAL'),
+                                ('checksum', 'TEXT'),
+                                ('host', 'TEXT'),
+                                ('db_time', 'INTERVAL'),
+                                ('row_count', 'BIGINT'),
+                                ('peak_memory', 'BIGINT')):
+        if column not in columns:
+            # nullable and without a default: no table rewrite
+            cursor.execute('ALTER TABLE schema_migrations ADD COLUMN {} {}'
+                           .format(column, column_type))
+
+    # Remove duplicated versions, keeping the row MigrationState would use
+    cursor.execute("""\
+        DELETE FROM schema_migrations a USING schema_migrations b
+        WHERE a.version = b.version AND (
+            a.applied IS NOT NULL AND b.applied IS NULL OR
+            a.applied < b.applied OR
+            a.applied IS NOT DISTINCT FROM b.applied AND a.ctid < b.ctid)""")
+    if cursor.rowcount:
+        logger.info('Removed {} duplicated schema migrations'
+                    .format(cursor.rowcount))
+    cursor.connection.commit()
+
+    # CREATE INDEX CONCURRENTLY can't run inside a transaction
+    cursor.connection.autocommit = True
+    try:
+        _create_index_concurrently(cursor, 'schema_migrations_pkey', """\
+            CREATE UNIQUE INDEX CONCURRENTLY schema_migrations_pkey
+                ON schema_migrations (version)""")
+        _create_index_concurrently(
+            cursor, 'schema_migrations_applied_idx', """\
+            CREATE INDEX CONCURRENTLY schema_migrations_applied_idx
+                ON schema_migrations (applied)""")
+    finally:
+        cursor.connection.autocommit = False
+
+    cursor.execute("SET LOCAL lock_timeout = '10s'")
+    cursor.execute("""\
+        SELECT 1 FROM pg_constraint
+        WHERE conrelid = 'schema_migrations'::regclass AND contype = 'p'""")
+    if not cursor.fetchone():
+        cursor.execute("""\
+            ALTER TABLE schema_migrations
+                ADD CONSTRAINT schema_migrations_pkey
+                PRIMARY KEY USING INDEX schema_migrations_pkey""")
+    cursor.execute('COMMENT ON TABLE schema_migrations IS %s',
+                   (BOOKKEEPING_COMMENT.format(utils.BOOKKEEPING_VERSION),))
+
+
+@utils.with_cursor
+def cli_command(cursor, migrations_directory='', version=None, upgrade=False,
+                baseline=None, **kwargs):
+    bookkeeping_version = get_bookkeeping_version(cursor)
+    if bookkeeping_version:
+        if bookkeeping_version >= utils.BOOKKEEPING_VERSION:
+            logger.info('Schema migrations already initialized.')
+        elif upgrade:
+            upgrade_table(cursor)
+            logger.info('Schema migrations upgraded.')
+        else:
+            logger.info('Schema migrations already initialized.  Use '
+                        '"dbmigrator init --upgrade" to upgrade the '
+                        'schema_migrations table.')
+        return
+
+    if baseline is not None:
+        if version is not None:
+            raise Exception('--version can not be used with --baseline.')
+        header = baselines.load_baseline(cursor, baseline)
+        create_table(cursor)
+        cursor.executemany("""\
+            INSERT INTO schema_migrations (version) VALUES (%s)
+            """, [(v,) for v in header['versions']])
+        cursor.executemany("""\
+            INSERT INTO schema_migrations (version, applied) VALUES (%s, NULL)
+            """, [(v,) for v in header['deferred']])
+        logger.info('Schema migrations initialized from the baseline up to '
+                    '{}.'.format(header['version']))
+        return
+
+    create_table(cursor)
+    versions = set()
     if version is None:
         timestamp = utils.timestamp()
     else:
         timestamp = str(version)
     for version, name in utils.get_migrations(migrations_directory):
         if version <= timestamp:
-            versions.append((version,))
+            versions.add((version,))
     cursor.executemany("""\
-        INSERT INTO schema_migrations VALUES (%s)
-        """, versions)
+        INSERT INTO schema_migrations (version) VALUES (%s)
+        """, sorted(versions))
     logger.info('Schema migrations initialized.')
 
 
@@ -46,4 +180,10 @@ def cli_loader(parser):
     parser.add_argument('--version', type=int,
                         help='Set the schema version to VERSION, '
                              'default current timestamp')
+    parser.add_argument('--upgrade', action='store_true',
+                        help='Upgrade an existing schema_migrations table '
+                             'to the current format')
+    parser.add_argument('--baseline', metavar='FILE',
+                        help='Load the baseline written by "dbmigrator '
+                             'squash" and mark its migrations as run')
     return cli_command
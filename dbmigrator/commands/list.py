@@ -6,7 +6,7 @@
 # See LICENCE.txt for details.
 # ###
 """List migration versions, names, whether it has been applied and the date
-applied."""
+applied, and optionally how long it took, its rows and peak memory."""
 
 from .. import utils
 
@@ -14,13 +14,15 @@ from .. import utils
 __all__ = ('cli_loader',)
 
 
+# The schema_migrations columns shown by --stats
+STATS_COLUMNS = ('duration', 'db_time', 'row_count', 'peak_memory')
+
+
 @utils.with_cursor
 def cli_command(cursor, migrations_directory='', db_connection_string='',
-                wide=False, sort='version', **kwargs):
+                wide=False, sort='version', stats=False, **kwargs):
     # version -> applied timestamp
-    migrated_versions = dict(list(
-        utils.get_schema_versions(cursor, versions_only=False,
-                                  raise_error=False)))
+    migrated_versions = utils.MigrationState.load(cursor, raise_error=False)
     migrations = utils.get_migrations(migrations_directory,
                                       import_modules=True)
 
@@ -31,9 +33,13 @@ def cli_command(cursor, migrations_directory='', db_connection_string='',
         name_width = 15
 
     name_format = '{:<%s}' % (name_width,)
-    print('version        | {} | is applied | date applied'
-          .format(name_format.format('name')))
-    print('-' * 70)
+    header = 'version        | {} | is applied | date applied'.format(
+        name_format.format('name'))
+    if stats:
+        header = '{:<{}} | duration        | db time         | rows       ' \
+                 '| peak memory'.format(header, len(header) + 20)
+    print(header)
+    print('-' * (stats and len(header) or 70))
 
     migrations = [(version, migration_name, migration,
                    migrated_versions.get(version, ''))
@@ -46,11 +52,19 @@ def cli_command(cursor, migrations_directory='', db_connection_string='',
         deferred = utils.is_deferred(
             version, migration, migrated_versions)
         is_applied = deferred and 'deferred' or bool(applied_timestamp)
-        if hasattr(migration, 'should_run'):
+        if utils.is_repeat(migration):
             is_applied = '{}*'.format(is_applied)
-        print('{}   {}   {!s: <10}   {}'.format(
+        line = '{}   {}   {!s: <10}   {}'.format(
             version, name_format.format(migration_name[:name_width]),
-            is_applied, applied_timestamp))
+            is_applied, applied_timestamp)
+        if stats:
+            details = migrated_versions.details.get(version, {})
+            values = [details.get(column) for column in STATS_COLUMNS]
+            line = '{:<{}}   {!s: <15}   {!s: <15}   {!s: <10}   {!s}'.format(
+                line, name_width + 65,
+                *['' if value is None else value for value in values]
+                ).rstrip()
+        print(line)
 
 
 def cli_loader(parser):
@@ -60,4 +74,8 @@ def cli_loader(parser):
     parser.add_argument(
         '--sort', default='version', choices=['version', 'applied'],
         help='Sort by migration "version" (default), or "applied" dates')
+    parser.add_argument('--stats', action='store_true',
+                        help='Also show how long each migration took, in '
+                             'total and in the database, the rows it '
+                             'affected and its peak memory in bytes')
     return cli_command
@@ -14,6 +14,7 @@ __all__ = ('cli_loader',)
 
 
 @utils.with_cursor
+@utils.with_migration_lock
 def cli_command(cursor, migrations_directory='', migration_timestamps=None,
                 completed=None, **kwargs):
     if completed is None:
@@ -7,32 +7,166 @@
 # ###
 """Run all pending migrations."""
 
-from .. import logger, utils
+import json
+
+from .. import logger, scheduler, schema, utils
 
 
 __all__ = ('cli_loader',)
 
 
+def get_locks(cursor):
+    """Return the (object, mode) of the locks held by ``cursor``'s
+    connection, except locks on system catalogs and transaction ids.
+    """
+    cursor.execute("""\
+        SELECT CASE WHEN locktype = 'relation' THEN relation::regclass::text
+                    ELSE locktype END, mode
+        FROM pg_locks
+        WHERE pid = pg_backend_pid() AND granted
+            AND locktype NOT IN ('virtualxid', 'transactionid')
+            -- 16384 is the first oid not used by the system catalogs
+            AND (relation IS NULL OR relation >= 16384)
+        ORDER BY 1, 2""")
+    return [tuple(row) for row in cursor.fetchall()]
+
+
+def plan_migrations(cursor, pending_migrations, schema_tracker,
+                    run_deferred, state, plan_file=None):
+    """Run ``pending_migrations`` without committing, logging how long each
+    one took and the locks held at the end of it, then roll back.  Write the
+    plan as json to ``plan_file`` if given.
+
+    A migration that commits or uses ``super_user()`` fails the plan.
+    """
+    logger.info('Planning the pending migrations, nothing will be '
+                'committed.')
+    plan = []
+    error = None
+    try:
+        with utils.forbid_commits('with --plan', super_user=True):
+            for version, migration_name, migration in pending_migrations:
+                locks_before = set(get_locks(cursor))
+                step = {'version': version, 'name': migration_name}
+                plan.append(step)
+                try:
+                    migration_metrics = schema_tracker.compare(
+                        utils.run_migration, cursor, version, migration_name,
+                        migration, run_deferred, commit=False, state=state)
+                except Exception as e:
+                    error = e
+                    step['error'] = str(e)
+                    logger.error('Migration {} {} failed: {}'.format(
+                        version, migration_name, e))
+                    break
+                if migration_metrics is None:
+                    step['skipped'] = True
+                    continue
+                locks = get_locks(cursor)
+                step.update(
+                    duration=migration_metrics.duration,
+                    db_time=migration_metrics.db_time,
+                    row_count=migration_metrics.row_count,
+                    locks=locks,
+                    new_locks=[lock for lock in locks
+                               if lock not in locks_before])
+                logger.info('Migration {} {}: {}, new locks: {}'.format(
+                    version, migration_name, migration_metrics,
+                    ', '.join('{} {}'.format(*lock)
+                              for lock in step['new_locks']) or 'none'))
+    finally:
+        cursor.connection.rollback()
+
+    if plan:
+        logger.info('Total {:.3f}s, rolled back.'.format(
+            sum(step.get('duration', 0) for step in plan)))
+    if plan_file:
+        with open(plan_file, 'w') as f:
+            json.dump(plan, f, indent=2, sort_keys=True)
+    if error is not None:
+        raise error
+    return plan
+
+
 @utils.with_cursor
+@utils.with_migration_lock
 def cli_command(cursor, migrations_directory='', version='',
-                db_connection_string='', run_deferred=False, **kwargs):
+                db_connection_string='', schema_diff='full',
+                run_deferred=False, single_transaction=False, jobs=1,
+                plan=False, plan_file=None, **kwargs):
+    if jobs > 1 and (single_transaction or plan):
+        raise Exception('--jobs can not be used with --single-transaction '
+                        'or --plan.')
+    if jobs > 1 and kwargs.get('measure_memory'):
+        # tracemalloc measures the whole process, not a migration
+        raise Exception('--jobs can not be used with --measure-memory.')
+    state = utils.MigrationState.load(cursor)
     pending_migrations = utils.get_pending_migrations(
         migrations_directory, cursor, import_modules=True,
-        up_to_version=version, include_defers=True)
+        up_to_version=version, include_defers=True, state=state)
+
+    if jobs > 1:
+        pending_migrations = list(pending_migrations)
+        if not pending_migrations:
+            logger.info('No pending migrations.  Database is up to date.')
+            return
+        if schema_diff != 'off':
+            logger.info('Schema changes are not shown when running '
+                        'migrations in parallel.')
+        # release the locks taken loading the state before other
+        # connections migrate
+        cursor.connection.commit()
+
+        def run_migration(cursor, version, migration_name, migration):
+            utils.run_migration(cursor, version, migration_name, migration,
+                                run_deferred, state=state)
+
+        scheduler.run_in_parallel(pending_migrations, jobs,
+                                  db_connection_string, run_migration)
+        return
+
+    schema_tracker = schema.SchemaTracker(cursor, schema_diff)
+    if plan or plan_file:
+        if not plan_migrations(cursor, pending_migrations, schema_tracker,
+                               run_deferred, state, plan_file):
+            logger.info('No pending migrations.  Database is up to date.')
+        return
 
     migrated = False
     for version, migration_name, migration in pending_migrations:
         migrated = True
-        utils.compare_schema(db_connection_string,
-                             utils.run_migration,
-                             cursor,
-                             version,
-                             migration_name,
-                             migration,
-                             run_deferred)
+        if not single_transaction:
+            schema_tracker.compare(utils.run_migration,
+                                   cursor,
+                                   version,
+                                   migration_name,
+                                   migration,
+                                   run_deferred,
+                                   state=state)
+            continue
+
+        try:
+            with utils.savepoint(cursor, 'migration_{}'.format(version)), \
+                    utils.forbid_commits('with --single-transaction',
+                                         super_user=True):
+                schema_tracker.compare(utils.run_migration,
+                                       cursor,
+                                       version,
+                                       migration_name,
+                                       migration,
+                                       run_deferred,
+                                       commit=False,
+                                       state=state)
+        except Exception:
+            logger.error('Migration {} {} failed, rolling back all the '
+                         'migrations in this transaction'
+                         .format(version, migration_name))
+            raise
 
     if not migrated:
         logger.info('No pending migrations.  Database is up to date.')
+    elif single_transaction:
+        cursor.connection.commit()
 
 
 def cli_loader(parser):
@@ -41,4 +175,18 @@ def cli_loader(parser):
     parser.add_argument('--run-deferred',
                         action='store_true',
                         help='Also run the deferred migrations')
+    parser.add_argument('--single-transaction',
+                        action='store_true',
+                        help='Run all the pending migrations in one '
+                             'transaction and commit once at the end')
+    parser.add_argument('--plan',
+                        action='store_true',
+                        help='Run the pending migrations, show how long they '
+                             'take and the locks they take, then roll back')
+    parser.add_argument('--plan-file', metavar='FILE',
+                        help='Also write the plan to FILE as json, implies '
+                             '--plan')
+    parser.add_argument('--jobs', '-j', type=int, default=1,
+                        help='Run up to JOBS independent migrations at the '
+                             'same time, each on its own connection')
     return cli_command
@@ -7,17 +7,18 @@
 # ###
 """Rollback a migration."""
 
-from .. import logger, utils
+from .. import logger, schema, utils
 
 
 __all__ = ('cli_loader',)
 
 
 @utils.with_cursor
+@utils.with_migration_lock
 def cli_command(cursor, migrations_directory='', steps=1,
-                db_connection_string='', **kwargs):
-    migrated_versions = list(utils.get_schema_versions(
-        cursor, include_deferred=False, order_by='applied'))
+                db_connection_string='', schema_diff='full', **kwargs):
+    state = utils.MigrationState.load(cursor)
+    migrated_versions = state.versions(include_deferred=False)
     logger.debug('migrated_versions: {}'.format(migrated_versions))
     if not migrated_versions:
         logger.info('No migrations to roll back.')
@@ -27,18 +28,19 @@ def cli_command(cursor, migrations_directory='', steps=1,
                       migrations_directory, import_modules=True,
                       reverse=True)}
 
+    schema_tracker = schema.SchemaTracker(cursor, schema_diff)
     rolled_back = 0
     for version in reversed(migrated_versions):
         if version not in migrations:
             logger.info('Migration {} not found.'.format(version))
             break
         migration_name, migration = migrations[version]
-        utils.compare_schema(db_connection_string,
-                             utils.rollback_migration,
-                             cursor,
-                             version,
-                             migration_name,
-                             migration)
+        schema_tracker.compare(utils.rollback_migration,
+                               cursor,
+                               version,
+                               migration_name,
+                               migration,
+                               state=state)
         rolled_back += 1
         if rolled_back >= steps:
             break
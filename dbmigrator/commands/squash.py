@@ -0,0 +1,55 @@
+# -*- coding: utf-8 -*-
+# ###
+# Copyright (c) 2026, Rice University
+# This software is subject to the provisions of the GNU Affero General
+# Public License version 3 (AGPLv3).
+# See LICENCE.txt for details.
+# ###
+"""Write a baseline of the migrations up to a version, the schema and seed
+data of this database, for "init --baseline" to load into a new database.
+"""
+
+from .. import baseline, logger, utils
+
+
+__all__ = ('cli_loader',)
+
+
+@utils.with_cursor
+def cli_command(cursor, migrations_directory='', up_to=None, output=None,
+                data_tables=None, db_connection_string='', **kwargs):
+    up_to = str(up_to)
+    state = utils.MigrationState.load(cursor)
+
+    later = sorted(v for v in state if v > up_to)
+    if later:
+        raise Exception('Migrations after {} have been run: {}'.format(
+            up_to, ', '.join(later)))
+    pending = [version for version, _ in utils.get_migrations(
+               migrations_directory) if version <= up_to and
+               version not in state]
+    if pending:
+        raise Exception('Migrations up to {} have not been run: {}'.format(
+            up_to, ', '.join(pending)))
+
+    if output is None:
+        output = 'baseline_{}.sql'.format(up_to)
+    header = baseline.write_baseline(output, db_connection_string, up_to,
+                                     state, data_tables or ())
+    logger.info('Baseline of {} migrations up to {} written to {}'.format(
+        len(header['versions']) + len(header['deferred']), up_to, output))
+
+
+def cli_loader(parser):
+    parser.add_argument('--up-to', type=int, required=True, metavar='VERSION',
+                        help='The last migration in the baseline, all the '
+                             'migrations up to VERSION and none after it '
+                             'must have been run')
+    parser.add_argument('-o', '--output',
+                        help='Where to write the baseline, default '
+                             'baseline_VERSION.sql')
+    parser.add_argument('--data', action='append', dest='data_tables',
+                        metavar='TABLE',
+                        help='Also include the rows of TABLE, the seed data '
+                             'the migrations inserted (repeatable)')
+    return cli_command
@@ -0,0 +1,35 @@
+# -*- coding: utf-8 -*-
+# ###
+# Copyright (c) 2026, Rice University
+# This software is subject to the provisions of the GNU Affero General
+# Public License version 3 (AGPLv3).
+# See LICENCE.txt for details.
+# ###
+"""Show whether the database is up to date."""
+
+from .. import logger, utils
+
+
+__all__ = ('cli_loader',)
+
+
+@utils.with_cursor
+def cli_command(cursor, migrations_directory='', check=False, **kwargs):
+    if check:
+        return 0 if utils.is_up_to_date(cursor, migrations_directory) else 1
+
+    state = utils.MigrationState.load(cursor)
+    unapplied = utils.get_unapplied_migrations(migrations_directory, cursor,
+                                               state=state)
+    for version, migration_name, _ in unapplied:
+        logger.info('Migration {} {} has not been applied'
+                    .format(version, migration_name))
+    if not unapplied:
+        logger.info('Database is up to date.')
+
+
+def cli_loader(parser):
+    parser.add_argument('--check', action='store_true',
+                        help='Only exit with status 1 if there are '
+                             'migrations to apply, 0 otherwise')
+    return cli_command
@@ -0,0 +1,52 @@
+# -*- coding: utf-8 -*-
+# ###
+# Copyright (c) 2026, Rice University
+# This software is subject to the provisions of the GNU Affero General
+# Public License version 3 (AGPLv3).
+# See LICENCE.txt for details.
+# ###
+"""The base of the cursors wrapping the cursors given to migrations, e.g.
+to measure or trace their statements, so the wrappers can be stacked.
+"""
+
+__all__ = ('CursorProxy',)
+
+
+class CursorProxy(object):
+    """Pass everything through to ``cursor``.
+
+    ``execute``, ``executemany`` and ``callproc`` call ``_execute``, which
+    subclasses override to do something around the statements.
+    """
+
+    def __init__(self, cursor):
+        self._cursor = cursor
+
+    def _execute(self, method, query, vars, many=False):
+        """Return ``method(query, vars)``, ``method`` being the execute,
+        executemany (``many``) or callproc of the cursor.
+        """
+        return method(query, vars)
+
+    def execute(self, query, vars=None):
+        return self._execute(self._cursor.execute, query, vars)
+
+    def executemany(self, query, vars_list):
+        return self._execute(self._cursor.executemany, query, vars_list,
+                             many=True)
+
+    def callproc(self, procname, parameters=None):
+        return self._execute(self._cursor.callproc, procname, parameters)
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+    def __iter__(self):
+        return iter(self._cursor)
+
+    def __enter__(self):
+        self._cursor.__enter__()
+        return self
+
+    def __exit__(self, *exc_info):
+        return self._cursor.__exit__(*exc_info)
@@ -0,0 +1,206 @@
+# -*- coding: utf-8 -*-
+# ###
+# Copyright (c) 2026, Rice University
+# This software is subject to the provisions of the GNU Affero General
+# Public License version 3 (AGPLv3).
+# See LICENCE.txt for details.
+# ###
+"""The database drivers dbmigrator can use: psycopg2, the default, and
+psycopg 3 (``pip install db-migrator[psycopg]``).
+
+Select one with ``--driver`` or ``utils.set_driver``.  A driver makes the
+connections and gives its library's exceptions and ``sql`` module, so
+migrations and dbmigrator can be written for either.  psycopg 3 connections
+use client side parameter binding (``psycopg.ClientCursor``), like psycopg2,
+so the same statements work with both.
+"""
+
+import abc
+from contextlib import contextmanager
+from select import select
+
+
+__all__ = ('DRIVERS', 'load_driver')
+
+
+# psycopg2 / libpq doesn't respond to SIGINT (ctrl-c):
+# https://github.com/psycopg/psycopg2/issues/333
+# To get around this problem, using code from:
+# http://initd.org/psycopg/articles/2014/07/20/cancelling-postgresql-statements-python/ # noqa
+def wait_select_inter(conn):
+    from psycopg2.extensions import POLL_OK, POLL_READ, POLL_WRITE
+
+    while 1:
+        try:
+            state = conn.poll()
+            if state == POLL_OK:
+                break
+            elif state == POLL_READ:
+                select([conn.fileno()], [], [])
+            elif state == POLL_WRITE:
+                select([], [conn.fileno()], [])
+            else:
+                raise conn.OperationalError(
+                    'bad state from poll: {}'.format(state))
+        except KeyboardInterrupt:
+            conn.cancel()
+            continue
+
+
+# abc.ABC, for python 2 too
+_ABC = abc.ABCMeta('ABC', (object,), {'__slots__': ()})
+
+
+class Driver(_ABC):
+    """A database driver, wrapping the DB-API module ``module``."""
+
+    name = None
+
+    def __init__(self, module, sql):
+        self.module = module
+        self.sql = sql
+        self.Error = module.Error
+        self.ProgrammingError = module.ProgrammingError
+
+    def connect(self, *args, **kwargs):
+        return self.module.connect(*args, **kwargs)
+
+    @contextmanager
+    def transaction(self, db_conn):
+        """Commit ``db_conn`` at the end of this context, or roll it back on
+        error, leaving it open.
+        """
+        try:
+            yield db_conn
+        except BaseException:
+            if not db_conn.closed:
+                db_conn.rollback()
+            raise
+        else:
+            db_conn.commit()
+
+    @abc.abstractmethod
+    def reset(self, db_conn):
+        """Roll back ``db_conn`` and reset its session, releasing its
+        advisory locks, before reusing it.
+        """
+
+    @abc.abstractmethod
+    def error_code(self, error):
+        """Return the SQLSTATE of ``error``, e.g. '55P03'."""
+
+    def install_cancel_handler(self):
+        """Cancel the running statement on ctrl-c."""
+
+    @abc.abstractmethod
+    def make_dsn(self, dsn, **kwargs):
+        """Return ``dsn`` with the connection parameters ``kwargs``."""
+
+    @abc.abstractmethod
+    def copy_from(self, cursor, statement, stream, size):
+        """Run ``statement``, a COPY ... FROM STDIN, with the data read from
+        ``stream`` ``size`` bytes at a time.
+        """
+
+    def execute_batch(self, cursor, statements):
+        """Run ``statements``, a list of (query, vars), in one round trip,
+        as one multi-statement query.
+        """
+        queries = [cursor.mogrify(query, vars) for query, vars in statements]
+        separator = b';\n' if isinstance(queries[0], bytes) else u';\n'
+        cursor.execute(separator.join(queries))
+
+
+class Psycopg2Driver(Driver):
+    name = 'psycopg2'
+
+    def __init__(self):
+        import psycopg2
+        import psycopg2.extensions
+        import psycopg2.sql
+        super(Psycopg2Driver, self).__init__(psycopg2, psycopg2.sql)
+
+    def reset(self, db_conn):
+        db_conn.reset()
+        with db_conn.cursor() as cursor:
+            cursor.execute('SELECT pg_advisory_unlock_all()')
+        db_conn.commit()
+
+    def error_code(self, error):
+        return getattr(error, 'pgcode', None)
+
+    def install_cancel_handler(self):
+        self.module.extensions.set_wait_callback(wait_select_inter)
+
+    def make_dsn(self, dsn, **kwargs):
+        return self.module.extensions.make_dsn(dsn, **kwargs)
+
+    def copy_from(self, cursor, statement, stream, size):
+        if hasattr(statement, 'as_string'):
+            statement = statement.as_string(cursor.connection)
+        cursor.copy_expert(statement, stream, size=size)
+
+
+class PsycopgDriver(Driver):
+    """psycopg 3, which cancels the running statement on ctrl-c itself."""
+
+    name = 'psycopg'
+
+    def __init__(self):
+        import psycopg
+        import psycopg.conninfo
+        import psycopg.sql
+        super(PsycopgDriver, self).__init__(psycopg, psycopg.sql)
+
+    def connect(self, *args, **kwargs):
+        kwargs.setdefault('cursor_factory', self.module.ClientCursor)
+        return self.module.connect(*args, **kwargs)
+
+    def reset(self, db_conn):
+        db_conn.rollback()
+        with db_conn.cursor() as cursor:
+            cursor.execute('RESET ALL')
+            cursor.execute('SET SESSION AUTHORIZATION DEFAULT')
+            cursor.execute('SELECT pg_advisory_unlock_all()')
+        db_conn.commit()
+
+    def error_code(self, error):
+        return getattr(error, 'sqlstate', None)
+
+    def make_dsn(self, dsn, **kwargs):
+        return self.module.conninfo.make_conninfo(dsn, **kwargs)
+
+    def copy_from(self, cursor, statement, stream, size):
+        with cursor.copy(statement) as copy:
+            while True:
+                data = stream.read(size)
+                if not data:
+                    break
+                copy.write(data)
+
+    def execute_batch(self, cursor, statements):
+        # pipeline mode needs libpq 14
+        if not self.module.Pipeline.is_supported():
+            return super(PsycopgDriver, self).execute_batch(
+                cursor, statements)
+        with cursor.connection.pipeline():
+            for query, vars in statements:
+                cursor.execute(query, vars)
+
+
+DRIVERS = {
+    'psycopg2': Psycopg2Driver,
+    'psycopg': PsycopgDriver,
+    }
+
+_drivers = {}
+
+
+def load_driver(name):
+    """Return the driver ``name``, one of ``DRIVERS``."""
+    if name not in DRIVERS:
+        raise Exception('Unknown driver "{}", use one of: {}'.format(
+            name, ', '.join(sorted(DRIVERS))))
+    if name not in _drivers:
+        _drivers[name] = DRIVERS[name]()
+    return _drivers[name]
@@ -0,0 +1,154 @@
+# -*- coding: utf-8 -*-
+# ###
+# Copyright (c) 2026, Rice University
+# This software is subject to the provisions of the GNU Affero General
+# Public License version 3 (AGPLv3).
+# See LICENCE.txt for details.
+# ###
+"""Read the settings of a context, a distribution with ``dbmigrator`` entry
+points, e.g. its ``migrations_directory``.
+
+Loading an entry point imports the package it's in, so the settings that
+are values (not functions) are cached in the cache directory (see
+``manifest``), with the location, version and entry points of the
+distribution.  They are loaded again when the distribution is installed
+again or upgraded, and separately for each virtualenv or checkout it's
+installed from, since the settings are often paths in the distribution.
+The settings that are functions, e.g. reading the environment, are called
+by every process.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import tempfile
+
+try:
+    from importlib import metadata
+except ImportError:
+    try:
+        import importlib_metadata as metadata
+    except ImportError:
+        # python 2 without the importlib_metadata backport
+        metadata = None
+
+from . import manifest
+
+
+__all__ = ('get_settings',)
+
+
+GROUP = 'dbmigrator'
+
+# The version of the cache format, part of the cache keys
+CACHE_VERSION = 2
+
+logger = logging.getLogger('dbmigrator')
+
+
+def _cache_path():
+    return os.path.join(manifest.cache_directory(), 'entry_points.json')
+
+
+def _distribution(context):
+    """Return the cache key of the distribution ``context`` and its
+    ``dbmigrator`` entry points as (name, load).
+    """
+    if metadata is None:
+        import pkg_resources
+        distribution = pkg_resources.get_distribution(context)
+        entry_points = [(name, entry_point.load) for name, entry_point in
+                        pkg_resources.get_entry_map(context, GROUP).items()]
+        text = (distribution.has_metadata('entry_points.txt') and
+                distribution.get_metadata('entry_points.txt') or '')
+        location = distribution.location
+    else:
+        distribution = metadata.distribution(context)
+        entry_points = [(entry_point.name, entry_point.load)
+                        for entry_point in distribution.entry_points
+                        if entry_point.group == GROUP]
+        text = distribution.read_text('entry_points.txt') or ''
+        location = str(distribution.locate_file(''))
+    key = hashlib.sha1(u'\n'.join([
+        str(CACHE_VERSION), context, location, distribution.version,
+        text]).encode('utf-8')).hexdigest()
+    return key, entry_points
+
+
+def _load_cache():
+    try:
+        with open(_cache_path()) as f:
+            return json.load(f)
+    except (IOError, OSError, ValueError):
+        return {}
+
+
+def _save_cache(cache):
+    path = _cache_path()
+    directory = os.path.dirname(path)
+    try:
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        with os.fdopen(fd, 'w') as f:
+            json.dump(cache, f, sort_keys=True)
+        os.rename(tmp_path, path)
+    except (IOError, OSError) as e:
+        logger.debug('Unable to save {}: {}'.format(path, e))
+
+
+# The distributions read and the settings loaded by this process, by
+# context: (key, entry points, settings)
+_settings = {}
+
+
+def _load(load):
+    """Return the value of the entry point ``load`` and how to cache it."""
+    value = load()
+    if callable(value):
+        # called by every process
+        return value(), {'callable': True}
+    try:
+        json.dumps(value)
+    except TypeError:
+        return value, None
+    return value, {'value': value}
+
+
+def get_settings(context, skip=()):
+    """Return the settings of the distribution ``context``, name -> value,
+    from its ``dbmigrator`` entry points, without loading the ones in
+    ``skip``.  An entry point is either the value or a function returning
+    it.
+    """
+    if context not in _settings:
+        _settings[context] = _distribution(context) + ({},)
+    key, entry_points, loaded = _settings[context]
+    cache = None
+    settings = {}
+    for name, load in entry_points:
+        if name in skip:
+            continue
+        if name not in loaded:
+            if cache is None:
+                cache = _load_cache()
+                cached = cache.get(context, {}).get(key, {})
+                changed = False
+            entry = cached.get(name)
+            if entry is not None and 'value' in entry:
+                value = entry['value']
+            else:
+                value, entry = _load(load)
+                if entry is None:
+                    logger.debug('Not caching the setting {} of {}'.format(
+                        name, context))
+                elif cached.get(name) != entry:
+                    cached[name] = entry
+                    changed = True
+            loaded[name] = value
+        settings[name] = loaded[name]
+    if cache is not None and changed:
+        cache[context] = {key: cached}
+        _save_cache(cache)
+    return settings
@@ -0,0 +1,126 @@
+# -*- coding: utf-8 -*-
+# ###
+# Copyright (c) 2026, Rice University
+# This software is subject to the provisions of the GNU Affero General
+# Public License version 3 (AGPLv3).
+# See LICENCE.txt for details.
+# ###
+"""Cache what is known about the migrations in a directory between runs.
+
+The manifest of a migrations directory is a json file in the cache
+directory recording, for every migration file, its version, name, size,
+modification time, sha1 and what was found by inspecting it.  A file is only
+read again when its size or modification time changes, and only inspected
+again when its content changes.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import re
+import tempfile
+
+
+__all__ = ('cache_directory', 'manifest_path', 'load_manifest',
+           'save_manifest', 'inspect_directory')
+
+
+MANIFEST_VERSION = 4
+
+logger = logging.getLogger('dbmigrator')
+
+
+def cache_directory():
+    """Return the directory manifests are kept in, ``$DBMIGRATOR_CACHE_DIR``
+    or ``$XDG_CACHE_HOME/dbmigrator`` (``~/.cache/dbmigrator``).
+    """
+    directory = os.environ.get('DBMIGRATOR_CACHE_DIR')
+    if directory:
+        return directory
+    xdg_cache_home = (os.environ.get('XDG_CACHE_HOME') or
+                      os.path.join(os.path.expanduser('~'), '.cache'))
+    return os.path.join(xdg_cache_home, 'dbmigrator')
+
+
+def manifest_path(migrations_directory):
+    key = os.path.abspath(migrations_directory).encode('utf-8')
+    return os.path.join(cache_directory(),
+                        '{}.json'.format(hashlib.sha1(key).hexdigest()))
+
+
+def load_manifest(migrations_directory):
+    """Return the cached entries for ``migrations_directory``, filename ->
+    entry, or an empty dictionary if there is no usable manifest.
+    """
+    try:
+        with open(manifest_path(migrations_directory)) as f:
+            manifest = json.load(f)
+    except (IOError, OSError, ValueError):
+        return {}
+    if manifest.get('version') != MANIFEST_VERSION:
+        return {}
+    return manifest.get('files', {})
+
+
+def save_manifest(migrations_directory, entries):
+    path = manifest_path(migrations_directory)
+    directory = os.path.dirname(path)
+    try:
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+        # write to a temporary file first so readers never see half a file
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        with os.fdopen(fd, 'w') as f:
+            json.dump({'version': MANIFEST_VERSION, 'files': entries}, f,
+                      sort_keys=True)
+        os.rename(tmp_path, path)
+    except (IOError, OSError) as e:
+        logger.debug('Unable to save manifest {}: {}'.format(path, e))
+
+
+def _sha1(path):
+    with open(path, 'rb') as f:
+        return hashlib.sha1(f.read()).hexdigest()
+
+
+def inspect_directory(migrations_directory, inspect):
+    """Return path -> ``inspect(path)`` for the migrations in
+    ``migrations_directory``, calling ``inspect`` only for the files that
+    changed since the manifest was last saved.
+
+    ``inspect`` must return something json serializable.
+    """
+    try:
+        filenames = os.listdir(migrations_directory)
+    except OSError:
+        return {}
+
+    cached = load_manifest(migrations_directory)
+    entries = {}
+    result = {}
+    for filename in filenames:
+        m = re.match('([0-9]+)_(.+).py$', filename)
+        if not m:
+            continue
+        path = os.path.join(migrations_directory, filename)
+        try:
+            stat = os.stat(path)
+        except OSError:
+            continue
+        entry = cached.get(filename)
+        if entry is None or entry['size'] != stat.st_size or \
+                entry['mtime'] != stat.st_mtime:
+            sha1 = _sha1(path)
+            if entry is None or entry['sha1'] != sha1:
+                logger.debug('Inspecting migration {}'.format(path))
+                version, name = m.groups()
+                entry = {'version': version, 'name': name, 'sha1': sha1,
+                         'inspected': inspect(path)}
+            entry = dict(entry, size=stat.st_size, mtime=stat.st_mtime)
+        entries[filename] = entry
+        result[path] = entry['inspected']
+
+    if entries != cached:
+        save_manifest(migrations_directory, entries)
+    return result
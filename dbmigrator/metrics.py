@@ -0,0 +1,94 @@
+# -*- coding: utf-8 -*-
+# ###
+# Copyright (c) 2026, Rice University
+# This software is subject to the provisions of the GNU Affero General
+# Public License version 3 (AGPLv3).
+# See LICENCE.txt for details.
+# ###
+"""Measure how long a migration takes, in total and in the database, the
+rows it affects and the peak memory it allocates.
+"""
+
+from contextlib import contextmanager
+import time
+
+from .cursors import CursorProxy
+
+try:
+    import tracemalloc
+except ImportError:
+    # python 2
+    tracemalloc = None
+
+
+__all__ = ('MigrationMetrics', 'measure')
+
+
+class MigrationMetrics(object):
+    """What ``measure`` found.  ``peak_memory`` is in bytes, ``None`` if
+    the memory wasn't measured.
+    """
+
+    def __init__(self):
+        self.duration = 0
+        self.db_time = 0
+        self.row_count = 0
+        self.peak_memory = None
+
+    def __str__(self):
+        result = '{:.3f}s, {:.3f}s in the database, {} rows'.format(
+            self.duration, self.db_time, self.row_count)
+        if self.peak_memory is not None:
+            result += ', {} bytes peak memory'.format(self.peak_memory)
+        return result
+
+
+class _MeasuringCursor(CursorProxy):
+    """Pass everything through to ``cursor``, adding the time spent in
+    execute and the rows affected to ``metrics``.
+    """
+
+    def __init__(self, cursor, metrics):
+        super(_MeasuringCursor, self).__init__(cursor)
+        self._metrics = metrics
+
+    def _execute(self, method, query, vars, many=False):
+        start = time.time()
+        try:
+            return method(query, vars)
+        finally:
+            self._metrics.db_time += time.time() - start
+            if self._cursor.rowcount > 0:
+                self._metrics.row_count += self._cursor.rowcount
+
+
+@contextmanager
+def measure(cursor, memory=False):
+    """Yield (measuring cursor, metrics) and fill in the metrics of what ran
+    in this context, using the measuring cursor.
+
+    The peak memory is measured if ``memory`` or tracemalloc is already
+    tracing (e.g. ``PYTHONTRACEMALLOC=1``), since tracing the memory slows
+    python down.
+    """
+    metrics = MigrationMetrics()
+    started_tracing = False
+    memory = tracemalloc is not None and (memory or tracemalloc.is_tracing())
+    if memory:
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+            started_tracing = True
+        elif hasattr(tracemalloc, 'reset_peak'):
+            tracemalloc.reset_peak()
+        memory_before = tracemalloc.get_traced_memory()[0]
+
+    start = time.time()
+    try:
+        yield _MeasuringCursor(cursor, metrics), metrics
+    finally:
+        metrics.duration = time.time() - start
+        if memory:
+            metrics.peak_memory = max(
+                0, tracemalloc.get_traced_memory()[1] - memory_before)
+            if started_tracing:
+                tracemalloc.stop()
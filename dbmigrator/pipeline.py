@@ -0,0 +1,128 @@
+# -*- coding: utf-8 -*-
+# ###
+# Copyright (c) 2026, Rice University
+# This software is subject to the provisions of the GNU Affero General
+# Public License version 3 (AGPLv3).
+# See LICENCE.txt for details.
+# ###
+"""Send the statements of a migration in batches, one round trip per batch
+instead of one per statement, for migrations running many small statements
+(grants, comments, DDL per tenant...)::
+
+    from dbmigrator import batched
+
+
+    @batched
+    def up(cursor):
+        for tenant in TENANTS:
+            cursor.execute('GRANT SELECT ON users TO {}'.format(tenant))
+
+The statements are queued until ``max_statements`` are queued, the results
+of a statement are needed (``fetchone``, ``rowcount``...) or the migration
+returns.  A batch is sent in pipeline mode with psycopg 3, as one
+multi-statement query with psycopg2.  If a statement fails, the batch is
+rolled back to a savepoint and run again one statement at a time, so the
+error raised is the error of the statement that failed.  What isn't rolled
+back is done twice then: sequences (``nextval``) advance twice and the
+statements run through ``dblink`` run twice.
+
+``execute`` returns the cursor, as with psycopg 3, so
+``cursor.execute(...).fetchone()`` works.
+"""
+
+from .cursors import CursorProxy
+
+
+__all__ = ('BatchingCursor',)
+
+
+SAVEPOINT = 'dbmigrator_batch'
+
+
+class BatchingCursor(CursorProxy):
+    """Queue the statements executed with ``cursor``, sending them in
+    batches of up to ``max_statements``.  Pass everything else through to
+    ``cursor``, sending the queued statements first.
+
+    Call ``flush`` to send the queued statements.
+    """
+
+    def __init__(self, cursor, driver=None, max_statements=1000):
+        if driver is None:
+            from . import utils
+            driver = utils.get_driver()
+        super(BatchingCursor, self).__init__(cursor)
+        self._driver = driver
+        self._max_statements = max_statements
+        self._queue = []
+
+    def execute(self, query, vars=None):
+        self._queue.append((query, vars))
+        if len(self._queue) >= self._max_statements:
+            self.flush()
+        # e.g. cursor.execute(...).fetchone(), which flushes
+        return self
+
+    def executemany(self, query, vars_list):
+        for vars in vars_list:
+            self.execute(query, vars)
+
+    def flush(self, keep_last=False):
+        """Send the queued statements.  With ``keep_last``, the last one is
+        executed on its own afterwards, so its results can be read.
+        """
+        queue, self._queue = self._queue, []
+        last = keep_last and queue and queue.pop() or None
+        if len(queue) == 1:
+            self._cursor.execute(*queue[0])
+        elif queue:
+            self._execute_batch(queue)
+        if last is not None:
+            self._cursor.execute(*last)
+
+    def _execute_batch(self, statements):
+        cursor = self._cursor
+        try:
+            self._driver.execute_batch(
+                cursor, [('SAVEPOINT {}'.format(SAVEPOINT), None)] +
+                statements + [('RELEASE SAVEPOINT {}'.format(SAVEPOINT),
+                               None)])
+        except self._driver.Error as e:
+            error = e
+        else:
+            return
+        try:
+            cursor.execute('ROLLBACK TO SAVEPOINT {}'.format(SAVEPOINT))
+            cursor.execute('RELEASE SAVEPOINT {}'.format(SAVEPOINT))
+        except self._driver.Error:
+            # e.g. the savepoint wasn't made, the batch can't be replayed
+            # without running what it did twice
+            raise error
+        from . import utils
+        # run the statements again one at a time, to find the one failing
+        for i, (query, vars) in enumerate(statements):
+            try:
+                cursor.execute(query, vars)
+            except self._driver.Error:
+                utils.logger.error('Statement {} of {} in the batch failed'
+                                   .format(i + 1, len(statements)))
+                raise
+        # e.g. a lock timeout the second time round: the statements are
+        # applied now
+        utils.logger.warning('The batch failed ({}) but its statements '
+                             'did not when run again'.format(
+                                 str(error).strip().splitlines()[0]))
+
+    def _execute(self, method, query, vars, many=False):
+        # callproc, run after the queued statements
+        self.flush()
+        return method(query, vars)
+
+    def __iter__(self):
+        self.flush(keep_last=True)
+        return super(BatchingCursor, self).__iter__()
+
+    def __getattr__(self, name):
+        # e.g. fetchone, rowcount: the results of the last statement
+        self.flush(keep_last=True)
+        return super(BatchingCursor, self).__getattr__(name)
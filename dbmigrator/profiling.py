@@ -0,0 +1,86 @@
+# -*- coding: utf-8 -*-
+# ###
+# Copyright (c) 2026, Rice University
+# This software is subject to the provisions of the GNU Affero General
+# Public License version 3 (AGPLv3).
+# See LICENCE.txt for details.
+# ###
+"""Profile a command, writing a cProfile dump and a timeline of what each
+migration spent its time on, in the Chrome trace event format (open it in
+chrome://tracing or https://ui.perfetto.dev).
+"""
+
+import cProfile
+from contextlib import contextmanager
+import datetime
+import functools
+import json
+import os
+import threading
+import time
+
+
+__all__ = ('span', 'profile', 'profiled')
+
+
+# The trace events of the command being profiled
+_events = None
+
+
+@contextmanager
+def span(name, **args):
+    """Record ``name`` and how long this context took in the timeline, if a
+    command is being profiled.
+    """
+    if _events is None:
+        yield
+        return
+    start = time.time()
+    try:
+        yield
+    finally:
+        _events.append({
+            'name': name,
+            'ph': 'X',
+            'ts': int(start * 1000000),
+            'dur': int((time.time() - start) * 1000000),
+            'pid': os.getpid(),
+            'tid': threading.current_thread().ident,
+            'args': args,
+            })
+
+
+@contextmanager
+def profile(directory, name):
+    """Profile this context, writing ``{name}-{timestamp}.prof`` and
+    ``{name}-{timestamp}.trace.json`` to ``directory``.  Yield the base path
+    of the files.
+    """
+    global _events
+    if not os.path.isdir(directory):
+        os.makedirs(directory)
+    base_path = os.path.join(directory, '{}-{}'.format(
+        name, datetime.datetime.utcnow().strftime('%Y%m%d%H%M%S%f')))
+    profiler = cProfile.Profile()
+    _events = []
+    profiler.enable()
+    try:
+        with span(name):
+            yield base_path
+    finally:
+        profiler.disable()
+        events, _events = _events, None
+        profiler.dump_stats('{}.prof'.format(base_path))
+        with open('{}.trace.json'.format(base_path), 'w') as f:
+            json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, f)
+
+
+def profiled(func, directory):
+    """Wrap the command ``func`` so it runs in ``profile``."""
+    name = func.__module__.rsplit('.', 1)[-1]
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        with profile(directory, name):
+            return func(*args, **kwargs)
+    return wrapper
@@ -0,0 +1,110 @@
+# -*- coding: utf-8 -*-
+# ###
+# Copyright (c) 2026, Rice University
+# This software is subject to the provisions of the GNU Affero General
+# Public License version 3 (AGPLv3).
+# See LICENCE.txt for details.
+# ###
+"""pytest fixtures giving tests a migrated database, see ``testdb``.
+
+Configure it in pytest.ini (or setup.cfg / tox.ini)::
+
+    [pytest]
+    dbmigrator_db_connection_string = dbname=postgres user=tester
+    dbmigrator_contexts = mypackage
+
+and use one of the fixtures:
+
+- ``dbmigrator_cursor``, a cursor of the migrated database of the session,
+  rolled back after the test
+- ``dbmigrator_database``, the connection string of the migrated database
+  of the session (of the worker with pytest-xdist)
+- ``dbmigrator_clone``, the connection string of a new migrated database
+  for the test
+"""
+
+import itertools
+import os
+
+import pytest
+
+from . import testdb, utils
+
+
+_database_numbers = itertools.count()
+
+
+def pytest_addoption(parser):
+    group = parser.getgroup('dbmigrator')
+    group.addoption('--dbmigrator-db-connection-string',
+                    help='A database of the server to create the migrated '
+                         'test databases in')
+    parser.addini('dbmigrator_db_connection_string',
+                  help='A database of the server to create the migrated '
+                       'test databases in')
+    parser.addini('dbmigrator_migrations_directories', type='linelist',
+                  help='The migrations directories')
+    parser.addini('dbmigrator_contexts', type='linelist',
+                  help='The packages with the migrations directories')
+
+
+def _database_name(*parts):
+    # the xdist worker and the process, so concurrent runs don't collide
+    worker = os.environ.get('PYTEST_XDIST_WORKER', 'main')
+    return '_'.join(['dbmigrator_test', worker, str(os.getpid())] +
+                    [str(p) for p in parts])
+
+
+@pytest.fixture(scope='session')
+def dbmigrator_db_connection_string(request):
+    """The database of the server the test databases are created from."""
+    config = request.config
+    db_connection_string = (
+        config.getoption('dbmigrator_db_connection_string') or
+        config.getini('dbmigrator_db_connection_string'))
+    if not db_connection_string:
+        raise pytest.UsageError(
+            'dbmigrator_db_connection_string is not configured')
+    return db_connection_string
+
+
+@pytest.fixture(scope='session')
+def dbmigrator_template(request, dbmigrator_db_connection_string):
+    """The name of the migrated template database."""
+    config = request.config
+    return testdb.create_template(
+        dbmigrator_db_connection_string,
+        config.getini('dbmigrator_migrations_directories'),
+        config.getini('dbmigrator_contexts'))
+
+
+@pytest.fixture(scope='session')
+def dbmigrator_database(dbmigrator_db_connection_string, dbmigrator_template):
+    """The connection string of a migrated database for the session."""
+    name = _database_name()
+    yield testdb.create_database(dbmigrator_db_connection_string,
+                                 dbmigrator_template, name)
+    testdb.drop_database(dbmigrator_db_connection_string, name)
+
+
+@pytest.fixture
+def dbmigrator_clone(dbmigrator_db_connection_string, dbmigrator_template):
+    """The connection string of a new migrated database for the test."""
+    name = _database_name(next(_database_numbers))
+    yield testdb.create_database(dbmigrator_db_connection_string,
+                                 dbmigrator_template, name)
+    testdb.drop_database(dbmigrator_db_connection_string, name)
+
+
+@pytest.fixture
+def dbmigrator_cursor(dbmigrator_database):
+    """A cursor of the migrated database of the session, rolled back after
+    the test, so the test must not commit.
+    """
+    db_conn = utils.get_driver().connect(dbmigrator_database)
+    try:
+        with db_conn.cursor() as cursor:
+            yield cursor
+    finally:
+        db_conn.rollback()
+        db_conn.close()
@@ -0,0 +1,148 @@
+# -*- coding: utf-8 -*-
+# ###
+# Copyright (c) 2026, Rice University
+# This software is subject to the provisions of the GNU Affero General
+# Public License version 3 (AGPLv3).
+# See LICENCE.txt for details.
+# ###
+"""Run independent migrations concurrently.
+
+Migrations declare what they need with module level variables::
+
+    # versions of the migrations that must run before this one
+    depends_on = ['20160228202637']
+    # the objects this migration changes
+    touches = ['a_table']
+
+A migration that declares neither is run on its own, after every migration
+before it and before every migration after it, as if the migrations were run
+one at a time.  A migration that declares either runs after the migrations
+it depends on, the earlier migrations that touch the same objects and the
+last undeclared migration before it.
+"""
+
+import threading
+
+from . import utils
+
+
+__all__ = ('build_graph', 'run_in_parallel')
+
+
+def _is_declared(migration):
+    return bool(getattr(migration, 'depends_on', None) or
+                getattr(migration, 'touches', None))
+
+
+def build_graph(migrations):
+    """Given (version, migration_name, migration) in filename order, return
+    version -> set of the versions that must be run before it.
+    """
+    versions = [version for version, _, _ in migrations]
+    graph = dict((version, set()) for version in versions)
+
+    barrier = None
+    # migrations since the last barrier
+    since_barrier = []
+    touched_by = {}
+    for version, _, migration in migrations:
+        if not _is_declared(migration):
+            graph[version].update(since_barrier)
+            if barrier is not None:
+                graph[version].add(barrier)
+            barrier = version
+            since_barrier = []
+            touched_by = {}
+            continue
+
+        if barrier is not None:
+            graph[version].add(barrier)
+        for dependency in migration.depends_on:
+            # dependencies that are not pending have already been applied
+            if dependency in graph:
+                graph[version].add(dependency)
+        for name in migration.touches:
+            graph[version].update(touched_by.get(name, ()))
+            touched_by.setdefault(name, []).append(version)
+        since_barrier.append(version)
+
+    _check_acyclic(graph)
+    return graph
+
+
+def _check_acyclic(graph):
+    visiting, visited = set(), set()
+
+    def visit(version, path):
+        if version in visited:
+            return
+        if version in visiting:
+            raise Exception('Circular migration dependencies: {}'.format(
+                ' -> '.join(path + [version])))
+        visiting.add(version)
+        for dependency in sorted(graph[version]):
+            visit(dependency, path + [version])
+        visiting.discard(version)
+        visited.add(version)
+
+    for version in sorted(graph):
+        visit(version, [])
+
+
+def run_in_parallel(migrations, jobs, db_connection_string, callback):
+    """Call ``callback(cursor, version, migration_name, migration)`` for all
+    the ``migrations`` using ``jobs`` threads, each with its own database
+    connection, respecting the dependencies between migrations.
+
+    Once a migration fails, no more migrations are started and the first
+    error is raised after the running ones finish.
+    """
+    graph = build_graph(migrations)
+    by_version = dict((m[0], m) for m in migrations)
+    order = [m[0] for m in migrations]
+    condition = threading.Condition()
+    done, running, errors = set(), set(), []
+    # e.g. --trace-sql
+    wrappers = list(utils.cursor_wrappers())
+
+    def next_version():
+        # with the condition acquired
+        while not errors and len(done) + len(running) < len(order):
+            for version in order:
+                if version not in done and version not in running and \
+                        graph[version] <= done:
+                    running.add(version)
+                    return version
+            condition.wait()
+
+    def worker():
+        with utils.thread_cursor_wrappers(wrappers), \
+                utils.connect(db_connection_string) as db_conn:
+            with db_conn.cursor() as cursor:
+                while True:
+                    with condition:
+                        version = next_version()
+                    if version is None:
+                        return
+                    try:
+                        callback(cursor, *by_version[version])
+                    except Exception as e:
+                        with condition:
+                            errors.append(e)
+                        db_conn.rollback()
+                    else:
+                        with condition:
+                            done.add(version)
+                    finally:
+                        with condition:
+                            running.discard(version)
+                            condition.notify_all()
+
+    threads = [threading.Thread(target=worker)
+               for _ in range(min(jobs, len(order)))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    if errors:
+        raise errors[0]
@@ -0,0 +1,389 @@
+# -*- coding: utf-8 -*-
+# ###
+# Copyright (c) 2026, Rice University
+# This software is subject to the provisions of the GNU Affero General
+# Public License version 3 (AGPLv3).
+# See LICENCE.txt for details.
+# ###
+"""Snapshot the database schema from pg_catalog and diff the snapshots."""
+
+import difflib
+import re
+
+from . import profiling, utils
+from .cursors import CursorProxy
+
+
+__all__ = ('SCHEMA_DIFF_MODES', 'snapshot', 'diff', 'summarize',
+           'referenced_names', 'SchemaTracker')
+
+
+SCHEMA_DIFF_MODES = ('full', 'touched', 'summary', 'off')
+
+
+# Objects in these schemas are never part of the diff.
+_SCHEMA_FILTER = """\
+n.nspname !~ '^pg_' AND n.nspname <> 'information_schema'"""
+
+# Objects created by an extension are dumped as the extension itself.
+_NOT_EXTENSION_MEMBER = """\
+NOT EXISTS (SELECT 1 FROM pg_depend dep
+            WHERE dep.objid = {}.oid AND dep.deptype = 'e')"""
+
+# Leave objects in "public" unqualified, like pg_dump used to.
+_QUALIFIED = """\
+CASE WHEN n.nspname = 'public' THEN ''
+     ELSE quote_ident(n.nspname) || '.' END || quote_ident({})"""
+
+# Every query returns (kind, schema, table, name, definition).  "table" is
+# the relation an object belongs to, or the object name itself.
+_QUERIES = (
+    """\
+SELECT 'SCHEMA', n.nspname::text, n.nspname::text, n.nspname::text,
+       'CREATE SCHEMA ' || quote_ident(n.nspname) || E';\\n' ||
+       'ALTER SCHEMA ' || quote_ident(n.nspname) || ' OWNER TO ' ||
+       quote_ident(pg_get_userbyid(n.nspowner)) || ';'
+FROM pg_namespace n
+WHERE {schema_filter} AND n.nspname <> 'public'
+""",
+    """\
+SELECT CASE c.relkind WHEN 'c' THEN 'TYPE' ELSE 'TABLE' END,
+       n.nspname::text, c.relname::text, c.relname::text,
+       CASE c.relkind WHEN 'c' THEN 'CREATE TYPE '
+                      WHEN 'f' THEN 'CREATE FOREIGN TABLE '
+                      ELSE 'CREATE TABLE ' END ||
+       {qualified_rel} || E' (\\n' ||
+       coalesce(string_agg(
+           '    ' || quote_ident(a.attname) || ' ' ||
+           format_type(a.atttypid, a.atttypmod) ||
+           CASE WHEN a.attnotnull THEN ' NOT NULL' ELSE '' END ||
+           coalesce(' DEFAULT ' || pg_get_expr(d.adbin, d.adrelid), ''),
+           E',\\n' ORDER BY a.attnum), '') || E'\\n);\\n' ||
+       'ALTER TABLE ' || {qualified_rel} || ' OWNER TO ' ||
+       quote_ident(pg_get_userbyid(c.relowner)) || ';' ||
+       coalesce(E'\\n-- Privileges: ' || c.relacl::text, '')
+FROM pg_class c
+JOIN pg_namespace n ON n.oid = c.relnamespace
+LEFT JOIN pg_attribute a
+    ON a.attrelid = c.oid AND a.attnum > 0 AND NOT a.attisdropped
+LEFT JOIN pg_attrdef d ON d.adrelid = c.oid AND d.adnum = a.attnum
+WHERE c.relkind IN ('r', 'p', 'f', 'c') AND {schema_filter}
+    AND {not_extension_member_c}
+GROUP BY n.nspname, c.oid, c.relname, c.relkind, c.relowner, c.relacl
+""",
+    """\
+SELECT 'VIEW', n.nspname::text, c.relname::text, c.relname::text,
+       CASE c.relkind WHEN 'm' THEN 'CREATE MATERIALIZED VIEW '
+                      ELSE 'CREATE VIEW ' END ||
+       {qualified_rel} || E' AS\\n' || pg_get_viewdef(c.oid) || E'\\n' ||
+       'ALTER TABLE ' || {qualified_rel} || ' OWNER TO ' ||
+       quote_ident(pg_get_userbyid(c.relowner)) || ';' ||
+       coalesce(E'\\n-- Privileges: ' || c.relacl::text, '')
+FROM pg_class c
+JOIN pg_namespace n ON n.oid = c.relnamespace
+WHERE c.relkind IN ('v', 'm') AND {schema_filter}
+    AND {not_extension_member_c}
+""",
+    """\
+SELECT 'SEQUENCE', n.nspname::text, c.relname::text, c.relname::text,
+       'CREATE SEQUENCE ' || {qualified_rel} || E';\\n' ||
+       'ALTER TABLE ' || {qualified_rel} || ' OWNER TO ' ||
+       quote_ident(pg_get_userbyid(c.relowner)) || ';' ||
+       coalesce(E'\\n-- Privileges: ' || c.relacl::text, '')
+FROM pg_class c
+JOIN pg_namespace n ON n.oid = c.relnamespace
+WHERE c.relkind = 'S' AND {schema_filter} AND {not_extension_member_c}
+""",
+    """\
+SELECT 'INDEX', n.nspname::text, t.relname::text, c.relname::text,
+       pg_get_indexdef(i.indexrelid) || ';'
+FROM pg_index i
+JOIN pg_class c ON c.oid = i.indexrelid
+JOIN pg_class t ON t.oid = i.indrelid
+JOIN pg_namespace n ON n.oid = c.relnamespace
+WHERE {schema_filter} AND {not_extension_member_c}
+    AND NOT EXISTS (SELECT 1 FROM pg_constraint co
+                    WHERE co.conindid = i.indexrelid)
+""",
+    """\
+SELECT 'CONSTRAINT', n.nspname::text, t.relname::text, co.conname::text,
+       'ALTER TABLE ONLY ' || {qualified_t} || E'\\n' ||
+       '    ADD CONSTRAINT ' || quote_ident(co.conname) || ' ' ||
+       pg_get_constraintdef(co.oid) || ';'
+FROM pg_constraint co
+JOIN pg_class t ON t.oid = co.conrelid
+JOIN pg_namespace n ON n.oid = t.relnamespace
+WHERE {schema_filter} AND {not_extension_member_t}
+""",
+    """\
+SELECT 'TRIGGER', n.nspname::text, t.relname::text, tg.tgname::text,
+       pg_get_triggerdef(tg.oid) || ';'
+FROM pg_trigger tg
+JOIN pg_class t ON t.oid = tg.tgrelid
+JOIN pg_namespace n ON n.oid = t.relnamespace
+WHERE NOT tg.tgisinternal AND {schema_filter}
+    AND {not_extension_member_t}
+""",
+    """\
+SELECT 'FUNCTION', n.nspname::text, p.proname::text,
+       p.proname || '(' || pg_get_function_identity_arguments(p.oid) || ')',
+       pg_get_functiondef(p.oid)
+FROM pg_proc p
+JOIN pg_namespace n ON n.oid = p.pronamespace
+WHERE {schema_filter} AND {not_extension_member_p}
+    AND p.oid NOT IN (SELECT aggfnoid FROM pg_aggregate)
+""",
+    """\
+SELECT 'TYPE', n.nspname::text, t.typname::text, t.typname::text,
+       CASE t.typtype
+           WHEN 'e' THEN 'CREATE TYPE ' || {qualified_typ} || ' AS ENUM (' ||
+               (SELECT string_agg(quote_literal(e.enumlabel), ', '
+                                  ORDER BY e.enumsortorder)
+                FROM pg_enum e WHERE e.enumtypid = t.oid) || ');'
+           ELSE 'CREATE DOMAIN ' || {qualified_typ} || ' AS ' ||
+               format_type(t.typbasetype, t.typtypmod) ||
+               CASE WHEN t.typnotnull THEN ' NOT NULL' ELSE '' END ||
+               coalesce(' DEFAULT ' || t.typdefault, '') || ';'
+       END
+FROM pg_type t
+JOIN pg_namespace n ON n.oid = t.typnamespace
+WHERE t.typtype IN ('e', 'd') AND {schema_filter}
+    AND {not_extension_member_typ}
+""",
+    """\
+SELECT 'EXTENSION', n.nspname::text, x.extname::text, x.extname::text,
+       'CREATE EXTENSION IF NOT EXISTS ' || quote_ident(x.extname) ||
+       ' WITH SCHEMA ' || quote_ident(n.nspname) || ';'
+FROM pg_extension x
+JOIN pg_namespace n ON n.oid = x.extnamespace
+WHERE x.extname <> 'plpgsql'
+""",
+    )
+
+SNAPSHOT_QUERY = '\nUNION ALL\n'.join(_QUERIES).format(
+    schema_filter=_SCHEMA_FILTER,
+    qualified_rel=_QUALIFIED.format('c.relname'),
+    qualified_t=_QUALIFIED.format('t.relname'),
+    qualified_typ=_QUALIFIED.format('t.typname'),
+    not_extension_member_c=_NOT_EXTENSION_MEMBER.format('c'),
+    not_extension_member_t=_NOT_EXTENSION_MEMBER.format('t'),
+    not_extension_member_p=_NOT_EXTENSION_MEMBER.format('p'),
+    not_extension_member_typ=_NOT_EXTENSION_MEMBER.format('t'),
+    )
+
+
+_FILTERED_SNAPSHOT_QUERY = """\
+SELECT * FROM ({}) s (kind, nsp, tbl, name, definition)
+WHERE s.nsp = ANY(%(schemas)s::text[]) OR s.tbl = ANY(%(names)s::text[])
+    OR s.name = ANY(%(names)s::text[])""".format(SNAPSHOT_QUERY)
+
+_IDENTIFIER = r'(?:"[^"]+"|[\w$]+)'
+
+# A lookahead so that "ON TABLE a_table" yields both "table" and "a_table".
+_REFERENCE_RE = re.compile(r"""
+    \b(?=(SCHEMA|TABLE|VIEW|INDEX|SEQUENCE|TYPE|DOMAIN|FUNCTION|TRIGGER|
+          EXTENSION|COLUMN|INTO|UPDATE|FROM|JOIN|ON|REFERENCES|RENAME\s+TO)\s+
+       (?:CONCURRENTLY\s+)?(?:IF\s+(?:NOT\s+)?EXISTS\s+)?(?:ONLY\s+)?
+       ({0}(?:\s*\.\s*{0})*))""".format(_IDENTIFIER), re.I | re.X)
+
+# The keywords captured as names by _REFERENCE_RE, e.g. "table" in "ON TABLE
+# a_table" or "conflict" in "ON CONFLICT"
+_KEYWORDS = frozenset("""
+    all as column conflict default delete domain extension foreign from
+    function functions index insert join lateral materialized on only
+    routines schema schemas select sequence sequences set table tables temp
+    temporary trigger type types unlogged update values view with""".split())
+
+# Anonymous code blocks, e.g. DO $$ ... $$, which can change anything
+_DO_BLOCK_RE = re.compile(r"\bDO\s+(?:LANGUAGE\s+\w+\s+)?(?:\$\w*\$|')", re.I)
+
+# The first word of each statement, the statements starting with one of
+# _CHANGES changing the objects they name
+_VERB_RE = re.compile(r'(?:^|;)\s*(\w+)')
+_CHANGES = frozenset("""
+    alter cluster comment create delete drop grant insert refresh reindex
+    revoke truncate update vacuum""".split())
+
+
+def snapshot(cursor, schemas=None, names=None):
+    """Return the schema visible to ``cursor`` as a dictionary of
+    (schema, table, kind, name) -> definition.
+
+    If ``schemas`` or ``names`` are given, only the objects in one of the
+    ``schemas``, or named or belonging to a relation named in ``names`` are
+    included.
+    """
+    with profiling.span('schema snapshot'):
+        if schemas is None and names is None:
+            cursor.execute(SNAPSHOT_QUERY)
+        else:
+            cursor.execute(_FILTERED_SNAPSHOT_QUERY, {
+                'schemas': sorted(schemas or []),
+                'names': sorted(names or []),
+                })
+        return {(schema, table, kind, name): definition
+                for kind, schema, table, name, definition
+                in cursor.fetchall()}
+
+
+def _in_scope(key, schemas, names):
+    schema, table, _, name = key
+    return schema in schemas or table in names or name in names
+
+
+def _unquote(identifier):
+    if identifier.startswith('"'):
+        return identifier[1:-1]
+    return identifier.lower()
+
+
+def referenced_names(statements):
+    """Return the (schemas, names) referenced by the SQL ``statements``, or
+    ``None`` if they can't be told from the statements, e.g. in a DO block.
+    """
+    schemas, names = set(), set()
+    for statement in statements:
+        verbs = set(verb.lower() for verb in _VERB_RE.findall(statement))
+        if _DO_BLOCK_RE.search(statement) or \
+                verbs & set(['call', 'do', 'execute']):
+            return None
+        found = False
+        for keyword, reference in _REFERENCE_RE.findall(statement):
+            parts = [_unquote(part.strip()) for part in
+                     re.findall(_IDENTIFIER, reference)]
+            if not reference.startswith('"') and parts[0] in _KEYWORDS:
+                continue
+            keyword = keyword.upper()
+            if keyword == 'COLUMN':
+                # table.column or schema.table.column
+                if len(parts) < 2:
+                    continue
+                parts.pop()
+            found = True
+            if keyword == 'SCHEMA':
+                schemas.add(parts[-1])
+            else:
+                names.add(parts[-1])
+        if not found and verbs & _CHANGES:
+            # a change the regular expressions don't understand
+            return None
+    return schemas, names
+
+
+def _lines(definition):
+    if definition is None:
+        return []
+    return '{}\n'.format(definition.rstrip('\n')).splitlines(True)
+
+
+def diff(old, new):
+    """Return a unified diff of the objects that differ between two
+    snapshots, one hunk group per object.
+    """
+    result = []
+    for key in sorted(set(old) | set(new)):
+        before, after = old.get(key), new.get(key)
+        if before == after:
+            continue
+        schema, _, kind, name = key
+        label = '{} {}.{}'.format(kind, schema, name)
+        result.extend(difflib.unified_diff(
+            _lines(before), _lines(after), label, label, n=10))
+    return ''.join(result)
+
+
+def summarize(old, new):
+    """Return one line per object that differs between two snapshots."""
+    result = []
+    for key in sorted(set(old) | set(new)):
+        before, after = old.get(key), new.get(key)
+        if before == after:
+            continue
+        schema, _, kind, name = key
+        change = before is None and '+' or after is None and '-' or '~'
+        result.append('{} {} {}.{}\n'.format(change, kind, schema, name))
+    return ''.join(result)
+
+
+class _RecordingCursor(CursorProxy):
+    """Pass everything through to ``cursor``, appending the statements
+    executed to ``statements``.
+    """
+
+    def __init__(self, cursor, statements):
+        super(_RecordingCursor, self).__init__(cursor)
+        self._statements = statements
+
+    def _record(self, query):
+        if hasattr(query, 'as_string'):
+            # psycopg2.sql or psycopg.sql Composable
+            query = query.as_string(self._cursor)
+        if isinstance(query, bytes):
+            query = query.decode('utf-8', 'replace')
+        self._statements.append(query)
+
+    def _execute(self, method, query, vars, many=False):
+        self._record(query)
+        return method(query, vars)
+
+
+class SchemaTracker(object):
+    """Log the schema changes made by a sequence of migrations.
+
+    The snapshot taken after a migration is reused as the snapshot before
+    the next one, so running N migrations takes N + 1 snapshots.
+
+    ``mode`` is one of:
+
+    - "full": diff every object in the database
+    - "touched": diff only the schemas and relations referenced by the
+      statements the migration executed, only those are snapshotted again,
+      or everything if they can't be told (e.g. DO blocks)
+    - "summary": list the objects that changed without diffing them
+    - "off": don't look at the schema at all
+    """
+
+    def __init__(self, cursor, mode='full'):
+        if mode not in SCHEMA_DIFF_MODES:
+            raise ValueError('Unknown schema diff mode "{}"'.format(mode))
+        self.cursor = cursor
+        self.mode = mode
+        self._snapshot = None
+
+    def compare(self, callback, *args, **kwargs):
+        if self.mode == 'off':
+            return callback(*args, **kwargs)
+
+        if self._snapshot is None:
+            self._snapshot = snapshot(self.cursor)
+        old_snapshot = self._snapshot
+
+        if self.mode == 'touched':
+            statements = []
+            with utils.cursor_wrapper(
+                    lambda cursor: _RecordingCursor(cursor, statements)):
+                result = callback(*args, **kwargs)
+            references = referenced_names(statements)
+            if references is None:
+                new_snapshot = snapshot(self.cursor)
+            else:
+                schemas, names = references
+                new_snapshot = {
+                    key: definition
+                    for key, definition in old_snapshot.items()
+                    if not _in_scope(key, schemas, names)}
+                if schemas or names:
+                    new_snapshot.update(snapshot(self.cursor, schemas, names))
+        else:
+            result = callback(*args, **kwargs)
+            new_snapshot = snapshot(self.cursor)
+        self._snapshot = new_snapshot
+
+        with profiling.span('schema diff'):
+            if self.mode == 'summary':
+                changes = summarize(old_snapshot, new_snapshot)
+            else:
+                changes = diff(old_snapshot, new_snapshot)
+        if changes:
+            utils.logger.info(changes)
+        return result
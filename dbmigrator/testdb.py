@@ -0,0 +1,147 @@
+# -*- coding: utf-8 -*-
+# ###
+# Copyright (c) 2026, Rice University
+# This software is subject to the provisions of the GNU Affero General
+# Public License version 3 (AGPLv3).
+# See LICENCE.txt for details.
+# ###
+"""Migrated databases for tests.
+
+The migrations are run once in a template database, named after a hash of
+the migration files, and each test database is a copy of it made with
+``CREATE DATABASE ... TEMPLATE``, which takes milliseconds instead of
+running the migrations again.  The pytest plugin in
+``dbmigrator.pytest_plugin`` provides them as fixtures.
+"""
+
+from contextlib import contextmanager
+import glob
+import hashlib
+import os
+
+from . import utils
+
+
+__all__ = ('migrations_hash', 'create_template', 'create_database',
+           'drop_database')
+
+
+TEMPLATE_PREFIX = 'dbmigrator_template_'
+
+
+def _migration_directories(migration_directories, contexts):
+    migration_directories = list(migration_directories or ())
+    if contexts:
+        settings = {}
+        utils.get_settings_from_entry_points(settings, contexts)
+        context_directories = settings.get('migrations_directory') or []
+        if not isinstance(context_directories, list):
+            context_directories = [context_directories]
+        migration_directories.extend(context_directories)
+    return migration_directories
+
+
+def migrations_hash(migration_directories):
+    """Return a hash of the names and contents of the migration files."""
+    paths = []
+    for md in migration_directories:
+        paths.extend(glob.glob(os.path.join(md, '*.py')))
+    h = hashlib.sha1()
+    for path in sorted(paths, key=os.path.basename):
+        h.update(os.path.basename(path).encode('utf-8'))
+        with open(path, 'rb') as f:
+            h.update(f.read())
+    return h.hexdigest()[:12]
+
+
+def with_dbname(db_connection_string, dbname):
+    """Return ``db_connection_string`` connecting to ``dbname``."""
+    return utils.get_driver().make_dsn(db_connection_string, dbname=dbname)
+
+
+@contextmanager
+def _autocommit_cursor(db_connection_string):
+    # CREATE DATABASE can't run inside a transaction
+    db_conn = utils.get_driver().connect(db_connection_string)
+    try:
+        db_conn.autocommit = True
+        with db_conn.cursor() as cursor:
+            yield cursor
+    finally:
+        db_conn.close()
+
+
+def _database_exists(cursor, name):
+    cursor.execute('SELECT 1 FROM pg_database WHERE datname = %s', (name,))
+    return cursor.fetchone() is not None
+
+
+def _migrate(db_connection_string, migration_directories, contexts):
+    from . import cli
+
+    args = ['--db-connection-string', db_connection_string,
+            '--schema-diff', 'off']
+    for md in migration_directories:
+        args.extend(['--migrations-directory', md])
+    # the other settings of the contexts, e.g. super_user
+    for context in contexts or ():
+        args.extend(['--context', context])
+    cli.main(args + ['init', '--version', '0'])
+    cli.main(args + ['migrate'])
+
+
+def create_template(db_connection_string, migration_directories=None,
+                    contexts=None):
+    """Return the name of the template database with the migrations in
+    ``migration_directories`` and ``contexts`` run, creating it unless it
+    exists.  ``db_connection_string`` is any database of the server.
+
+    The template is migrated under another name and renamed when done, so
+    an interrupted run doesn't leave a partly migrated template behind.
+    Concurrent runs, e.g. pytest-xdist workers, wait for the one creating
+    the template.
+    """
+    migration_directories = _migration_directories(migration_directories,
+                                                   contexts)
+    name = TEMPLATE_PREFIX + migrations_hash(migration_directories)
+    sql = utils.get_driver().sql
+    with _autocommit_cursor(db_connection_string) as cursor:
+        cursor.execute('SELECT pg_advisory_lock(hashtext(%s))', (name,))
+        try:
+            if not _database_exists(cursor, name):
+                building = '{}_build'.format(name)
+                utils.logger.info('Creating the template database {}'
+                                  .format(name))
+                cursor.execute(sql.SQL('DROP DATABASE IF EXISTS {}').format(
+                    sql.Identifier(building)))
+                cursor.execute(sql.SQL('CREATE DATABASE {}').format(
+                    sql.Identifier(building)))
+                _migrate(with_dbname(db_connection_string, building),
+                         migration_directories, contexts)
+                cursor.execute(sql.SQL('ALTER DATABASE {} RENAME TO {}')
+                               .format(sql.Identifier(building),
+                                       sql.Identifier(name)))
+        finally:
+            cursor.execute('SELECT pg_advisory_unlock(hashtext(%s))',
+                           (name,))
+    return name
+
+
+def create_database(db_connection_string, template, name):
+    """Create the database ``name``, a copy of ``template``, replacing it if
+    it exists, and return its connection string.
+    """
+    sql = utils.get_driver().sql
+    with _autocommit_cursor(db_connection_string) as cursor:
+        cursor.execute(sql.SQL('DROP DATABASE IF EXISTS {}').format(
+            sql.Identifier(name)))
+        cursor.execute(sql.SQL('CREATE DATABASE {} TEMPLATE {}').format(
+            sql.Identifier(name), sql.Identifier(template)))
+    return with_dbname(db_connection_string, name)
+
+
+def drop_database(db_connection_string, name):
+    sql = utils.get_driver().sql
+    with _autocommit_cursor(db_connection_string) as cursor:
+        cursor.execute(sql.SQL('DROP DATABASE IF EXISTS {}').format(
+            sql.Identifier(name)))
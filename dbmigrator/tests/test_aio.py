@@ -0,0 +1,204 @@
+# -*- coding: utf-8 -*-
+# ###
+# Copyright (c) 2026, Rice University
+# This software is subject to the provisions of the GNU Affero General
+# Public License version 3 (AGPLv3).
+# See LICENCE.txt for details.
+# ###
+
+import sys
+import threading
+import unittest
+try:
+    from unittest import mock
+except ImportError:
+    import mock
+
+from . import testing
+from ..utils import db_connect
+
+
+has_aio = testing.has_psycopg and sys.version_info >= (3, 8)
+
+
+def fake_connection():
+    import psycopg
+
+    db_conn = mock.Mock(spec=psycopg.AsyncConnection, autocommit=False)
+    cursor = mock.MagicMock()
+    cursor.execute = mock.AsyncMock()
+    cursor.fetchone = mock.AsyncMock(return_value=(1,))
+    cursor.__aenter__.return_value = cursor
+    return db_conn, cursor
+
+
+@unittest.skipUnless(has_aio, 'psycopg 3 and Python 3.8 are required')
+class AioTestCase(unittest.TestCase):
+    def test_status(self):
+        import asyncio
+        from .. import aio
+
+        db_conn, async_cursor = fake_connection()
+        drivers = []
+
+        def get_unapplied_migrations(migrations_directories, cursor):
+            from .. import utils
+            drivers.append(utils.get_driver().name)
+            cursor.execute('SELECT 1')
+            self.assertEqual((1,), cursor.fetchone())
+            return [('20160228202637', 'add_table', None)]
+
+        with mock.patch('psycopg.AsyncClientCursor',
+                        return_value=async_cursor), \
+                mock.patch('dbmigrator.utils.get_unapplied_migrations',
+                           side_effect=get_unapplied_migrations):
+            unapplied = asyncio.run(aio.status(db_conn, ['migrations']))
+
+        self.assertEqual([('20160228202637', 'add_table')], unapplied)
+        # psycopg in the worker thread only
+        self.assertEqual(['psycopg'], drivers)
+        async_cursor.execute.assert_awaited_once_with('SELECT 1', None)
+        db_conn.rollback.assert_awaited_once_with()
+
+    def test_migrate_pool(self):
+        import asyncio
+        from .. import aio
+
+        db_conn, async_cursor = fake_connection()
+        pool = mock.MagicMock()
+        pool.connection.return_value.__aenter__.return_value = db_conn
+        migration = object()
+
+        with mock.patch('psycopg.AsyncClientCursor',
+                        return_value=async_cursor), \
+                mock.patch('dbmigrator.utils.migration_lock'), \
+                mock.patch('dbmigrator.utils.MigrationState.load'), \
+                mock.patch('dbmigrator.utils.get_pending_migrations',
+                           return_value=[('1', 'a', migration),
+                                         ('2', 'b', migration)]), \
+                mock.patch('dbmigrator.utils.run_migration',
+                           side_effect=[None, 'metrics']) as run_migration:
+            migrated = asyncio.run(aio.migrate(pool, ['migrations']))
+
+        # the first migration was skipped
+        self.assertEqual([('2', 'b')], migrated)
+        self.assertEqual(2, run_migration.call_count)
+        self.assertFalse(db_conn.rollback.called)
+
+    def test_cancel(self):
+        import asyncio
+        from .. import aio
+
+        db_conn, async_cursor = fake_connection()
+        started = threading.Event()
+        errors = []
+
+        def func(cursor, *args):
+            started.set()
+            try:
+                cursor.connection.run(asyncio.sleep(10))
+            except BaseException as e:
+                errors.append(e)
+                raise
+            cursor.execute('SELECT 1')
+
+        with mock.patch('psycopg.AsyncClientCursor',
+                        return_value=async_cursor), \
+                mock.patch('dbmigrator.aio._migrate', side_effect=func):
+            with self.assertRaises(asyncio.TimeoutError):
+                asyncio.run(asyncio.wait_for(
+                    aio.migrate(db_conn, ['migrations']), 0.2))
+
+        self.assertTrue(started.is_set())
+        self.assertEqual(1, len(errors))
+        # rolled back and the migration lock released
+        db_conn.rollback.assert_awaited_once_with()
+        self.assertIn('pg_advisory_unlock',
+                      async_cursor.execute.call_args[0][0])
+        db_conn.commit.assert_awaited_once_with()
+
+    def test_super_user(self):
+        import asyncio
+        from .. import aio, utils
+
+        db_conn, async_cursor = fake_connection()
+        db_conn.info.dsn = 'dbname=a user=app'
+        super_conn, super_cursor = fake_connection()
+        super_conn.commit = mock.AsyncMock()
+        super_conn.close = mock.AsyncMock()
+        super_cursor.close = mock.AsyncMock()
+
+        def migrate(cursor, *args):
+            with utils.super_user() as cursor:
+                cursor.execute('CREATE EXTENSION hstore')
+
+        with mock.patch('psycopg.AsyncClientCursor',
+                        side_effect=[async_cursor, super_cursor]), \
+                mock.patch('psycopg.AsyncConnection.connect',
+                           new=mock.AsyncMock(return_value=super_conn)) \
+                as connect, \
+                mock.patch('dbmigrator.aio._migrate', side_effect=migrate):
+            asyncio.run(aio.migrate(db_conn, ['migrations'],
+                                    super_user='admin'))
+
+        connect.assert_awaited_once_with('dbname=a user=app', user='admin')
+        super_cursor.execute.assert_awaited_once_with(
+            'CREATE EXTENSION hstore', None)
+        super_conn.commit.assert_awaited_once_with()
+        super_conn.close.assert_awaited_once_with()
+
+    def test_autocommit(self):
+        import asyncio
+        from .. import aio
+
+        db_conn, async_cursor = fake_connection()
+        db_conn.autocommit = True
+        with self.assertRaises(Exception) as cm:
+            asyncio.run(aio.status(db_conn, ['migrations']))
+        self.assertEqual('The connection must not be in autocommit mode',
+                         str(cm.exception))
+
+
+@unittest.skipUnless(has_aio, 'psycopg 3 and Python 3.8 are required')
+class AioDatabaseTestCase(unittest.TestCase):
+    def setUp(self):
+        with db_connect(testing.db_connection_string) as db_conn:
+            with db_conn.cursor() as cursor:
+                cursor.execute("""
+CREATE TABLE schema_migrations (
+    version TEXT NOT NULL,
+    applied TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
+)""")
+
+    def tearDown(self):
+        with db_connect(testing.db_connection_string) as db_conn:
+            with db_conn.cursor() as cursor:
+                cursor.execute('DROP TABLE IF EXISTS a_table')
+                cursor.execute('DROP TABLE IF EXISTS schema_migrations')
+
+    def test_migrate(self):
+        import asyncio
+        import psycopg
+        from .. import aio
+
+        migrations_directories = testing.test_migrations_directories
+
+        loop = asyncio.new_event_loop()
+        self.addCleanup(loop.close)
+        db_conn = loop.run_until_complete(psycopg.AsyncConnection.connect(
+            testing.db_connection_string))
+        try:
+            unapplied = loop.run_until_complete(
+                aio.status(db_conn, migrations_directories))
+            migrated = loop.run_until_complete(
+                aio.migrate(db_conn, migrations_directories))
+            unapplied_after = loop.run_until_complete(
+                aio.status(db_conn, migrations_directories))
+        finally:
+            loop.run_until_complete(db_conn.close())
+        expected = [('20160228202637', 'add_table'),
+                    ('20160228210326', 'initial_data'),
+                    ('20160228212456', 'cool_stuff')]
+        self.assertEqual(expected, unapplied)
+        self.assertEqual(expected, migrated)
+        self.assertEqual([], unapplied_after)
@@ -0,0 +1,66 @@
+# -*- coding: utf-8 -*-
+# ###
+# Copyright (c) 2026, Rice University
+# This software is subject to the provisions of the GNU Affero General
+# Public License version 3 (AGPLv3).
+# See LICENCE.txt for details.
+# ###
+
+import io
+import os
+import shutil
+import tempfile
+import unittest
+try:
+    from unittest import mock
+except ImportError:
+    import mock
+
+
+# pg_dump 17.6 output, with psql meta-commands
+PG_DUMP = u'''\
+--
+-- PostgreSQL database dump
+--
+
+\\restrict 9TeYhD0NBzBvt2ukAG4JKOuQEKH
+
+SET statement_timeout = 0;
+CREATE TABLE public.a_table (
+    name text
+);
+
+\\unrestrict 9TeYhD0NBzBvt2ukAG4JKOuQEKH
+'''
+
+
+class BaselineTestCase(unittest.TestCase):
+    def setUp(self):
+        tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp_dir)
+        self.path = os.path.join(tmp_dir, 'baseline.sql')
+
+    def test_write_strips_meta_commands(self):
+        from ..baseline import write_baseline, read_baseline
+
+        with mock.patch('subprocess.check_output',
+                        return_value=PG_DUMP.encode('utf-8')):
+            write_baseline(self.path, 'dbname=a', '20170810093842',
+                           {'20170810093842': 'applied'})
+        header, statements = read_baseline(self.path)
+        self.assertEqual(['20170810093842'], header['versions'])
+        self.assertNotIn('restrict', statements)
+        self.assertIn('CREATE TABLE public.a_table', statements)
+
+    def test_load_strips_meta_commands(self):
+        from ..baseline import HEADER, load_baseline
+
+        # a baseline written by an older version
+        with io.open(self.path, 'w', encoding='utf-8') as f:
+            f.write(HEADER + u'{"version": "20170810093842"}\n' + PG_DUMP)
+        cursor = mock.Mock()
+        load_baseline(cursor, self.path)
+        statements = cursor.execute.call_args_list[0][0][0]
+        self.assertNotIn('restrict', statements)
+        self.assertIn('SET statement_timeout = 0;', statements)
+        cursor.execute.assert_called_with('RESET ALL')
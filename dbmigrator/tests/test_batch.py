@@ -0,0 +1,128 @@
+# -*- coding: utf-8 -*-
+# ###
+# Copyright (c) 2026, Rice University
+# This software is subject to the provisions of the GNU Affero General
+# Public License version 3 (AGPLv3).
+# See LICENCE.txt for details.
+# ###
+
+import unittest
+try:
+    from unittest import mock
+except ImportError:
+    import mock
+
+from . import testing
+from ..utils import db_connect
+
+
+class BackfillTestCase(unittest.TestCase):
+    def setUp(self):
+        import dbmigrator
+        _logger = dbmigrator.utils.logger
+        self.addCleanup(setattr, dbmigrator.utils, 'logger', _logger)
+        self.logger = dbmigrator.utils.logger = mock.Mock()
+
+        with db_connect(testing.db_connection_string) as db_conn:
+            with db_conn.cursor() as cursor:
+                cursor.execute("""\
+                    CREATE TABLE a_table (id INTEGER PRIMARY KEY, name TEXT)
+                    """)
+                cursor.execute("""\
+                    INSERT INTO a_table
+                        SELECT i, 'name' || i FROM generate_series(1, 25) i
+                    """)
+
+    def tearDown(self):
+        with db_connect(testing.db_connection_string) as db_conn:
+            with db_conn.cursor() as cursor:
+                cursor.execute('DROP TABLE a_table')
+                cursor.execute('DROP TABLE IF EXISTS dbmigrator_checkpoints')
+
+    @property
+    def target(self):
+        from ..batch import backfill
+        return backfill
+
+    def test(self):
+        from ..utils import _running_migration
+
+        progress = mock.Mock()
+        with db_connect(testing.db_connection_string) as db_conn:
+            with db_conn.cursor() as cursor, \
+                    _running_migration('20170810093842'):
+                self.assertEqual(25, self.target(
+                    cursor, 'a_table', """\
+                        UPDATE a_table SET name = upper(name)
+                        WHERE id BETWEEN %(start)s AND %(end)s""",
+                    batch_size=10, progress=progress))
+
+                cursor.execute("SELECT count(*) FROM a_table "
+                               "WHERE name LIKE 'NAME%'")
+                self.assertEqual(25, cursor.fetchone()[0])
+                cursor.execute('SELECT * FROM dbmigrator_checkpoints')
+                self.assertEqual([], cursor.fetchall())
+
+        self.assertEqual(25, progress.call_args[0][0])
+        # the checkpoint of the migration and the table
+        self.logger.info.assert_any_call(
+            '20170810093842 a_table: 25 rows, {:.0f} rows/s'.format(
+                progress.call_args[0][1]))
+
+    def test_resume(self):
+        batches = []
+
+        def interrupted(cursor, start, end):
+            if len(batches) == 2:
+                raise KeyboardInterrupt
+            batches.append((start, end))
+
+        with db_connect(testing.db_connection_string) as db_conn:
+            with db_conn.cursor() as cursor:
+                with self.assertRaises(KeyboardInterrupt):
+                    self.target(cursor, 'public.a_table', interrupted,
+                                batch_size=10, name='20170810093842')
+        self.assertEqual([(1, 10), (11, 20)], batches)
+
+        with db_connect(testing.db_connection_string) as db_conn:
+            with db_conn.cursor() as cursor:
+                cursor.execute('SELECT name, last_key, row_count '
+                               'FROM dbmigrator_checkpoints')
+                self.assertEqual([('20170810093842', '20', 20)],
+                                 cursor.fetchall())
+
+                self.assertEqual(25, self.target(
+                    cursor, 'public.a_table',
+                    lambda cursor, start, end: batches.append((start, end)),
+                    batch_size=10, name='20170810093842'))
+
+        self.assertEqual([(1, 10), (11, 20), (21, 25)], batches)
+        self.logger.info.assert_any_call(
+            'Resuming 20170810093842 after 20 (20 rows)')
+
+
+class BackfillCommitsTestCase(unittest.TestCase):
+    @property
+    def target(self):
+        from ..batch import backfill
+        return backfill
+
+    def test_no_name(self):
+        cursor = mock.Mock()
+        with self.assertRaises(Exception) as cm:
+            self.target(cursor, 'a_table', 'UPDATE a_table SET a = 1')
+        self.assertEqual('backfill needs a name outside of a migration',
+                         str(cm.exception))
+        self.assertFalse(cursor.execute.called)
+
+    def test_commits_forbidden(self):
+        from ..utils import forbid_commits
+
+        cursor = mock.Mock()
+        with forbid_commits('with --plan'):
+            with self.assertRaises(Exception) as cm:
+                self.target(cursor, 'a_table', 'UPDATE a_table SET a = 1',
+                            name='a')
+        self.assertEqual('batch.backfill commits, which is not possible '
+                         'with --plan', str(cm.exception))
+        self.assertFalse(cursor.execute.called)
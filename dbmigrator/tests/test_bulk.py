@@ -0,0 +1,122 @@
+# -*- coding: utf-8 -*-
+# ###
+# Copyright (c) 2026, Rice University
+# This software is subject to the provisions of the GNU Affero General
+# Public License version 3 (AGPLv3).
+# See LICENCE.txt for details.
+# ###
+
+import unittest
+
+from . import testing
+from ..utils import db_connect
+
+
+class RowStreamTestCase(unittest.TestCase):
+    def test_read(self):
+        from ..bulk import _RowStream
+
+        rows = iter([(1, u'a\tb', None), (2, u'c\\d\ne', True),
+                     (3, {'f': [1]}, bytearray(b'\x00g'))])
+        stream = _RowStream(rows, None)
+        self.assertEqual(b'1\ta\\t', stream.read(5))
+        # the other rows haven't been read yet
+        self.assertEqual(1, stream.row_count)
+        # bytea in the hex format
+        self.assertEqual(b'b\t\\N\n2\tc\\\\d\\ne\tt\n3\t{"f": [1]}\t'
+                         b'\\\\x0067\n', stream.read(1000))
+        self.assertEqual(b'', stream.read(1000))
+        self.assertEqual(3, stream.row_count)
+
+        stream = _RowStream(iter([{'b': 2, 'a': 1, 'c': 3}]), ['a', 'b'])
+        self.assertEqual(b'1\t2\n', stream.read(-1))
+
+    def test_arrays(self):
+        from ..bulk import _copy_value
+
+        self.assertEqual(u'{"1","2"}', _copy_value([1, 2]))
+        self.assertEqual(u'{}', _copy_value(()))
+        # quoted in the array, then escaped for COPY
+        self.assertEqual(u'{"a \\\\"b\\\\"",NULL,"c\\\\\\\\d","t"}',
+                         _copy_value([u'a "b"', None, u'c\\d', True]))
+        self.assertEqual(u'{{"1","2"},{"3","4"}}',
+                         _copy_value([[1, 2], (3, 4)]))
+
+
+class CopyRowsTestCase(unittest.TestCase):
+    def setUp(self):
+        with db_connect(testing.db_connection_string) as db_conn:
+            with db_conn.cursor() as cursor:
+                cursor.execute("""\
+                    CREATE TABLE a_table (
+                        id INTEGER PRIMARY KEY,
+                        name TEXT,
+                        created DATE DEFAULT '2017-08-10')""")
+
+    def tearDown(self):
+        with db_connect(testing.db_connection_string) as db_conn:
+            with db_conn.cursor() as cursor:
+                cursor.execute('DROP TABLE a_table')
+
+    @property
+    def target(self):
+        from .. import copy_rows
+        return copy_rows
+
+    def test(self):
+        with db_connect(testing.db_connection_string) as db_conn:
+            with db_conn.cursor() as cursor:
+                self.assertEqual(1000, self.target(
+                    cursor, 'a_table',
+                    ({'id': i, 'name': u'三好 {}'.format(i)}
+                     for i in range(1000)),
+                    chunk_size=100))
+                self.assertEqual(0, self.target(cursor, 'a_table', []))
+                self.assertEqual(1, self.target(
+                    cursor, 'public.a_table',
+                    [(1000, None, '2017-08-11')]))
+
+                cursor.execute('SELECT count(*), max(name) FROM a_table')
+                self.assertEqual((1001, u'三好 999'), cursor.fetchone())
+                cursor.execute('SELECT * FROM a_table WHERE id = 1000')
+                self.assertEqual('2017-08-11',
+                                 cursor.fetchone()[2].isoformat())
+
+    def test_conflict_columns(self):
+        with db_connect(testing.db_connection_string) as db_conn:
+            with db_conn.cursor() as cursor:
+                cursor.execute("""\
+                    INSERT INTO a_table (id, name) VALUES (1, 'a'), (2, 'b')
+                    """)
+                self.assertEqual(2, self.target(
+                    cursor, 'a_table', [(2, 'B'), (3, 'C')],
+                    columns=['id', 'name'], conflict_columns=['id']))
+
+                cursor.execute('SELECT id, name FROM a_table ORDER BY id')
+                self.assertEqual([(1, 'a'), (2, 'B'), (3, 'C')],
+                                 cursor.fetchall())
+
+    def test_duplicate_conflict_columns(self):
+        with db_connect(testing.db_connection_string) as db_conn:
+            with db_conn.cursor() as cursor:
+                cursor.execute(
+                    "INSERT INTO a_table (id, name) VALUES (1, 'a')")
+                self.assertEqual(4, self.target(
+                    cursor, 'a_table',
+                    [(1, 'b'), (2, 'c'), (1, 'd'), (2, 'e')],
+                    columns=['id', 'name'], conflict_columns=['id']))
+
+                # the last rows win
+                cursor.execute('SELECT id, name FROM a_table ORDER BY id')
+                self.assertEqual([(1, 'd'), (2, 'e')], cursor.fetchall())
+
+    def test_arrays(self):
+        with db_connect(testing.db_connection_string) as db_conn:
+            with db_conn.cursor() as cursor:
+                cursor.execute('ALTER TABLE a_table ADD COLUMN tags TEXT[]')
+                self.target(cursor, 'a_table',
+                            [{'id': 1, 'tags': [u'a "b"', None, u'c\\d']}])
+
+                cursor.execute('SELECT tags FROM a_table')
+                self.assertEqual(([u'a "b"', None, u'c\\d'],),
+                                 cursor.fetchone())
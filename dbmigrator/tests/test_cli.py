@@ -6,6 +6,7 @@
 # See LICENCE.txt for details.
 # ###
 
+import json
 import logging
 import os
 import shutil
@@ -196,6 +197,35 @@ version        | name            | is applied | date applied
 
         self.assertEqual('', stderr)
 
+    def test_stats(self):
+        testing.install_test_packages()
+
+        cmd = ['--db-connection-string', testing.db_connection_string,
+               '--context', 'package-a']
+
+        def cleanup():
+            with db_connect(testing.db_connection_string) as db_conn:
+                with db_conn.cursor() as cursor:
+                    cursor.execute('DROP TABLE IF EXISTS a_table')
+
+        self.addCleanup(cleanup)
+
+        self.target(cmd + ['init', '--version', '0'])
+        self.target(cmd + ['migrate', '--version', '20160228202637'])
+        with testing.captured_output() as (out, err):
+            self.target(cmd + ['list', '--stats'])
+
+        lines = out.getvalue().splitlines()
+        self.assertEqual(
+            'version        | name            | is applied | date applied  '
+            '                   | duration        | db time         '
+            '| rows       | peak memory', lines[0])
+        self.assertEqual(len(lines[0]), len(lines[1]))
+        duration = lines[0].index('| duration') + 2
+        self.assertEqual('0:00:00', lines[2][duration:duration + 7])
+        self.assertEqual('20160228212456   cool_stuff        False',
+                         lines[3])
+
 
 class InitTestCase(BaseTestCase):
     def test_multiple_contexts(self):
@@ -214,6 +244,95 @@ class InitTestCase(BaseTestCase):
         self.assertIn('20160228210326   initial_data      True', stdout)
         self.assertIn('20160228212456   cool_stuff        True', stdout)
 
+    def test_bookkeeping_table(self):
+        testing.install_test_packages()
+        cmd = ['--db-connection-string', testing.db_connection_string,
+               '--context', 'package-a']
+
+        def cleanup():
+            with db_connect(testing.db_connection_string) as db_conn:
+                with db_conn.cursor() as cursor:
+                    cursor.execute('DROP TABLE IF EXISTS a_table')
+
+        self.addCleanup(cleanup)
+
+        self.target(cmd + ['init', '--version', '0'])
+        self.target(cmd + ['migrate'])
+
+        with db_connect(testing.db_connection_string) as db_conn:
+            with db_conn.cursor() as cursor:
+                cursor.execute("""\
+                    SELECT version, duration IS NOT NULL, length(checksum),
+                           host IS NOT NULL, db_time <= duration, row_count
+                    FROM schema_migrations ORDER BY version""")
+                self.assertEqual(
+                    [('20160228202637', True, 40, True, True, 0),
+                     ('20160228212456', True, 40, True, True, 0)],
+                    cursor.fetchall())
+                cursor.execute("""\
+                    SELECT indexrelid::regclass::text, indisprimary
+                    FROM pg_index
+                    WHERE indrelid = 'schema_migrations'::regclass
+                    ORDER BY 1""")
+                self.assertEqual([('schema_migrations_applied_idx', False),
+                                  ('schema_migrations_pkey', True)],
+                                 cursor.fetchall())
+
+    def test_upgrade(self):
+        cmd = ['--db-connection-string', testing.db_connection_string]
+
+        with db_connect(testing.db_connection_string) as db_conn:
+            with db_conn.cursor() as cursor:
+                cursor.execute("""\
+                    CREATE TABLE schema_migrations (
+                        version TEXT NOT NULL,
+                        applied TIMESTAMP WITH TIME ZONE
+                            DEFAULT CURRENT_TIMESTAMP
+                    )""")
+                cursor.execute("""\
+                    INSERT INTO schema_migrations VALUES
+                        ('20160228202637', '2016-02-28 00:00:00+00'),
+                        ('20160228202637', '2016-03-01 00:00:00+00'),
+                        ('20160228212456', '2016-02-28 00:00:00+00'),
+                        ('20160228212456', NULL)""")
+
+        self.target(cmd + ['init'])
+        logger.info.assert_called_with(
+            'Schema migrations already initialized.  Use "dbmigrator init '
+            '--upgrade" to upgrade the schema_migrations table.')
+
+        self.target(cmd + ['init', '--upgrade'])
+        logger.info.assert_any_call('Removed 2 duplicated schema migrations')
+        logger.info.assert_called_with('Schema migrations upgraded.')
+
+        with db_connect(testing.db_connection_string) as db_conn:
+            with db_conn.cursor() as cursor:
+                cursor.execute("""\
+                    SELECT version, applied FROM schema_migrations
+                    ORDER BY version""")
+                rows = cursor.fetchall()
+                self.assertEqual(['20160228202637', '20160228212456'],
+                                 [row[0] for row in rows])
+                self.assertEqual(3, rows[0][1].month)
+                self.assertEqual(None, rows[1][1])
+                cursor.execute("""\
+                    SELECT column_name FROM information_schema.columns
+                    WHERE table_name = 'schema_migrations'
+                    ORDER BY ordinal_position""")
+                self.assertEqual(
+                    ['version', 'applied', 'duration', 'checksum', 'host',
+                     'db_time', 'row_count', 'peak_memory'],
+                    [row[0] for row in cursor.fetchall()])
+                cursor.execute("""\
+                    SELECT 1 FROM pg_constraint
+                    WHERE conrelid = 'schema_migrations'::regclass
+                        AND contype = 'p'""")
+                self.assertEqual([(1,)], cursor.fetchall())
+
+        self.target(cmd + ['init', '--upgrade'])
+        logger.info.assert_called_with(
+            'Schema migrations already initialized.')
+
     def test_db_config_ini_key(self):
         cmd = ['--config', testing.test_config2_path,
                '--db-config-ini-key', 'postgresql.db-connection-string']
@@ -530,6 +649,271 @@ class MigrateTestCase(BaseTestCase):
                         WHERE table_name = 'a_table'""")
                 self.assertEqual([('a_table',)], cursor.fetchall())
 
+    @unittest.skipUnless(testing.has_psycopg, 'psycopg 3 is not installed')
+    def test_driver_psycopg(self):
+        from .. import utils
+
+        self.addCleanup(utils.set_driver, 'psycopg2')
+        md = os.path.join(testing.test_data_path, 'md')
+        cmd = ['--db-connection-string', testing.db_connection_string,
+               '--migrations-directory', md, '--driver', 'psycopg']
+
+        def cleanup():
+            with db_connect(testing.db_connection_string) as db_conn:
+                with db_conn.cursor() as cursor:
+                    cursor.execute('DROP TABLE IF EXISTS a_table')
+
+        self.addCleanup(cleanup)
+
+        self.target(cmd + ['init', '--version', '0'])
+        self.target(cmd + ['migrate'])
+        self.assertEqual('psycopg', utils.get_driver().name)
+
+        with db_connect(testing.db_connection_string) as db_conn:
+            self.assertEqual('psycopg', type(db_conn).__module__.split('.')[0])
+            with db_conn.cursor() as cursor:
+                cursor.execute('SELECT version FROM schema_migrations')
+                self.assertEqual([('20170810093842',)], cursor.fetchall())
+
+    def test_single_transaction(self):
+        md = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, md)
+        with open(os.path.join(md, '20170810093842_create.py'), 'w') as f:
+            f.write('''\
+def up(cursor):
+    cursor.execute('CREATE TABLE a_table (name TEXT)')
+''')
+        with open(os.path.join(md, '20170810093943_fail.py'), 'w') as f:
+            f.write('''\
+def up(cursor):
+    cursor.execute('INSERT INTO a_table VALUES (1, 2)')
+''')
+        cmd = ['--db-connection-string', testing.db_connection_string,
+               '--migrations-directory', md]
+
+        def cleanup():
+            with db_connect(testing.db_connection_string) as db_conn:
+                with db_conn.cursor() as cursor:
+                    cursor.execute('DROP TABLE IF EXISTS a_table')
+
+        self.addCleanup(cleanup)
+
+        self.target(cmd + ['init', '--version', '0'])
+        with self.assertRaises(Exception):
+            self.target(cmd + ['migrate', '--single-transaction'])
+
+        logger.error.assert_called_with(
+            'Migration 20170810093943 fail failed, rolling back all the '
+            'migrations in this transaction')
+
+        # Nothing is committed, not even the first migration
+        with db_connect(testing.db_connection_string) as db_conn:
+            with db_conn.cursor() as cursor:
+                cursor.execute('SELECT * FROM schema_migrations')
+                self.assertEqual([], cursor.fetchall())
+                cursor.execute("""\
+                    SELECT table_name FROM information_schema.tables
+                        WHERE table_name = 'a_table'""")
+                self.assertEqual([], cursor.fetchall())
+
+        os.remove(os.path.join(md, '20170810093943_fail.py'))
+        self.target(cmd + ['migrate', '--single-transaction'])
+
+        with db_connect(testing.db_connection_string) as db_conn:
+            with db_conn.cursor() as cursor:
+                cursor.execute('SELECT version FROM schema_migrations')
+                self.assertEqual([('20170810093842',)], cursor.fetchall())
+
+    def test_schema_diff(self):
+        md = os.path.join(testing.test_data_path, 'md')
+        cmd = ['--db-connection-string', testing.db_connection_string,
+               '--migrations-directory', md]
+
+        def cleanup():
+            with db_connect(testing.db_connection_string) as db_conn:
+                with db_conn.cursor() as cursor:
+                    cursor.execute('DROP TABLE IF EXISTS a_table')
+
+        self.addCleanup(cleanup)
+
+        self.target(cmd + ['init', '--version', '0'])
+        self.target(cmd + ['--schema-diff', 'off', 'migrate'])
+        self.assertIn('Running migration 20170810093842', logger_args())
+        self.assertNotIn('CREATE TABLE a_table', logger_args())
+        logger.reset_mock()
+
+        self.target(cmd + ['--schema-diff', 'summary', 'rollback'])
+        info = logger_args()
+        self.assertIn('- TABLE public.a_table', info)
+        self.assertNotIn('CREATE TABLE a_table', info)
+        logger.reset_mock()
+
+        self.target(cmd + ['--schema-diff', 'touched', 'migrate'])
+        self.assertIn('+CREATE TABLE a_table', logger_args())
+
+    def test_plan(self):
+        md = os.path.join(testing.test_data_path, 'md')
+        plan_directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, plan_directory)
+        plan_file = os.path.join(plan_directory, 'plan.json')
+        cmd = ['--db-connection-string', testing.db_connection_string,
+               '--migrations-directory', md, '--schema-diff', 'off']
+
+        self.target(cmd + ['init', '--version', '0'])
+        self.target(cmd + ['migrate', '--plan-file', plan_file])
+
+        info = logger_args()
+        self.assertIn('Migration 20170810093842 create_a_table: ', info)
+        self.assertIn('new locks: a_table AccessExclusiveLock', info)
+        self.assertIn('Total ', info)
+
+        with open(plan_file) as f:
+            plan = json.load(f)
+        self.assertEqual(['20170810093842', '20170810093943',
+                          '20170810124056'], [s['version'] for s in plan])
+        self.assertIn(['a_table', 'AccessExclusiveLock'],
+                      plan[0]['new_locks'])
+        self.assertEqual(0, plan[0]['row_count'])
+        self.assertTrue(plan[1]['skipped'])
+        self.assertTrue(plan[2]['skipped'])
+
+        # nothing was committed
+        with db_connect(testing.db_connection_string) as db_conn:
+            with db_conn.cursor() as cursor:
+                cursor.execute('SELECT * FROM schema_migrations')
+                self.assertEqual([], cursor.fetchall())
+                cursor.execute("SELECT to_regclass('a_table')")
+                self.assertEqual((None,), cursor.fetchone())
+
+    def test_trace_sql(self):
+        md = os.path.join(testing.test_data_path, 'md')
+        cmd = ['--db-connection-string', testing.db_connection_string,
+               '--migrations-directory', md, '--schema-diff', 'off']
+
+        def cleanup():
+            with db_connect(testing.db_connection_string) as db_conn:
+                with db_conn.cursor() as cursor:
+                    cursor.execute('DROP TABLE IF EXISTS a_table')
+
+        self.addCleanup(cleanup)
+
+        self.target(cmd + ['init', '--version', '0'])
+        self.target(cmd + ['--slow-statement-ms', '60000', 'migrate',
+                           '--version', '20170810093842'])
+        self.assertEqual(0, logger.warning.call_count)
+        self.target(cmd + ['rollback'])
+
+        self.target(cmd + ['--trace-sql', 'migrate'])
+        self.assertIn(', -1 rows, 0 parameters: '
+                      'CREATE TABLE a_table (name TEXT)', logger_args())
+
+    def test_profile(self):
+        md = os.path.join(testing.test_data_path, 'md')
+        profile_directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, profile_directory)
+        cmd = ['--db-connection-string', testing.db_connection_string,
+               '--migrations-directory', md]
+
+        def cleanup():
+            with db_connect(testing.db_connection_string) as db_conn:
+                with db_conn.cursor() as cursor:
+                    cursor.execute('DROP TABLE IF EXISTS a_table')
+
+        self.addCleanup(cleanup)
+
+        self.target(cmd + ['init', '--version', '0'])
+        self.target(cmd + ['--profile', profile_directory, 'migrate'])
+
+        (prof, trace) = sorted(os.listdir(profile_directory))
+        self.assertTrue(prof.startswith('migrate-'))
+        with open(os.path.join(profile_directory, trace)) as f:
+            names = set(e['name'] for e in json.load(f)['traceEvents'])
+        self.assertEqual(set(['migrate', 'discovery', 'import', 'should_run',
+                              'up', 'bookkeeping', 'commit',
+                              'schema snapshot', 'schema diff']), names)
+
+    def test_lock_wait_timeout(self):
+        from ..utils import MIGRATION_LOCK_KEY
+
+        md = os.path.join(testing.test_data_path, 'md')
+        cmd = ['--db-connection-string', testing.db_connection_string,
+               '--migrations-directory', md]
+
+        def cleanup():
+            with db_connect(testing.db_connection_string) as db_conn:
+                with db_conn.cursor() as cursor:
+                    cursor.execute('DROP TABLE IF EXISTS a_table')
+
+        self.addCleanup(cleanup)
+
+        self.target(cmd + ['init', '--version', '0'])
+        with db_connect(testing.db_connection_string) as db_conn:
+            with db_conn.cursor() as cursor:
+                # another dbmigrator is migrating
+                cursor.execute('SELECT pg_advisory_lock(%s)',
+                               (MIGRATION_LOCK_KEY,))
+                with self.assertRaises(Exception) as cm:
+                    self.target(cmd + ['--lock-wait-timeout', '0.1',
+                                       'migrate'])
+                self.assertEqual('Timed out waiting for the migration lock '
+                                 'after 0.1 seconds', str(cm.exception))
+                logger.info.assert_called_with(
+                    'Waiting for another dbmigrator to finish')
+
+        # the lock is released when the other connection is closed
+        self.target(cmd + ['--lock-wait-timeout', '0.1', 'migrate'])
+        self.assertIn('Running migration 20170810093842', logger_args())
+
+    def test_jobs(self):
+        md = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, md)
+        for version, table in (('20170810093842', 'a_table'),
+                               ('20170810093943', 'b_table')):
+            with open(os.path.join(md, '{}_create_{}.py'.format(
+                    version, table)), 'w') as f:
+                f.write('''\
+touches = ['{0}']
+
+
+def up(cursor):
+    cursor.execute('CREATE TABLE {0} (name TEXT)')
+'''.format(table))
+        with open(os.path.join(md, '20170810094044_insert.py'), 'w') as f:
+            f.write('''\
+depends_on = ['20170810093842', '20170810093943']
+
+
+def up(cursor):
+    cursor.execute("INSERT INTO a_table VALUES ('a')")
+    cursor.execute("INSERT INTO b_table VALUES ('b')")
+''')
+        cmd = ['--db-connection-string', testing.db_connection_string,
+               '--migrations-directory', md]
+
+        def cleanup():
+            with db_connect(testing.db_connection_string) as db_conn:
+                with db_conn.cursor() as cursor:
+                    cursor.execute('DROP TABLE IF EXISTS a_table')
+                    cursor.execute('DROP TABLE IF EXISTS b_table')
+
+        self.addCleanup(cleanup)
+
+        self.target(cmd + ['init', '--version', '0'])
+        with self.assertRaises(Exception):
+            self.target(cmd + ['migrate', '--jobs', '2',
+                               '--single-transaction'])
+
+        self.target(cmd + ['migrate', '--jobs', '2'])
+
+        with db_connect(testing.db_connection_string) as db_conn:
+            with db_conn.cursor() as cursor:
+                cursor.execute('SELECT version FROM schema_migrations '
+                               'ORDER BY version')
+                self.assertEqual([('20170810093842',), ('20170810093943',),
+                                  ('20170810094044',)], cursor.fetchall())
+                cursor.execute('SELECT * FROM a_table, b_table')
+                self.assertEqual([('a', 'b')], cursor.fetchall())
+
     def test_repeat(self):
         md = os.path.join(testing.test_data_path, 'md')
         cmd = ['--db-connection-string', testing.db_connection_string,
@@ -630,6 +1014,124 @@ class MigrateTestCase(BaseTestCase):
         self.assertIn('Running migration 20170810124056', logger_args())
 
 
+class PlanMigrationsTestCase(unittest.TestCase):
+    @property
+    def target(self):
+        from ..commands.migrate import plan_migrations
+        return plan_migrations
+
+    def test_commits(self):
+        from .. import batch, utils
+
+        def use_super_user(*args, **kwargs):
+            with utils.super_user():
+                pass
+
+        def backfill(func, cursor, *args, **kwargs):
+            batch.backfill(cursor, 'a_table', 'UPDATE a_table SET a = 1',
+                           name='a')
+
+        cursor = mock.Mock()
+        cursor.fetchall.return_value = []
+        schema_tracker = mock.Mock()
+        for migrate, what in [(use_super_user, 'super_user()'),
+                              (backfill, 'batch.backfill')]:
+            schema_tracker.compare.side_effect = migrate
+            with self.assertRaises(Exception) as cm:
+                self.target(cursor, [('20170810093842', 'a', None)],
+                            schema_tracker, False, None)
+            self.assertEqual('{} commits, which is not possible with --plan'
+                             .format(what), str(cm.exception))
+        self.assertEqual(2, cursor.connection.rollback.call_count)
+
+
+class SingleTransactionTestCase(unittest.TestCase):
+    @property
+    def target(self):
+        from ..commands.migrate import cli_command
+        return cli_command
+
+    @mock.patch('dbmigrator.utils.connect')
+    @mock.patch('dbmigrator.utils.migration_lock')
+    @mock.patch('dbmigrator.utils.MigrationState.load')
+    @mock.patch('dbmigrator.schema.SchemaTracker')
+    def test_super_user(self, SchemaTracker, *mocks):
+        from .. import utils
+
+        def migrate(func, cursor, *args, **kwargs):
+            with utils.super_user():
+                pass
+
+        SchemaTracker.return_value.compare.side_effect = migrate
+        with mock.patch('dbmigrator.utils.get_pending_migrations',
+                        return_value=[('20170810093842', 'a', None)]):
+            with self.assertRaises(Exception) as cm:
+                self.target(db_connection_string='dbname=a',
+                            single_transaction=True)
+        self.assertEqual('super_user() commits, which is not possible '
+                         'with --single-transaction', str(cm.exception))
+
+
+class MeasureMemoryTestCase(unittest.TestCase):
+    @mock.patch('dbmigrator.utils.connect')
+    @mock.patch('dbmigrator.utils.migration_lock')
+    def test_jobs(self, *mocks):
+        from ..commands.migrate import cli_command
+
+        with self.assertRaises(Exception) as cm:
+            cli_command(db_connection_string='dbname=a', jobs=2,
+                        measure_memory=True)
+        self.assertEqual('--jobs can not be used with --measure-memory.',
+                         str(cm.exception))
+
+
+class StatusTestCase(BaseTestCase):
+    def setUp(self):
+        super(StatusTestCase, self).setUp()
+        md = os.path.join(testing.test_data_path, 'md')
+        self.cmd = ['--db-connection-string', testing.db_connection_string,
+                    '--migrations-directory', md]
+
+        def cleanup():
+            with db_connect(testing.db_connection_string) as db_conn:
+                with db_conn.cursor() as cursor:
+                    cursor.execute('DROP TABLE IF EXISTS a_table')
+
+        self.addCleanup(cleanup)
+
+    def test_no_table(self):
+        self.assertEqual(1, self.target(self.cmd + ['status', '--check']))
+
+    def test(self):
+        self.target(self.cmd + ['init', '--version', '0'])
+        self.assertEqual(1, self.target(self.cmd + ['status', '--check']))
+        logger.reset_mock()
+
+        self.target(self.cmd + ['status'])
+        logger.info.assert_called_once_with(
+            'Migration 20170810093842 create_a_table has not been applied')
+
+        self.target(self.cmd + ['migrate'])
+        # the repeat migration is not recorded, its should_run is false
+        self.assertEqual(0, self.target(self.cmd + ['status', '--check']))
+        logger.reset_mock()
+
+        self.target(self.cmd + ['status'])
+        logger.info.assert_called_once_with('Database is up to date.')
+
+    @mock.patch('dbmigrator.utils.get_unapplied_migrations')
+    def test_fingerprint(self, get_unapplied_migrations):
+        self.target(self.cmd + ['init'])
+        self.assertEqual(0, self.target(self.cmd + ['status', '--check']))
+        self.assertEqual(0, get_unapplied_migrations.call_count)
+
+        self.target(self.cmd + ['mark', '-f', '20170810124056'])
+        get_unapplied_migrations.return_value = [
+            ('20170810124056', 'empty', None)]
+        self.assertEqual(1, self.target(self.cmd + ['status', '--check']))
+        self.assertEqual(1, get_unapplied_migrations.call_count)
+
+
 class RollbackTestCase(BaseTestCase):
     @mock.patch('dbmigrator.utils.timestamp')
     def test(self, timestamp):
@@ -773,3 +1275,62 @@ SELECT table_name FROM information_schema.tables
         self.target(cmd[:2] + ['--context=package-a', 'rollback'])
         logger.info.assert_any_call('Migration 20170810093842 not found.')
         logger.info.assert_called_with('No migrations to roll back.')
+
+
+class SquashTestCase(BaseTestCase):
+    def setUp(self):
+        super(SquashTestCase, self).setUp()
+        tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp_dir)
+        self.baseline = os.path.join(tmp_dir, 'baseline.sql')
+
+        def cleanup():
+            with db_connect(testing.db_connection_string) as db_conn:
+                with db_conn.cursor() as cursor:
+                    cursor.execute('DROP TABLE IF EXISTS a_table')
+
+        self.addCleanup(cleanup)
+
+    def test(self):
+        testing.install_test_packages()
+        cmd = ['--db-connection-string', testing.db_connection_string,
+               '--context', 'package-a']
+
+        self.target(cmd + ['init', '--version', '0'])
+        self.target(cmd + ['migrate', '--version', '20160228202637'])
+        with db_connect(testing.db_connection_string) as db_conn:
+            with db_conn.cursor() as cursor:
+                cursor.execute("INSERT INTO a_table VALUES ('seed')")
+
+        with self.assertRaises(Exception) as cm:
+            self.target(cmd + ['squash', '--up-to', '20160228212456'])
+        self.assertEqual('Migrations up to 20160228212456 have not been '
+                         'run: 20160228212456', str(cm.exception))
+
+        self.target(cmd + ['squash', '--up-to', '20160228202637',
+                           '--data', 'a_table', '-o', self.baseline])
+        logger.info.assert_called_with(
+            'Baseline of 1 migrations up to 20160228202637 written to {}'
+            .format(self.baseline))
+
+        with db_connect(testing.db_connection_string) as db_conn:
+            with db_conn.cursor() as cursor:
+                cursor.execute('DROP TABLE a_table')
+                cursor.execute('DROP TABLE schema_migrations')
+
+        self.target(cmd + ['init', '--baseline', self.baseline])
+        logger.info.assert_called_with(
+            'Schema migrations initialized from the baseline up to '
+            '20160228202637.')
+
+        with db_connect(testing.db_connection_string) as db_conn:
+            with db_conn.cursor() as cursor:
+                cursor.execute('SELECT name FROM a_table')
+                self.assertEqual([('seed',)], cursor.fetchall())
+                cursor.execute('SELECT version FROM schema_migrations')
+                self.assertEqual([('20160228202637',)], cursor.fetchall())
+
+        logger.reset_mock()
+        self.target(cmd + ['migrate'])
+        logger.info.assert_any_call(
+            'Running migration 20160228212456 cool_stuff')
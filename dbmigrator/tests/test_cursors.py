@@ -0,0 +1,51 @@
+# -*- coding: utf-8 -*-
+# ###
+# Copyright (c) 2026, Rice University
+# This software is subject to the provisions of the GNU Affero General
+# Public License version 3 (AGPLv3).
+# See LICENCE.txt for details.
+# ###
+
+import unittest
+try:
+    from unittest import mock
+except ImportError:
+    import mock
+
+
+class CursorProxyTestCase(unittest.TestCase):
+    def test_stacked(self):
+        from ..cursors import CursorProxy
+
+        calls = []
+
+        class Recording(CursorProxy):
+            def __init__(self, cursor, name):
+                super(Recording, self).__init__(cursor)
+                self.name = name
+
+            def _execute(self, method, query, vars, many=False):
+                calls.append((self.name, query, many))
+                return method(query, vars)
+
+        cursor = mock.MagicMock(rowcount=3)
+        cursor.__iter__.return_value = iter([(1,), (2,)])
+        proxy = Recording(Recording(cursor, 'inner'), 'outer')
+        with proxy as entered:
+            self.assertIs(proxy, entered)
+            proxy.execute('SELECT 1')
+            proxy.executemany('INSERT INTO a VALUES (%s)', [(1,)])
+            proxy.callproc('f', (1,))
+        self.assertEqual([
+            ('outer', 'SELECT 1', False),
+            ('inner', 'SELECT 1', False),
+            ('outer', 'INSERT INTO a VALUES (%s)', True),
+            ('inner', 'INSERT INTO a VALUES (%s)', True),
+            ('outer', 'f', False),
+            ('inner', 'f', False),
+            ], calls)
+        cursor.execute.assert_called_once_with('SELECT 1', None)
+        cursor.callproc.assert_called_once_with('f', (1,))
+        cursor.__exit__.assert_called_once_with(None, None, None)
+        self.assertEqual(3, proxy.rowcount)
+        self.assertEqual([(1,), (2,)], list(proxy))
@@ -0,0 +1,140 @@
+# -*- coding: utf-8 -*-
+# ###
+# Copyright (c) 2026, Rice University
+# This software is subject to the provisions of the GNU Affero General
+# Public License version 3 (AGPLv3).
+# See LICENCE.txt for details.
+# ###
+
+import unittest
+try:
+    from unittest import mock
+except ImportError:
+    import mock
+
+from . import testing
+
+
+class LoadDriverTestCase(unittest.TestCase):
+    @property
+    def target(self):
+        from ..drivers import load_driver
+        return load_driver
+
+    def test(self):
+        driver = self.target('psycopg2')
+        self.assertEqual('psycopg2', driver.name)
+        self.assertIs(driver, self.target('psycopg2'))
+
+    def test_unknown(self):
+        with self.assertRaises(Exception) as cm:
+            self.target('sqlite3')
+        self.assertEqual('Unknown driver "sqlite3", use one of: psycopg, '
+                         'psycopg2', str(cm.exception))
+
+
+class DriverTestCase(unittest.TestCase):
+    def test_abstract(self):
+        from ..drivers import Driver
+
+        with self.assertRaises(TypeError):
+            Driver(mock.Mock(), mock.Mock())
+
+
+class Psycopg2DriverTestCase(unittest.TestCase):
+    def setUp(self):
+        from ..drivers import load_driver
+        self.driver = load_driver('psycopg2')
+
+    def test_transaction(self):
+        db_conn = mock.Mock(closed=False)
+        with self.driver.transaction(db_conn):
+            pass
+        db_conn.commit.assert_called_once_with()
+
+        db_conn = mock.Mock(closed=False)
+        with self.assertRaises(KeyboardInterrupt):
+            with self.driver.transaction(db_conn):
+                raise KeyboardInterrupt
+        db_conn.rollback.assert_called_once_with()
+        self.assertFalse(db_conn.commit.called)
+
+    def test_reset(self):
+        db_conn = mock.MagicMock()
+        cursor = db_conn.cursor.return_value.__enter__.return_value
+        self.driver.reset(db_conn)
+        db_conn.reset.assert_called_once_with()
+        # the advisory locks are released too, e.g. the migration lock
+        cursor.execute.assert_called_once_with(
+            'SELECT pg_advisory_unlock_all()')
+        db_conn.commit.assert_called_once_with()
+
+    def test_error_code(self):
+        import psycopg2
+
+        error = psycopg2.OperationalError('lock timeout')
+        self.assertIsNone(self.driver.error_code(error))
+
+    def test_make_dsn(self):
+        self.assertEqual(
+            {'dbname': 'b', 'user': 'u'},
+            dict(p.split('=') for p in self.driver.make_dsn(
+                'dbname=a user=u', dbname='b').split()))
+
+    def test_execute_batch(self):
+        cursor = mock.Mock()
+        cursor.mogrify.side_effect = lambda query, vars: (
+            query.replace('%s', repr(vars[0])) if vars else query).encode()
+        self.driver.execute_batch(cursor, [('SELECT 1', None),
+                                           ('SELECT %s', (2,))])
+        cursor.execute.assert_called_once_with(b'SELECT 1;\nSELECT 2')
+
+
+@unittest.skipUnless(testing.has_psycopg, 'psycopg 3 is not installed')
+class PsycopgDriverTestCase(unittest.TestCase):
+    def setUp(self):
+        from ..drivers import load_driver
+        self.driver = load_driver('psycopg')
+
+    def test_connect(self):
+        import psycopg
+
+        with mock.patch('psycopg.connect') as connect:
+            self.driver.connect('dbname=a', user='postgres')
+        connect.assert_called_once_with(
+            'dbname=a', user='postgres', cursor_factory=psycopg.ClientCursor)
+
+    def test_reset(self):
+        db_conn = mock.MagicMock()
+        cursor = db_conn.cursor.return_value.__enter__.return_value
+        self.driver.reset(db_conn)
+        db_conn.rollback.assert_called_once_with()
+        cursor.execute.assert_any_call('SELECT pg_advisory_unlock_all()')
+        db_conn.commit.assert_called_once_with()
+
+    def test_error_code(self):
+        import psycopg.errors
+
+        error = psycopg.errors.LockNotAvailable('lock timeout')
+        self.assertEqual('55P03', self.driver.error_code(error))
+
+    def test_execute_batch(self):
+        cursor = mock.MagicMock()
+        with mock.patch('psycopg.Pipeline.is_supported', return_value=True):
+            self.driver.execute_batch(cursor, [('SELECT 1', None),
+                                               ('SELECT %s', (2,))])
+        cursor.connection.pipeline.assert_called_once_with()
+        self.assertEqual([mock.call('SELECT 1', None),
+                          mock.call('SELECT %s', (2,))],
+                         cursor.execute.call_args_list)
+
+    def test_copy_from(self):
+        from io import BytesIO
+
+        cursor = mock.MagicMock()
+        copy = cursor.copy.return_value.__enter__.return_value
+        self.driver.copy_from(cursor, 'COPY a FROM STDIN',
+                              BytesIO(b'1\n2\n3\n'), 4)
+        cursor.copy.assert_called_once_with('COPY a FROM STDIN')
+        self.assertEqual([mock.call(b'1\n2\n'), mock.call(b'3\n')],
+                         copy.write.call_args_list)
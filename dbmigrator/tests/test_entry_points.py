@@ -0,0 +1,118 @@
+# -*- coding: utf-8 -*-
+# ###
+# Copyright (c) 2026, Rice University
+# This software is subject to the provisions of the GNU Affero General
+# Public License version 3 (AGPLv3).
+# See LICENCE.txt for details.
+# ###
+
+import os
+import shutil
+import tempfile
+import unittest
+try:
+    from unittest import mock
+except ImportError:
+    import mock
+
+
+class GetSettingsTestCase(unittest.TestCase):
+    def setUp(self):
+        cache_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, cache_dir)
+        patcher = mock.patch.dict(os.environ,
+                                  {'DBMIGRATOR_CACHE_DIR': cache_dir})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        from .. import entry_points
+        patcher = mock.patch.object(entry_points, '_settings', {})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    @property
+    def target(self):
+        from ..entry_points import get_settings
+        return get_settings
+
+    def test(self):
+        from .. import entry_points
+
+        load = mock.Mock(return_value='/a/migrations')
+        distribution = mock.Mock(
+            return_value=('key', [('migrations_directory', load)]))
+        with mock.patch.object(entry_points, '_distribution', distribution):
+            self.assertEqual({'migrations_directory': '/a/migrations'},
+                             self.target('package-a'))
+            # resolved once per process
+            self.target('package-a')
+            self.assertEqual(1, distribution.call_count)
+
+            # and cached between processes
+            entry_points._settings.clear()
+            self.assertEqual({'migrations_directory': '/a/migrations'},
+                             self.target('package-a'))
+            self.assertEqual(1, load.call_count)
+
+            # until the distribution changes
+            entry_points._settings.clear()
+            distribution.return_value = (
+                'new key', [('migrations_directory', load)])
+            self.target('package-a')
+            self.assertEqual(2, load.call_count)
+
+    def test_callable(self):
+        from .. import entry_points
+
+        migrations_directory = mock.Mock(return_value='/a/migrations')
+        load = mock.Mock(return_value=migrations_directory)
+        distribution = mock.Mock(
+            return_value=('key', [('migrations_directory', load)]))
+        with mock.patch.object(entry_points, '_distribution', distribution):
+            self.assertEqual({'migrations_directory': '/a/migrations'},
+                             self.target('package-a'))
+            self.target('package-a')
+            self.assertEqual(1, migrations_directory.call_count)
+
+            # called again by another process, e.g. reading the environment
+            entry_points._settings.clear()
+            migrations_directory.return_value = '/b/migrations'
+            self.assertEqual({'migrations_directory': '/b/migrations'},
+                             self.target('package-a'))
+            self.assertEqual(2, load.call_count)
+
+    def test_skip(self):
+        from .. import entry_points
+
+        load = mock.Mock(return_value='/a/migrations')
+        skipped = mock.Mock(return_value='dbname=a')
+        distribution = mock.Mock(
+            return_value=('key', [('migrations_directory', load),
+                                  ('db_connection_string', skipped)]))
+        with mock.patch.object(entry_points, '_distribution', distribution):
+            self.assertEqual({'migrations_directory': '/a/migrations'},
+                             self.target('package-a',
+                                         ['db_connection_string']))
+        # e.g. given from the command line, not loaded
+        self.assertFalse(skipped.called)
+
+
+class DistributionTestCase(unittest.TestCase):
+    def test_location(self):
+        from .. import entry_points
+
+        if entry_points.metadata is None:
+            self.skipTest('importlib.metadata is not available')
+
+        def distribution(location):
+            return mock.Mock(version='1.0', entry_points=[],
+                             read_text=mock.Mock(return_value=''),
+                             locate_file=mock.Mock(return_value=location))
+
+        keys = []
+        for location in ('/venv-a/site-packages', '/venv-b/site-packages'):
+            with mock.patch.object(entry_points.metadata, 'distribution',
+                                   return_value=distribution(location)):
+                keys.append(entry_points._distribution('package-a')[0])
+        # the same version installed in two virtualenvs
+        self.assertNotEqual(keys[0], keys[1])
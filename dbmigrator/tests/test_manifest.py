@@ -0,0 +1,98 @@
+# -*- coding: utf-8 -*-
+# ###
+# Copyright (c) 2026, Rice University
+# This software is subject to the provisions of the GNU Affero General
+# Public License version 3 (AGPLv3).
+# See LICENCE.txt for details.
+# ###
+
+import os
+import shutil
+import tempfile
+import unittest
+try:
+    from unittest import mock
+except ImportError:
+    import mock
+
+
+class ManifestTestCase(unittest.TestCase):
+    def setUp(self):
+        self.cache_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.cache_dir)
+        patcher = mock.patch.dict(
+            os.environ, {'DBMIGRATOR_CACHE_DIR': self.cache_dir})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.migrations_directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.migrations_directory)
+        self.path = os.path.join(self.migrations_directory,
+                                 '20170810093842_create_a_table.py')
+        with open(self.path, 'w') as f:
+            f.write('def up(cursor):\n    pass\n')
+        with open(os.path.join(self.migrations_directory, 'README'),
+                  'w') as f:
+            f.write('not a migration')
+
+    def test_inspect_directory(self):
+        from ..manifest import inspect_directory, load_manifest
+
+        inspect = mock.Mock(return_value=[['up'], False])
+
+        self.assertEqual({self.path: [['up'], False]},
+                         inspect_directory(self.migrations_directory, inspect))
+        inspect.assert_called_once_with(self.path)
+
+        entry = load_manifest(self.migrations_directory)[
+            '20170810093842_create_a_table.py']
+        self.assertEqual('20170810093842', entry['version'])
+        self.assertEqual('create_a_table', entry['name'])
+        self.assertEqual([['up'], False], entry['inspected'])
+
+        # nothing changed, the manifest is used
+        self.assertEqual({self.path: [['up'], False]},
+                         inspect_directory(self.migrations_directory, inspect))
+        self.assertEqual(1, inspect.call_count)
+
+        # same content, new modification time
+        os.utime(self.path, (0, 0))
+        inspect_directory(self.migrations_directory, inspect)
+        self.assertEqual(1, inspect.call_count)
+
+        # new content
+        with open(self.path, 'a') as f:
+            f.write('\n\ndef down(cursor):\n    pass\n')
+        inspect.return_value = [['down', 'up'], False]
+        self.assertEqual({self.path: [['down', 'up'], False]},
+                         inspect_directory(self.migrations_directory, inspect))
+        self.assertEqual(2, inspect.call_count)
+
+    def test_unusable_manifest(self):
+        from ..manifest import inspect_directory, manifest_path
+
+        with open(manifest_path(self.migrations_directory), 'w') as f:
+            f.write('{not json')
+
+        inspect = mock.Mock(return_value=None)
+        self.assertEqual({self.path: None},
+                         inspect_directory(self.migrations_directory, inspect))
+        inspect.assert_called_once_with(self.path)
+
+    def test_get_migrations(self):
+        from ..utils import get_migrations
+
+        inspected = {'functions': ['up'], 'deferred': True,
+                     'depends_on': [], 'touches': []}
+        with mock.patch('dbmigrator.utils.inspect_migration',
+                        return_value=inspected) as inspect:
+            list(get_migrations([self.migrations_directory],
+                                import_modules=True))
+            ((version, name, migration),) = get_migrations(
+                [self.migrations_directory], import_modules=True)
+
+        self.assertEqual(1, inspect.call_count)
+        self.assertEqual(('20170810093842', 'create_a_table'),
+                         (version, name))
+        self.assertEqual(set(['up']), migration.functions)
+        self.assertTrue(migration.dbmigrator_deferred)
@@ -0,0 +1,65 @@
+# -*- coding: utf-8 -*-
+# ###
+# Copyright (c) 2026, Rice University
+# This software is subject to the provisions of the GNU Affero General
+# Public License version 3 (AGPLv3).
+# See LICENCE.txt for details.
+# ###
+
+import sys
+import unittest
+try:
+    from unittest import mock
+except ImportError:
+    import mock
+
+
+class MeasureTestCase(unittest.TestCase):
+    @property
+    def target(self):
+        from ..metrics import measure
+        return measure
+
+    def test(self):
+        cursor = mock.Mock(rowcount=3)
+
+        with self.target(cursor, memory=True) as (measuring_cursor,
+                                                  metrics):
+            measuring_cursor.execute('UPDATE a_table SET name = %s', ('a',))
+            measuring_cursor.executemany('INSERT INTO a_table VALUES (%s)',
+                                         [('b',), ('c',)])
+            cursor.rowcount = -1
+            measuring_cursor.execute('CREATE TABLE b_table (name TEXT)')
+            measuring_cursor.fetchall()
+            data = [0] * 100000
+
+        cursor.execute.assert_any_call('UPDATE a_table SET name = %s',
+                                       ('a',))
+        cursor.fetchall.assert_called_once_with()
+        self.assertEqual(6, metrics.row_count)
+        self.assertTrue(0 <= metrics.db_time <= metrics.duration)
+        if sys.version_info[0] == 3:
+            self.assertTrue(metrics.peak_memory >= len(data) * 8)
+        else:
+            self.assertEqual(None, metrics.peak_memory)
+
+    def test_memory_off(self):
+        if sys.version_info[0] == 3:
+            import tracemalloc
+            if tracemalloc.is_tracing():
+                self.skipTest('tracemalloc is already tracing')
+        with mock.patch('tracemalloc.start') as start:
+            with self.target(mock.Mock(rowcount=-1)) as (_, metrics):
+                pass
+        self.assertFalse(start.called)
+        self.assertEqual(None, metrics.peak_memory)
+
+    def test_error(self):
+        cursor = mock.Mock(rowcount=-1)
+        cursor.execute.side_effect = ValueError
+
+        with self.assertRaises(ValueError):
+            with self.target(cursor) as (measuring_cursor, metrics):
+                measuring_cursor.execute('SELECT 1')
+        self.assertEqual(0, metrics.row_count)
+        self.assertTrue(metrics.duration >= 0)
@@ -0,0 +1,181 @@
+# -*- coding: utf-8 -*-
+# ###
+# Copyright (c) 2026, Rice University
+# This software is subject to the provisions of the GNU Affero General
+# Public License version 3 (AGPLv3).
+# See LICENCE.txt for details.
+# ###
+
+import unittest
+try:
+    from unittest import mock
+except ImportError:
+    import mock
+
+
+class FakeError(Exception):
+    pass
+
+
+class BatchingCursorTestCase(unittest.TestCase):
+    def setUp(self):
+        self.cursor = mock.Mock()
+        self.driver = mock.Mock(Error=FakeError)
+
+    def make_one(self, **kwargs):
+        from ..pipeline import BatchingCursor
+        return BatchingCursor(self.cursor, self.driver, **kwargs)
+
+    def batches(self):
+        return [[query for query, vars in c[0][1]]
+                for c in self.driver.execute_batch.call_args_list]
+
+    def test_flush(self):
+        cursor = self.make_one()
+        cursor.execute('GRANT SELECT ON a TO b')
+        cursor.execute('COMMENT ON TABLE a IS %s', ('a',))
+        self.assertFalse(self.driver.execute_batch.called)
+
+        cursor.flush()
+        self.assertEqual([[
+            'SAVEPOINT dbmigrator_batch',
+            'GRANT SELECT ON a TO b',
+            'COMMENT ON TABLE a IS %s',
+            'RELEASE SAVEPOINT dbmigrator_batch',
+            ]], self.batches())
+        statements = self.driver.execute_batch.call_args[0][1]
+        self.assertEqual(('a',), statements[2][1])
+        self.assertFalse(self.cursor.execute.called)
+
+        # nothing queued
+        cursor.flush()
+        self.assertEqual(1, self.driver.execute_batch.call_count)
+
+    def test_one_statement(self):
+        cursor = self.make_one()
+        cursor.execute('SELECT 1')
+        cursor.flush()
+        self.cursor.execute.assert_called_once_with('SELECT 1', None)
+        self.assertFalse(self.driver.execute_batch.called)
+
+    def test_max_statements(self):
+        cursor = self.make_one(max_statements=2)
+        cursor.executemany('INSERT INTO a VALUES (%s)', [(1,), (2,), (3,)])
+        self.assertEqual([[
+            'SAVEPOINT dbmigrator_batch',
+            'INSERT INTO a VALUES (%s)',
+            'INSERT INTO a VALUES (%s)',
+            'RELEASE SAVEPOINT dbmigrator_batch',
+            ]], self.batches())
+        cursor.flush()
+        self.cursor.execute.assert_called_once_with(
+            'INSERT INTO a VALUES (%s)', (3,))
+
+    def test_results(self):
+        self.cursor.fetchone.return_value = (3,)
+        cursor = self.make_one()
+        cursor.execute('CREATE TABLE a (id int)')
+        cursor.execute('INSERT INTO a VALUES (1)')
+        cursor.execute('SELECT count(*) FROM a')
+        self.assertEqual((3,), cursor.fetchone())
+        # the last statement is run on its own, for its results
+        self.assertEqual([[
+            'SAVEPOINT dbmigrator_batch',
+            'CREATE TABLE a (id int)',
+            'INSERT INTO a VALUES (1)',
+            'RELEASE SAVEPOINT dbmigrator_batch',
+            ]], self.batches())
+        self.cursor.execute.assert_called_once_with(
+            'SELECT count(*) FROM a', None)
+
+    def test_chaining(self):
+        self.cursor.fetchone.return_value = (1,)
+        cursor = self.make_one()
+        cursor.execute('GRANT SELECT ON a TO b')
+        self.assertEqual((1,), cursor.execute('SELECT 1').fetchone())
+        self.cursor.execute.assert_called_with('SELECT 1', None)
+
+    def test_error(self):
+        error = FakeError('relation "b" does not exist')
+
+        def execute(query, vars=None):
+            if query == 'GRANT SELECT ON b TO c':
+                raise error
+
+        self.driver.execute_batch.side_effect = FakeError('batch failed')
+        self.cursor.execute.side_effect = execute
+        cursor = self.make_one()
+        cursor.execute('GRANT SELECT ON a TO c')
+        cursor.execute('GRANT SELECT ON b TO c')
+        cursor.execute('GRANT SELECT ON d TO c')
+        with mock.patch('dbmigrator.utils.logger') as logger:
+            with self.assertRaises(FakeError) as cm:
+                cursor.flush()
+        # the error of the statement that failed
+        self.assertIs(error, cm.exception)
+        logger.error.assert_called_once_with(
+            'Statement 2 of 3 in the batch failed')
+        self.assertEqual([
+            mock.call('ROLLBACK TO SAVEPOINT dbmigrator_batch'),
+            mock.call('RELEASE SAVEPOINT dbmigrator_batch'),
+            mock.call('GRANT SELECT ON a TO c', None),
+            mock.call('GRANT SELECT ON b TO c', None),
+            ], self.cursor.execute.call_args_list)
+
+    def test_transient_error(self):
+        # e.g. a lock timeout
+        self.driver.execute_batch.side_effect = FakeError(
+            'canceling statement due to lock timeout\n')
+        cursor = self.make_one()
+        cursor.execute('GRANT SELECT ON a TO c')
+        cursor.execute('GRANT SELECT ON b TO c')
+        with mock.patch('dbmigrator.utils.logger') as logger:
+            cursor.flush()
+        # the statements were run again and succeeded
+        self.cursor.execute.assert_any_call('GRANT SELECT ON b TO c', None)
+        logger.warning.assert_called_once_with(
+            'The batch failed (canceling statement due to lock timeout) but '
+            'its statements did not when run again')
+
+    def test_rollback_error(self):
+        error = FakeError('batch failed')
+        self.driver.execute_batch.side_effect = error
+        self.cursor.execute.side_effect = FakeError('no such savepoint')
+        cursor = self.make_one()
+        cursor.execute('SELECT nextval(%s)', ('a_seq',))
+        cursor.execute('GRANT SELECT ON b TO c')
+        with self.assertRaises(FakeError) as cm:
+            cursor.flush()
+        self.assertIs(error, cm.exception)
+        # not replayed, the sequence would advance again
+        self.cursor.execute.assert_called_once_with(
+            'ROLLBACK TO SAVEPOINT dbmigrator_batch')
+
+
+class BatchedTestCase(unittest.TestCase):
+    def test_call_migration(self):
+        from ..utils import batched, _call_migration
+
+        @batched(max_statements=10)
+        def up(cursor):
+            for i in range(3):
+                cursor.execute('SELECT %s', (i,))
+
+        cursor = mock.Mock()
+        with mock.patch('dbmigrator.utils.get_driver') as get_driver:
+            _call_migration(up, cursor)
+        self.assertEqual(1, get_driver().execute_batch.call_count)
+        self.assertEqual(5, len(get_driver().execute_batch.call_args[0][1]))
+        self.assertFalse(cursor.execute.called)
+
+    def test_not_batched(self):
+        from ..utils import batched, _call_migration
+
+        def up(cursor):
+            cursor.execute('SELECT 1')
+
+        cursor = mock.Mock()
+        _call_migration(up, cursor)
+        cursor.execute.assert_called_once_with('SELECT 1')
+        self.assertEqual({'max_statements': 1000},
+                         batched(up).dbmigrator_batched)
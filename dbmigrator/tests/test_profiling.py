@@ -0,0 +1,54 @@
+# -*- coding: utf-8 -*-
+# ###
+# Copyright (c) 2026, Rice University
+# This software is subject to the provisions of the GNU Affero General
+# Public License version 3 (AGPLv3).
+# See LICENCE.txt for details.
+# ###
+
+import json
+import os
+import pstats
+import shutil
+import tempfile
+import unittest
+
+
+class ProfileTestCase(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+
+    def test_profiled(self):
+        from ..profiling import profiled, span
+
+        def cli_command(**kwargs):
+            with span('up', version='20170810093842'):
+                with span('import'):
+                    pass
+            return kwargs
+
+        cli_command.__module__ = 'dbmigrator.commands.migrate'
+        command = profiled(cli_command, os.path.join(self.directory, 'p'))
+        self.assertEqual({'a': 1}, command(a=1))
+
+        (prof, trace) = sorted(os.listdir(os.path.join(self.directory, 'p')))
+        self.assertTrue(prof.startswith('migrate-'))
+        self.assertTrue(prof.endswith('.prof'))
+        self.assertEqual(prof[:-len('.prof')] + '.trace.json', trace)
+
+        pstats.Stats(os.path.join(self.directory, 'p', prof))
+        with open(os.path.join(self.directory, 'p', trace)) as f:
+            events = json.load(f)['traceEvents']
+        self.assertEqual(['import', 'up', 'migrate'],
+                         [e['name'] for e in events])
+        self.assertEqual({'version': '20170810093842'}, events[1]['args'])
+        import_, up, command = events
+        self.assertTrue(command['ts'] <= up['ts'] <= import_['ts'])
+
+    def test_not_profiled(self):
+        from ..profiling import span
+
+        with span('up'):
+            pass
+        self.assertEqual([], os.listdir(self.directory))
@@ -0,0 +1,121 @@
+# -*- coding: utf-8 -*-
+# ###
+# Copyright (c) 2026, Rice University
+# This software is subject to the provisions of the GNU Affero General
+# Public License version 3 (AGPLv3).
+# See LICENCE.txt for details.
+# ###
+
+import threading
+import unittest
+try:
+    from unittest import mock
+except ImportError:
+    import mock
+
+
+def migration(depends_on=(), touches=()):
+    return mock.Mock(depends_on=list(depends_on), touches=list(touches))
+
+
+class BuildGraphTestCase(unittest.TestCase):
+    @property
+    def target(self):
+        from ..scheduler import build_graph
+        return build_graph
+
+    def test_undeclared(self):
+        migrations = [('1', 'a', migration()),
+                      ('2', 'b', migration()),
+                      ('3', 'c', migration())]
+        self.assertEqual({'1': set(), '2': set(['1']), '3': set(['2'])},
+                         self.target(migrations))
+
+    def test_declared(self):
+        migrations = [('1', 'a', migration()),
+                      ('2', 'b', migration(touches=['a_table'])),
+                      ('3', 'c', migration(touches=['b_table'])),
+                      ('4', 'd', migration(touches=['a_table'])),
+                      ('5', 'e', migration(depends_on=['3', '0'])),
+                      ('6', 'f', migration()),
+                      ('7', 'g', migration(touches=['a_table']))]
+        self.assertEqual({
+            '1': set(),
+            '2': set(['1']),
+            '3': set(['1']),
+            '4': set(['1', '2']),
+            '5': set(['1', '3']),
+            '6': set(['1', '2', '3', '4', '5']),
+            '7': set(['6']),
+            }, self.target(migrations))
+
+    def test_circular(self):
+        migrations = [('1', 'a', migration(depends_on=['2'])),
+                      ('2', 'b', migration(depends_on=['1']))]
+        with self.assertRaises(Exception) as cm:
+            self.target(migrations)
+        self.assertEqual('Circular migration dependencies: 1 -> 2 -> 1',
+                         str(cm.exception))
+
+
+class RunInParallelTestCase(unittest.TestCase):
+    def setUp(self):
+        patcher = mock.patch('dbmigrator.utils.db_connect')
+        self.db_connect = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    @property
+    def target(self):
+        from ..scheduler import run_in_parallel
+        return run_in_parallel
+
+    def test_order(self):
+        migrations = [('1', 'a', migration(touches=['a_table'])),
+                      ('2', 'b', migration(touches=['b_table'])),
+                      ('3', 'c', migration(depends_on=['1', '2']))]
+        lock = threading.Lock()
+        ran = []
+
+        def callback(cursor, version, migration_name, migration):
+            with lock:
+                ran.append(version)
+
+        self.target(migrations, 2, 'dbname=test', callback)
+        self.assertEqual(['1', '2', '3'], sorted(ran))
+        self.assertEqual('3', ran[-1])
+        self.assertEqual(2, self.db_connect.call_count)
+
+    def test_error(self):
+        migrations = [('1', 'a', migration()),
+                      ('2', 'b', migration())]
+        ran = []
+
+        def callback(cursor, version, migration_name, migration):
+            ran.append(version)
+            raise ValueError(version)
+
+        with self.assertRaises(ValueError):
+            self.target(migrations, 2, 'dbname=test', callback)
+        # the second migration depends on the first one
+        self.assertEqual(['1'], ran)
+
+    def test_cursor_wrappers(self):
+        from .. import utils
+
+        migrations = [('1', 'a', migration(touches=['a_table'])),
+                      ('2', 'b', migration(touches=['b_table']))]
+        lock = threading.Lock()
+        wrapped = []
+
+        def callback(cursor, version, migration_name, migration):
+            with utils.cursor_wrapper(lambda cursor: (cursor, version)):
+                with lock:
+                    wrapped.append(utils.wrap_cursor('cursor'))
+
+        # e.g. --trace-sql, inherited by the workers
+        with utils.cursor_wrapper(lambda cursor: (cursor, 'traced')):
+            self.target(migrations, 2, 'dbname=test', callback)
+            # the wrappers of a worker are its own
+            self.assertEqual(1, len(utils.cursor_wrappers()))
+        self.assertEqual([(('cursor', 'traced'), '1'),
+                          (('cursor', 'traced'), '2')], sorted(wrapped))
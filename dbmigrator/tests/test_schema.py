@@ -0,0 +1,158 @@
+# -*- coding: utf-8 -*-
+# ###
+# Copyright (c) 2026, Rice University
+# This software is subject to the provisions of the GNU Affero General
+# Public License version 3 (AGPLv3).
+# See LICENCE.txt for details.
+# ###
+
+import unittest
+try:
+    from unittest import mock
+except ImportError:
+    import mock
+
+from . import testing
+from ..utils import db_connect
+
+
+logger = mock.Mock()
+
+
+class SchemaTestCase(unittest.TestCase):
+    def setUp(self):
+        import dbmigrator
+        _logger = dbmigrator.utils.logger
+        self.addCleanup(setattr, dbmigrator.utils, 'logger', _logger)
+        dbmigrator.utils.logger = logger
+        logger.reset_mock()
+
+    def tearDown(self):
+        with db_connect(testing.db_connection_string) as db_conn:
+            with db_conn.cursor() as cursor:
+                cursor.execute('DROP TABLE IF EXISTS a_table')
+
+    def test_snapshot(self):
+        from ..schema import snapshot
+
+        with db_connect(testing.db_connection_string) as db_conn:
+            with db_conn.cursor() as cursor:
+                cursor.execute('CREATE TABLE a_table (name TEXT NOT NULL)')
+                cursor.execute('CREATE INDEX a_table_name ON a_table (name)')
+                schema = snapshot(cursor)
+
+        table = schema[('public', 'a_table', 'TABLE', 'a_table')]
+        self.assertTrue(table.startswith("""\
+CREATE TABLE a_table (
+    name text NOT NULL
+);
+ALTER TABLE a_table OWNER TO travis;"""))
+        self.assertEqual(
+            'CREATE INDEX a_table_name ON a_table USING btree (name);',
+            schema[('public', 'a_table', 'INDEX', 'a_table_name')])
+
+    def test_diff(self):
+        from ..schema import diff
+
+        old = {('public', 'a_table', 'TABLE', 'a_table'):
+               'CREATE TABLE a_table (\n    name text\n);',
+               ('public', 'b_table', 'TABLE', 'b_table'):
+               'CREATE TABLE b_table (\n    id integer\n);'}
+        new = {('public', 'a_table', 'TABLE', 'a_table'):
+               'CREATE TABLE a_table (\n    name text,\n    karen text\n);',
+               ('public', 'b_table', 'TABLE', 'b_table'):
+               'CREATE TABLE b_table (\n    id integer\n);'}
+
+        self.assertEqual(diff(old, new), """\
+--- TABLE public.a_table
++++ TABLE public.a_table
+@@ -1,3 +1,4 @@
+ CREATE TABLE a_table (
+-    name text
++    name text,
++    karen text
+ );
+""")
+        self.assertEqual(diff(new, new), '')
+
+    def test_referenced_names(self):
+        from ..schema import referenced_names
+
+        self.assertEqual(referenced_names([
+            'CREATE SCHEMA s',
+            'CREATE TABLE s.a_table (name TEXT)',
+            'CREATE INDEX CONCURRENTLY IF NOT EXISTS a_idx ON "A_Table" (x)',
+            'GRANT ALL PRIVILEGES ON TABLE super_table TO travis',
+            'COMMENT ON COLUMN s.b_table.name IS NULL',
+            'INSERT INTO c_table VALUES (1) ON CONFLICT (id) DO NOTHING',
+            ]), ({'s'}, {'a_table', 'a_idx', 'A_Table', 'super_table',
+                         'b_table', 'c_table'}))
+
+    def test_referenced_names_unknown(self):
+        from ..schema import referenced_names
+
+        for statement in ('DO $$BEGIN EXECUTE $q$DROP TABLE a$q$; END$$',
+                          "DO LANGUAGE plpgsql 'BEGIN NULL; END'",
+                          'CALL make_tables()',
+                          'ALTER DEFAULT PRIVILEGES GRANT SELECT ON TABLES '
+                          'TO travis'):
+            # the whole schema is diffed
+            self.assertIsNone(referenced_names(['CREATE TABLE a (id INT)',
+                                                statement]), statement)
+
+    def test_schema_tracker_touched(self):
+        from .. import schema
+        from ..schema import SchemaTracker
+        from ..utils import wrap_cursor
+
+        def create_tables(cursor):
+            wrap_cursor(cursor).execute('CREATE TABLE a_table (name TEXT)')
+            cursor.execute('CREATE TABLE b_table (name TEXT)')
+
+        self.addCleanup(self._drop_table, 'b_table')
+
+        with db_connect(testing.db_connection_string) as db_conn:
+            with db_conn.cursor() as cursor:
+                tracker = SchemaTracker(cursor, 'touched')
+                with mock.patch.object(schema, 'snapshot',
+                                       wraps=schema.snapshot) as snapshot:
+                    tracker.compare(create_tables, cursor)
+
+                # b_table is not referenced through the migration cursor
+                changes = logger.info.call_args[0][0]
+                self.assertIn('+CREATE TABLE a_table (', changes)
+                self.assertNotIn('b_table', changes)
+                snapshot.assert_called_with(cursor, set(), {'a_table'})
+
+    def _drop_table(self, name):
+        with db_connect(testing.db_connection_string) as db_conn:
+            with db_conn.cursor() as cursor:
+                cursor.execute('DROP TABLE IF EXISTS {}'.format(name))
+
+    def test_schema_tracker(self):
+        from .. import schema
+        from ..schema import SchemaTracker
+
+        def create_table(cursor):
+            cursor.execute('CREATE TABLE a_table (name TEXT)')
+
+        def add_column(cursor):
+            cursor.execute('ALTER TABLE a_table ADD COLUMN karen TEXT')
+
+        with db_connect(testing.db_connection_string) as db_conn:
+            with db_conn.cursor() as cursor:
+                tracker = SchemaTracker(cursor)
+                with mock.patch.object(schema, 'snapshot',
+                                       wraps=schema.snapshot) as snapshot:
+                    tracker.compare(create_table, cursor)
+                    self.assertIn('+CREATE TABLE a_table (',
+                                  logger.info.call_args[0][0])
+
+                    tracker.compare(add_column, cursor)
+                    self.assertIn('+    karen text',
+                                  logger.info.call_args[0][0])
+                    self.assertNotIn('+CREATE TABLE a_table (',
+                                     logger.info.call_args[0][0])
+
+                # the snapshot after a migration is reused before the next
+                self.assertEqual(3, snapshot.call_count)
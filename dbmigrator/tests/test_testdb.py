@@ -0,0 +1,72 @@
+# -*- coding: utf-8 -*-
+# ###
+# Copyright (c) 2026, Rice University
+# This software is subject to the provisions of the GNU Affero General
+# Public License version 3 (AGPLv3).
+# See LICENCE.txt for details.
+# ###
+
+import os
+import shutil
+import tempfile
+import unittest
+try:
+    from unittest import mock
+except ImportError:
+    import mock
+
+from . import testing
+from ..utils import db_connect
+
+
+class MigrationsHashTestCase(unittest.TestCase):
+    def test(self):
+        from ..testdb import migrations_hash
+
+        md = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, md)
+        path = os.path.join(md, '20170810093842_create_a_table.py')
+        with open(path, 'w') as f:
+            f.write('def up(cursor):\n    pass\n')
+
+        first = migrations_hash([md])
+        self.assertEqual(12, len(first))
+        self.assertEqual(first, migrations_hash([md]))
+
+        with open(path, 'a') as f:
+            f.write('\n')
+        self.assertNotEqual(first, migrations_hash([md]))
+
+
+class TemplateTestCase(unittest.TestCase):
+    def setUp(self):
+        import dbmigrator
+        _logger = dbmigrator.utils.logger
+        self.addCleanup(setattr, dbmigrator.utils, 'logger', _logger)
+        dbmigrator.utils.logger = mock.Mock()
+
+    def test(self):
+        from ..testdb import create_template, create_database, drop_database
+
+        md = os.path.join(testing.test_data_path, 'md')
+        template = create_template(testing.db_connection_string, [md])
+        self.addCleanup(drop_database, testing.db_connection_string,
+                        template)
+        self.assertTrue(template.startswith('dbmigrator_template_'))
+        # the template exists now
+        self.assertEqual(template, create_template(
+            testing.db_connection_string, [md]))
+
+        db_connection_string = create_database(
+            testing.db_connection_string, template, 'dbmigrator_test_clone')
+        self.addCleanup(drop_database, testing.db_connection_string,
+                        'dbmigrator_test_clone')
+        with db_connect(db_connection_string) as db_conn:
+            with db_conn.cursor() as cursor:
+                cursor.execute('SELECT current_database(), count(*) '
+                               'FROM a_table')
+                self.assertEqual(('dbmigrator_test_clone', 0),
+                                 cursor.fetchone())
+                cursor.execute('SELECT version FROM schema_migrations '
+                               'ORDER BY version')
+                self.assertEqual([('20170810093842',)], cursor.fetchall())
@@ -0,0 +1,85 @@
+# -*- coding: utf-8 -*-
+# ###
+# Copyright (c) 2026, Rice University
+# This software is subject to the provisions of the GNU Affero General
+# Public License version 3 (AGPLv3).
+# See LICENCE.txt for details.
+# ###
+
+import re
+import unittest
+try:
+    from unittest import mock
+except ImportError:
+    import mock
+
+
+class TracingCursorTestCase(unittest.TestCase):
+    def setUp(self):
+        import dbmigrator
+        _logger = dbmigrator.utils.logger
+        self.addCleanup(setattr, dbmigrator.utils, 'logger', _logger)
+        self.logger = dbmigrator.utils.logger = mock.Mock()
+
+    @property
+    def target(self):
+        from ..tracing import TracingCursor
+        return TracingCursor
+
+    def test_log_all(self):
+        cursor = mock.Mock(rowcount=2)
+        tracing_cursor = self.target(cursor)
+
+        tracing_cursor.execute('UPDATE a_table\n    SET name = %s', ('a',))
+        tracing_cursor.executemany('INSERT INTO a_table VALUES (%s, %s)',
+                                   [('b', 1), ('c', 2)])
+        tracing_cursor.fetchall()
+
+        cursor.execute.assert_called_once_with(
+            'UPDATE a_table\n    SET name = %s', ('a',))
+        cursor.fetchall.assert_called_once_with()
+        messages = [c[0][0] for c in self.logger.info.call_args_list]
+        self.assertEqual(2, len(messages))
+        self.assertTrue(re.match(
+            r'^Statement [0-9.]+ms, 2 rows, 1 parameters of 1 bytes: '
+            r'UPDATE a_table SET name = %s$',
+            messages[0]))
+        self.assertTrue(re.match(
+            r'^Statement [0-9.]+ms, 2 rows, 4 parameters of 4 bytes: '
+            r'INSERT INTO',
+            messages[1]))
+        self.assertEqual(0, self.logger.warning.call_count)
+
+    def test_parameters_size(self):
+        cursor = mock.Mock(rowcount=1)
+        self.target(cursor).execute(
+            'INSERT INTO a VALUES (%(name)s, %(data)s, %(id)s, %(x)s)',
+            {'name': u'\xe9t\xe9', 'data': b'\x00' * 10, 'id': 123,
+             'x': None})
+        self.assertIn('4 parameters of 18 bytes',
+                      self.logger.info.call_args[0][0])
+
+    def test_slow_statement(self):
+        cursor = mock.Mock(rowcount=-1)
+        tracing_cursor = self.target(cursor, log_all=False,
+                                     slow_statement_ms=0)
+        tracing_cursor.execute('SELECT pg_sleep(1)')
+
+        self.assertEqual(0, self.logger.info.call_count)
+        self.assertTrue(re.match(
+            r'^Slow statement [0-9.]+ms, -1 rows, 0 parameters of 0 '
+            r'bytes: '
+            r'SELECT pg_sleep\(1\)$',
+            self.logger.warning.call_args[0][0]))
+
+        tracing_cursor = self.target(cursor, log_all=False,
+                                     slow_statement_ms=60000)
+        tracing_cursor.execute('SELECT 1')
+        self.assertEqual(1, self.logger.warning.call_count)
+
+    def test_error(self):
+        cursor = mock.Mock(rowcount=-1)
+        cursor.execute.side_effect = ValueError
+        with self.assertRaises(ValueError):
+            self.target(cursor).execute('SELECT x')
+        self.assertEqual(1, self.logger.info.call_count)
@@ -8,6 +8,7 @@
 
 import datetime
 import os.path
+import shutil
 import tempfile
 import unittest
 try:
@@ -79,6 +80,27 @@ CREATE TABLE schema_migrations (
                 cursor.execute('SELECT * FROM super_table')
                 self.assertEqual('62', cursor.fetchone()[0])
 
+    def test_connection_pool(self):
+        from ..utils import connection_pool, super_user
+
+        with connection_pool() as pool:
+            with super_user() as super_cursor:
+                super_cursor.execute('SET search_path TO foo')
+                super_cursor.execute('SELECT pg_backend_pid()')
+                pid = super_cursor.fetchone()[0]
+            with super_user() as super_cursor:
+                super_cursor.execute('SELECT pg_backend_pid()')
+                self.assertEqual(pid, super_cursor.fetchone()[0])
+                # the connection is reset before being reused
+                super_cursor.execute('SHOW search_path')
+                self.assertNotEqual('foo', super_cursor.fetchone()[0])
+                with super_user() as nested_cursor:
+                    nested_cursor.execute('SELECT pg_backend_pid()')
+                    self.assertNotEqual(pid, nested_cursor.fetchone()[0])
+
+        self.assertEqual((1, 2), (pool.hits, pool.misses))
+        logger.debug.assert_called_with('Connection pool: 1 hits, 2 misses')
+
     def test_get_settings_from_entry_points(self):
         from ..utils import get_settings_from_entry_points
 
@@ -212,6 +234,51 @@ CREATE TABLE schema_migrations (
             ('20160228210326', 'initial_data'),
             ('20160228212456', 'cool_stuff')])
 
+    def test_inspect_migration(self):
+        from ..utils import inspect_migration
+
+        md = os.path.join(testing.test_data_path, 'md')
+
+        self.assertEqual(
+            {'functions': ['down', 'up'], 'deferred': False,
+             'depends_on': [], 'touches': []},
+            inspect_migration(
+                os.path.join(md, '20170810093842_create_a_table.py')))
+        self.assertEqual(
+            {'functions': ['down', 'should_run', 'up'], 'deferred': True,
+             'depends_on': [], 'touches': []},
+            inspect_migration(os.path.join(md, '20170810124056_empty.py')))
+
+        tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp_dir)
+        path = os.path.join(tmp_dir, '20170810124057_conditional.py')
+        with open(path, 'w') as f:
+            f.write("""\
+try:
+    from somewhere import up
+except ImportError:
+    def up(cursor):
+        pass
+""")
+        # can't tell without importing the migration
+        self.assertEqual(None, inspect_migration(path))
+
+    def test_get_pending_migrations_does_not_import(self):
+        from ..utils import get_pending_migrations
+
+        md = os.path.join(testing.test_data_path, 'md')
+        with mock.patch('dbmigrator.utils.import_migration') as import_:
+            with db_connect(testing.db_connection_string) as db_conn:
+                with db_conn.cursor() as cursor:
+                    migrations = list(get_pending_migrations(
+                        [md], cursor, include_defers=True))
+
+        self.assertEqual(migrations, [
+            ('20170810093842', 'create_a_table'),
+            ('20170810093943', 'repeat_insert_data'),
+            ('20170810124056', 'empty')])
+        self.assertEqual(0, import_.call_count)
+
     def test_run_migration(self):
         from ..utils import run_migration, get_pending_migrations
 
@@ -232,6 +299,41 @@ CREATE TABLE schema_migrations (
 
         self.assertNotIn((version, name), after_migrations)
 
+    @mock.patch('dbmigrator.utils.time.sleep')
+    def test_run_migration_retries(self, sleep):
+        from ..utils import run_migration, timeouts
+
+        with db_connect(testing.db_connection_string) as db_conn:
+            with db_conn.cursor() as cursor:
+                cursor.execute('CREATE TABLE a_table (id INTEGER)')
+
+        attempts = []
+
+        class Migration(object):
+            @timeouts(lock_timeout='100ms', retries=2)
+            def up(self, cursor):
+                attempts.append(1)
+                if len(attempts) == 2:
+                    # the other transaction finishes
+                    locking_conn.rollback()
+                cursor.execute('ALTER TABLE a_table ADD COLUMN name TEXT')
+
+        with db_connect(testing.db_connection_string) as locking_conn:
+            with locking_conn.cursor() as locking_cursor:
+                locking_cursor.execute('LOCK TABLE a_table')
+                with db_connect(testing.db_connection_string) as db_conn:
+                    with db_conn.cursor() as cursor:
+                        run_migration(cursor, '20170810093842', 'retry',
+                                      Migration())
+                        cursor.execute('SHOW lock_timeout')
+                        self.assertEqual('0', cursor.fetchone()[0])
+
+        self.assertEqual(2, len(attempts))
+        self.assertEqual(1, sleep.call_count)
+        self.assertTrue(logger.warning.call_args[0][0].startswith(
+            'Migration 20170810093842 failed (canceling statement due to '
+            'lock timeout), retrying in '))
+
     def test_rollback_migration(self):
         from ..utils import (
             rollback_migration, run_migration, get_pending_migrations)
@@ -255,6 +357,40 @@ CREATE TABLE schema_migrations (
 
         self.assertIn((version, name), after_migrations)
 
+    def test_migration_state(self):
+        from ..utils import (
+            MigrationState, mark_migration, run_migration,
+            get_pending_migrations)
+
+        with db_connect(testing.db_connection_string) as db_conn:
+            with db_conn.cursor() as cursor:
+                mark_migration(cursor, '20160228210326', 'deferred')
+                db_conn.commit()
+                mark_migration(cursor, '20160228212456', True)
+                db_conn.commit()
+
+                state = MigrationState.load(cursor)
+                self.assertEqual(
+                    ['20160228212456', '20160228210326'], state.versions())
+                self.assertEqual(['20160228212456'],
+                                 state.versions(include_deferred=False))
+                self.assertEqual(None, state['20160228210326'])
+
+                with mock.patch('dbmigrator.utils.get_schema_versions') as \
+                        get_schema_versions:
+                    (version, name, migration), = get_pending_migrations(
+                        testing.test_migrations_directories, cursor,
+                        import_modules=True, state=state)
+                    run_migration(cursor, version, name, migration,
+                                  state=state)
+                    mark_migration(cursor, '20160228212456', False, state)
+                # schema_migrations is only read once
+                self.assertEqual(0, get_schema_versions.call_count)
+
+                self.assertEqual(
+                    ['20160228202637', '20160228210326'], state.versions())
+                self.assertEqual(MigrationState.load(cursor), state)
+
     def test_timestamp(self):
         from ..utils import timestamp
 
@@ -263,3 +399,153 @@ CREATE TABLE schema_migrations (
         with mock.patch('datetime.datetime') as mock_datetime:
             mock_datetime.utcnow.return_value = now
             self.assertEqual(timestamp(), '20160228225156')
+
+
+class MigrationLockTestCase(unittest.TestCase):
+    @property
+    def target(self):
+        from ..utils import migration_lock
+        return migration_lock
+
+    def test_error(self):
+        from ..utils import MIGRATION_LOCK_KEY
+
+        cursor = mock.Mock()
+        cursor.connection.closed = False
+        cursor.fetchone.return_value = (True,)
+        with self.assertRaises(ValueError):
+            with self.target(cursor):
+                raise ValueError
+        # rolled back, then the lock is released for the next user of the
+        # connection
+        cursor.connection.rollback.assert_called_once_with()
+        self.assertEqual(
+            mock.call('SELECT pg_advisory_unlock(%s)', (MIGRATION_LOCK_KEY,)),
+            cursor.execute.call_args)
+        cursor.connection.commit.assert_called_once_with()
+
+
+class ForbidCommitsTestCase(unittest.TestCase):
+    @property
+    def target(self):
+        from ..utils import forbid_commits
+        return forbid_commits
+
+    def test_migration_cursor(self):
+        from ..utils import _MigrationCursor
+
+        cursor = mock.Mock()
+        migration_cursor = _MigrationCursor(cursor)
+        migration_cursor.connection.commit()
+        with self.target('with --single-transaction'):
+            with self.assertRaises(Exception) as cm:
+                migration_cursor.connection.commit()
+        self.assertEqual('The migration commits, which is not possible '
+                         'with --single-transaction', str(cm.exception))
+        self.assertEqual(1, cursor.connection.commit.call_count)
+        migration_cursor.connection.commit()
+        self.assertEqual(2, cursor.connection.commit.call_count)
+
+    def test_super_user(self):
+        from ..utils import check_commit
+
+        with self.target('with --single-transaction'):
+            check_commit('super_user()', super_user=True)
+            with self.target('with --plan', super_user=True):
+                with self.assertRaises(Exception) as cm:
+                    check_commit('super_user()', super_user=True)
+        self.assertEqual('super_user() commits, which is not possible '
+                         'with --plan', str(cm.exception))
+
+    def test_timeouts(self):
+        from .. import batch
+        from ..utils import _run_up, timeouts
+
+        class Migration(object):
+            @timeouts(lock_timeout='100ms', retries=2)
+            def up(self, cursor):
+                batch.backfill(cursor, 'a_table', 'UPDATE a_table SET a = 1',
+                               name='a')
+
+        cursor = mock.Mock()
+        cursor.fetchone.return_value = ('0',)
+        with self.assertRaises(Exception) as cm:
+            _run_up(cursor, '20170810093842', Migration(), cursor)
+        self.assertEqual('batch.backfill commits, which is not possible with '
+                         '@timeouts, --lock-timeout, --statement-timeout or '
+                         '--retries', str(cm.exception))
+
+
+class InspectMigrationTestCase(unittest.TestCase):
+    def inspect(self, source):
+        from ..utils import inspect_migration
+
+        tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp_dir)
+        path = os.path.join(tmp_dir, '20170810124057_a.py')
+        with open(path, 'w') as f:
+            f.write(source)
+        return inspect_migration(path)
+
+    def test_imports(self):
+        # imports not binding migration functions don't need importing
+        result = self.inspect("""\
+from __future__ import print_function
+import json
+from psycopg2 import sql
+from dbmigrator.utils import deferred as later
+
+
+@later
+def up(cursor):
+    pass
+""")
+        self.assertEqual({'functions': ['up'], 'deferred': True,
+                          'depends_on': [], 'touches': []}, result)
+
+    def test_module_aliases(self):
+        for source in ('import dbmigrator.utils\n\n\n'
+                       '@dbmigrator.utils.deferred\n',
+                       'import dbmigrator.utils as u\n\n\n@u.deferred\n',
+                       'import dbmigrator\n\n\n@dbmigrator.deferred\n',
+                       'import dbmigrator\n\n\n@dbmigrator.utils.deferred\n',
+                       'from dbmigrator import utils\n\n\n@utils.deferred\n',
+                       'from dbmigrator import utils as u\n\n\n'
+                       '@u.deferred\n'):
+            result = self.inspect(source + 'def up(cursor):\n    pass\n')
+            self.assertTrue(result['deferred'], source)
+
+    def test_dbmigrator_decorators(self):
+        result = self.inspect("""\
+from dbmigrator import utils, timeouts
+
+
+@timeouts(lock_timeout='1s')
+@utils.batched
+def up(cursor):
+    pass
+""")
+        self.assertEqual({'functions': ['up'], 'deferred': False,
+                          'depends_on': [], 'touches': []}, result)
+
+    def test_unknown_decorators(self):
+        for source in ('import decorators\n\n\n@decorators.later\n',
+                       'def later(func):\n    return func\n\n\n@later\n',
+                       'from dbmigrator import deferred\n'
+                       'deferred = print\n\n\n@deferred\n',
+                       'from dbmigrator import utils\n'
+                       'import os as utils\n\n\n@utils.deferred\n',
+                       '@(lambda func: func)\n'):
+            # they could defer the migration, only importing it tells
+            self.assertEqual(None, self.inspect(
+                source + 'def up(cursor):\n    pass\n'), source)
+
+    def test_imported_functions(self):
+        for source in ('from somewhere import up\n',
+                       'from somewhere import helper as down\n',
+                       'from somewhere import *\n',
+                       'import touches\n',
+                       'try:\n    from dbmigrator import deferred\n'
+                       'except ImportError:\n    pass\n'):
+            # can't tell without importing the migration
+            self.assertEqual(None, self.inspect(source), source)
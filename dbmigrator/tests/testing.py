@@ -13,6 +13,12 @@ import sys
 
 import pip
 
+try:
+    import psycopg  # noqa
+    has_psycopg = True
+except ImportError:
+    has_psycopg = False
+
 
 here = os.path.abspath(os.path.dirname(__file__))
 db_connection_string = 'dbname=travis user=travis host=localhost'
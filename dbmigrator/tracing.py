@@ -0,0 +1,102 @@
+# -*- coding: utf-8 -*-
+# ###
+# Copyright (c) 2026, Rice University
+# This software is subject to the provisions of the GNU Affero General
+# Public License version 3 (AGPLv3).
+# See LICENCE.txt for details.
+# ###
+"""Log the statements executed by the migrations, how long they took and
+the rows they affected."""
+
+from contextlib import contextmanager
+import re
+import time
+
+from . import utils
+from .cursors import CursorProxy
+
+
+__all__ = ('TracingCursor', 'trace_sql')
+
+
+# Statements longer than this are shortened in the log
+MAX_STATEMENT_LENGTH = 500
+
+
+def _statement_text(cursor, query):
+    if hasattr(query, 'as_string'):
+        # psycopg2.sql or psycopg.sql Composable
+        query = query.as_string(cursor)
+    if isinstance(query, bytes):
+        query = query.decode('utf-8', 'replace')
+    query = re.sub(r'\s+', ' ', query).strip()
+    if len(query) > MAX_STATEMENT_LENGTH:
+        query = query[:MAX_STATEMENT_LENGTH - 3] + '...'
+    return query
+
+
+def _values(vars):
+    if vars is None:
+        return []
+    if isinstance(vars, dict):
+        return list(vars.values())
+    return list(vars)
+
+
+def _value_size(value):
+    """Return the size in bytes of ``value`` as text, about what is sent to
+    the database.
+    """
+    if value is None:
+        return 0
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return len(value)
+    if not isinstance(value, type(u'')):
+        value = u'{}'.format(value)
+    return len(value.encode('utf-8'))
+
+
+class TracingCursor(CursorProxy):
+    """Pass everything through to ``cursor``, logging every statement if
+    ``log_all`` and the statements taking at least ``slow_statement_ms``
+    milliseconds as warnings.
+    """
+
+    def __init__(self, cursor, log_all=True, slow_statement_ms=None):
+        super(TracingCursor, self).__init__(cursor)
+        self._log_all = log_all
+        self._slow_statement_ms = slow_statement_ms
+
+    def _execute(self, method, query, vars, many=False):
+        if many:
+            vars = list(vars)
+            values = [value for v in vars for value in _values(v)]
+        else:
+            values = _values(vars)
+        start = time.time()
+        try:
+            return method(query, vars)
+        finally:
+            duration = (time.time() - start) * 1000
+            slow = (self._slow_statement_ms is not None and
+                    duration >= self._slow_statement_ms)
+            if slow or self._log_all:
+                message = (
+                    '{:.1f}ms, {} rows, {} parameters of {} bytes: {}'
+                    .format(duration, self._cursor.rowcount, len(values),
+                            sum(_value_size(value) for value in values),
+                            _statement_text(self._cursor, query)))
+                if slow:
+                    utils.logger.warning('Slow statement {}'.format(message))
+                else:
+                    utils.logger.info('Statement {}'.format(message))
+
+
+@contextmanager
+def trace_sql(log_all=True, slow_statement_ms=None):
+    """Trace the cursors given to migrations, and ``super_user`` cursors,
+    while in this context.
+    """
+    with utils.cursor_wrapper(lambda cursor: TracingCursor(
+            cursor, log_all, slow_statement_ms)):
+        yield
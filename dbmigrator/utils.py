@@ -11,21 +11,27 @@ try:
 except ImportError:
     # python 2
     import ConfigParser as configparser
+import ast
 from contextlib import contextmanager
 import datetime
 import difflib
 import functools
 import glob
+import hashlib
 import logging
 import os
-import pkg_resources
+import random
 import re
-from select import select
+import socket
 import sys
 import subprocess
+import threading
+import time
 
-import psycopg2
-from psycopg2.extensions import POLL_OK, POLL_READ, POLL_WRITE
+from . import entry_points, manifest, metrics, pipeline, profiling
+from .cursors import CursorProxy
+# wait_select_inter is also importable from here, where it used to be
+from .drivers import load_driver, wait_select_inter  # noqa
 
 
 logger = logging.getLogger('dbmigrator')
@@ -38,9 +44,33 @@ logger.addHandler(handler)
 
 
 _settings = {}
+# The database driver, see ``set_driver``
+_driver = None
+# The database driver, settings and cursor wrappers of a thread (see
+# ``thread_driver``, ``thread_settings`` and ``cursor_wrapper``), the
+# migration it runs and why it can't commit (see ``forbid_commits``)
+_thread = threading.local()
+# The connection pool of the running command, see ``with_cursor``
+_pool = None
+
+# The version of the schema_migrations table created by "init"
+BOOKKEEPING_VERSION = 3
+
+# The advisory lock key taken while changing the migrations ("dbmigrat")
+MIGRATION_LOCK_KEY = 0x64626d6967726174
+
+# The errors a migration is retried on: lock_not_available (lock_timeout),
+# deadlock_detected and serialization_failure
+RETRY_ERRORS = ('55P03', '40P01', '40001')
+# The delay before the first retry and the longest delay, in seconds
+RETRY_DELAY = 0.5
+RETRY_MAX_DELAY = 30
 
 
 def get_settings():
+    settings = getattr(_thread, 'settings', None)
+    if settings is not None:
+        return settings
     return _settings
 
 
@@ -49,24 +79,271 @@ def set_settings(settings):
     _settings = settings
 
 
+def get_driver():
+    """Return the database driver, psycopg2 unless set with ``set_driver``
+    or ``thread_driver``.
+    """
+    driver = getattr(_thread, 'driver', None)
+    if driver is not None:
+        return driver
+    if _driver is None:
+        set_driver('psycopg2')
+    return _driver
+
+
+def set_driver(name):
+    """Use the database driver ``name``, "psycopg2" or "psycopg" (psycopg
+    3), see ``drivers``.
+    """
+    global _driver
+    _driver = load_driver(name)
+
+
+@contextmanager
+def thread_driver(name):
+    """Use the database driver ``name`` in this thread while in this context,
+    whatever the driver of the other threads.
+    """
+    previous = getattr(_thread, 'driver', None)
+    _thread.driver = load_driver(name)
+    try:
+        yield _thread.driver
+    finally:
+        _thread.driver = previous
+
+
+@contextmanager
+def thread_settings(settings, super_user_connect=None):
+    """Use ``settings`` in this thread while in this context, whatever the
+    settings of the other threads, and make the ``super_user()`` connections
+    with ``super_user_connect(dsn, user=...)`` if given, a context manager
+    like ``connect``.
+    """
+    previous = (getattr(_thread, 'settings', None),
+                getattr(_thread, 'super_user_connect', None))
+    _thread.settings = settings
+    _thread.super_user_connect = super_user_connect
+    try:
+        yield settings
+    finally:
+        _thread.settings, _thread.super_user_connect = previous
+
+
 @contextmanager
 def db_connect(*args, **kwargs):
-    db_conn = psycopg2.connect(*args, **kwargs)
+    driver = get_driver()
+    db_conn = driver.connect(*args, **kwargs)
     try:
-        with db_conn:
+        with driver.transaction(db_conn):
             yield db_conn
     finally:
         db_conn.close()
 
 
+class ConnectionPool(object):
+    """Idle connections kept for reuse, by connection string and connection
+    arguments (e.g. the super user).
+
+    A connection is committed, or rolled back on error, and reset before
+    being reused.
+    """
+
+    def __init__(self):
+        self._idle = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _get(self, key):
+        with self._lock:
+            idle = self._idle.get(key, [])
+            while idle:
+                db_conn = idle.pop()
+                if not db_conn.closed:
+                    self.hits += 1
+                    return db_conn
+            self.misses += 1
+
+    def _put(self, key, db_conn):
+        if db_conn.closed:
+            return
+        driver = get_driver()
+        try:
+            driver.reset(db_conn)
+        except driver.Error:
+            db_conn.close()
+            return
+        with self._lock:
+            self._idle.setdefault(key, []).append(db_conn)
+
+    @contextmanager
+    def connect(self, *args, **kwargs):
+        key = (args, tuple(sorted(kwargs.items())))
+        driver = get_driver()
+        db_conn = self._get(key)
+        if db_conn is None:
+            db_conn = driver.connect(*args, **kwargs)
+        try:
+            with driver.transaction(db_conn):
+                yield db_conn
+        finally:
+            self._put(key, db_conn)
+
+    def close(self):
+        with self._lock:
+            idle, self._idle = self._idle, {}
+        for db_conns in idle.values():
+            for db_conn in db_conns:
+                db_conn.close()
+        if self.hits + self.misses > 1:
+            # more than the command's own connection
+            logger.debug('Connection pool: {} hits, {} misses'
+                         .format(self.hits, self.misses))
+
+
+@contextmanager
+def connection_pool():
+    """Reuse the connections made with ``connect`` while in this context,
+    closing them at the end.
+    """
+    global _pool
+    if _pool is not None:
+        # already in a pool, e.g. a command calling another command
+        yield _pool
+        return
+    _pool = ConnectionPool()
+    try:
+        yield _pool
+    finally:
+        pool, _pool = _pool, None
+        pool.close()
+
+
+def connect(*args, **kwargs):
+    """Like ``db_connect``, using the connection pool if there is one."""
+    if _pool is not None:
+        return _pool.connect(*args, **kwargs)
+    return db_connect(*args, **kwargs)
+
+
 @contextmanager
 def super_user():
     settings = get_settings()
     super_user = settings.get('super_user', 'postgres')
-    with db_connect(settings['db_connection_string'],
-                    user=super_user) as db_conn:
+    check_commit('super_user()', super_user=True)
+    super_user_connect = getattr(_thread, 'super_user_connect', None)
+    with (super_user_connect or connect)(settings['db_connection_string'],
+                                         user=super_user) as db_conn:
         with db_conn.cursor() as cursor:
-            yield cursor
+            yield wrap_cursor(cursor)
+
+
+def cursor_wrappers():
+    """Return the cursor wrappers of this thread, see ``cursor_wrapper``."""
+    wrappers = getattr(_thread, 'cursor_wrappers', None)
+    if wrappers is None:
+        wrappers = _thread.cursor_wrappers = []
+    return wrappers
+
+
+@contextmanager
+def cursor_wrapper(wrapper):
+    """Wrap the cursors given to migrations run in this thread with
+    ``wrapper(cursor)`` while in this context.
+    """
+    wrappers = cursor_wrappers()
+    wrappers.append(wrapper)
+    try:
+        yield wrapper
+    finally:
+        wrappers.remove(wrapper)
+
+
+@contextmanager
+def thread_cursor_wrappers(wrappers):
+    """Use the cursor wrappers ``wrappers``, e.g. those of the thread
+    starting this one, in this thread while in this context.
+    """
+    previous = getattr(_thread, 'cursor_wrappers', None)
+    _thread.cursor_wrappers = list(wrappers)
+    try:
+        yield
+    finally:
+        _thread.cursor_wrappers = previous
+
+
+def wrap_cursor(cursor):
+    for wrapper in cursor_wrappers():
+        cursor = wrapper(cursor)
+    return cursor
+
+
+@contextmanager
+def forbid_commits(reason, super_user=False):
+    """Make the migrations run in this thread while in this context fail
+    when they commit, e.g. with ``batch.backfill``, and when they use
+    ``super_user()`` if ``super_user``.  ``reason`` completes the error,
+    e.g. "with --plan".
+    """
+    forbidden = _thread.__dict__.setdefault('forbidden_commits', [])
+    forbidden.append((reason, super_user))
+    try:
+        yield
+    finally:
+        forbidden.pop()
+
+
+def check_commit(what, super_user=False):
+    """Raise an exception if ``what``, which commits the connection of the
+    migration (or a ``super_user()`` connection if ``super_user``), can't
+    run now, see ``forbid_commits``.
+    """
+    for reason, forbid_super_user in reversed(
+            getattr(_thread, 'forbidden_commits', [])):
+        if forbid_super_user or not super_user:
+            raise Exception('{} commits, which is not possible {}'.format(
+                what, reason))
+
+
+class _MigrationConnection(object):
+    """The connection of a migration cursor, see ``_MigrationCursor``."""
+
+    def __init__(self, db_conn):
+        self._db_conn = db_conn
+
+    def commit(self):
+        check_commit('The migration')
+        return self._db_conn.commit()
+
+    def __getattr__(self, name):
+        return getattr(self._db_conn, name)
+
+
+class _MigrationCursor(CursorProxy):
+    """The cursor given to a migration, whose connection can only commit if
+    ``check_commit`` allows it.
+    """
+
+    @property
+    def connection(self):
+        return _MigrationConnection(self._cursor.connection)
+
+
+def current_migration():
+    """Return the version of the migration running in this thread, or
+    ``None``.
+    """
+    return getattr(_thread, 'migration', None)
+
+
+@contextmanager
+def _running_migration(version):
+    previous = current_migration()
+    _thread.migration = version
+    try:
+        yield
+    finally:
+        _thread.migration = previous
 
 
 def deferred(func):
@@ -75,44 +352,58 @@ def deferred(func):
     return func
 
 
-# psycopg2 / libpq doesn't respond to SIGINT (ctrl-c):
-# https://github.com/psycopg/psycopg2/issues/333
-# To get around this problem, using code from:
-# http://initd.org/psycopg/articles/2014/07/20/cancelling-postgresql-statements-python/ # noqa
-def wait_select_inter(conn):
-    while 1:
-        try:
-            state = conn.poll()
-            if state == POLL_OK:
-                break
-            elif state == POLL_READ:
-                select([conn.fileno()], [], [])
-            elif state == POLL_WRITE:
-                select([], [conn.fileno()], [])
-            else:
-                raise conn.OperationalError(
-                    'bad state from poll: {}'.format(state))
-        except KeyboardInterrupt:
-            conn.cancel()
-            continue
+def timeouts(lock_timeout=None, statement_timeout=None, retries=None):
+    """A decorator to set the ``lock_timeout`` and ``statement_timeout`` of
+    the migration, e.g. ``'5s'`` or ``500`` (milliseconds), and how many
+    times it is retried on a lock timeout, deadlock or serialization
+    failure.  These override the --lock-timeout, --statement-timeout and
+    --retries options.
+    """
+    def decorator(func):
+        func.dbmigrator_timeouts = {
+            'lock_timeout': lock_timeout,
+            'statement_timeout': statement_timeout,
+            'retries': retries,
+            }
+        return func
+    return decorator
+
+
+def batched(func=None, max_statements=1000):
+    """A decorator to send the statements of the migration to the database
+    in batches of up to ``max_statements``, see ``pipeline``.  Use it as
+    ``@batched`` or ``@batched(max_statements=100)``.
+    """
+    def decorator(func):
+        func.dbmigrator_batched = {'max_statements': max_statements}
+        return func
+    if func is not None:
+        return decorator(func)
+    return decorator
+
+
+def _call_migration(func, migration_cursor):
+    """Call ``func``, the up or down of a migration, with
+    ``migration_cursor``, batching its statements if it's ``batched``.
+    """
+    options = getattr(func, 'dbmigrator_batched', None)
+    if options is None:
+        return func(migration_cursor)
+    batching_cursor = pipeline.BatchingCursor(
+        migration_cursor, get_driver(), **options)
+    result = func(batching_cursor)
+    batching_cursor.flush()
+    return result
 
 
 def get_settings_from_entry_points(settings, contexts):
     context_settings = {}
 
+    # don't overwrite (or load) settings given from the CLI
+    skip = [name for name, value in settings.items() if value]
     for context in contexts:
-        entry_points = pkg_resources.get_entry_map(
-            context, __package__).values()
-        for entry_point in entry_points:
-            setting_name = entry_point.name
-            if settings.get(setting_name):
-                # don't overwrite settings given from the CLI
-                continue
-
-            value = entry_point.load()
-            if callable(value):
-                value = value()
-
+        for setting_name, value in sorted(
+                entry_points.get_settings(context, skip).items()):
             old_value = context_settings.get(setting_name)
             if (old_value and old_value != value or
                     isinstance(old_value, list) and value not in old_value):
@@ -150,12 +441,21 @@ def with_cursor(func):
         if not kwargs.get('db_connection_string'):
             raise Exception('db-connection-string missing')
         db_conn_str = kwargs.get('db_connection_string')
-        with db_connect(db_conn_str) as db_conn:
-            with db_conn.cursor() as cursor:
-                return func(cursor, *args, **kwargs)
+        with connection_pool():
+            with connect(db_conn_str) as db_conn:
+                with db_conn.cursor() as cursor:
+                    return func(cursor, *args, **kwargs)
     return wrapper
 
 
+def sql_identifier(name):
+    """Return a possibly schema qualified ``name`` quoted with the driver's
+    ``sql`` module, e.g. "public.users".
+    """
+    sql = get_driver().sql
+    return sql.SQL('.').join([sql.Identifier(n) for n in name.split('.')])
+
+
 def import_migration(path):
     dirname, basename = os.path.split(path)
     if dirname not in sys.path:
@@ -164,11 +464,223 @@ def import_migration(path):
     return __import__(module_name)
 
 
+# The functions a migration module may define.
+MIGRATION_FUNCTIONS = ('up', 'down', 'should_run')
+
+# Module level variables describing a migration:
+# - depends_on: versions of the migrations that must run before this one
+# - touches: names of the objects (tables etc.) the migration changes
+MIGRATION_METADATA = ('depends_on', 'touches')
+
+
+# Where ``deferred`` can be imported from
+DEFERRED_NAMES = ('dbmigrator.deferred', 'dbmigrator.utils.deferred')
+
+
+def _dotted_name(node):
+    if isinstance(node, ast.Name):
+        return node.id
+    if isinstance(node, ast.Attribute):
+        value = _dotted_name(node.value)
+        return value and '{}.{}'.format(value, node.attr)
+    return None
+
+
+def _import_bindings(node):
+    """Return the names bound by the import ``node`` with what they're bound
+    to, e.g. {'u': 'dbmigrator.utils'} for ``from dbmigrator import utils as
+    u``, or ``None`` for a name bound to something else.
+    """
+    bindings = {}
+    for alias in node.names:
+        if isinstance(node, ast.ImportFrom):
+            module = node.module if not node.level else None
+            value = module and '{}.{}'.format(module, alias.name)
+            bindings[alias.asname or alias.name] = value
+        elif alias.asname:
+            bindings[alias.asname] = alias.name
+        else:
+            # import a.b binds a
+            name = alias.name.split('.')[0]
+            bindings[name] = name
+    return bindings
+
+
+def _resolve_decorator(decorator, bindings):
+    """Return whether ``decorator`` is ``dbmigrator.deferred``, or ``None``
+    if it isn't something from dbmigrator, so what it does is unknown.
+    """
+    if isinstance(decorator, ast.Call):
+        decorator = decorator.func
+    name = _dotted_name(decorator)
+    if name is None:
+        return None
+    first, _, rest = name.partition('.')
+    value = bindings.get(first)
+    if value is None or \
+            value != 'dbmigrator' and not value.startswith('dbmigrator.'):
+        return None
+    if rest:
+        value = '{}.{}'.format(value, rest)
+    return value in DEFERRED_NAMES
+
+
+def _bound_names(node):
+    """Return the names bound by ``node`` and the statements in it, with
+    "*" for star imports.
+    """
+    names = set()
+    for n in ast.walk(node):
+        if isinstance(n, ast.Name) and isinstance(n.ctx, ast.Store):
+            names.add(n.id)
+        elif isinstance(n, (ast.FunctionDef, ast.ClassDef)) or \
+                type(n).__name__ == 'AsyncFunctionDef':
+            names.add(n.name)
+        elif isinstance(n, (ast.Import, ast.ImportFrom)):
+            names.update((alias.asname or alias.name).split('.')[0]
+                         for alias in n.names)
+    return names
+
+
+def _metadata_value(value):
+    if isinstance(value, (list, tuple, set)):
+        return sorted(str(v) for v in value)
+    if value:
+        return [str(value)]
+    return []
+
+
+def inspect_migration(path):
+    """Find the migration functions defined in ``path``, whether ``up`` is
+    deferred and the migration metadata, without importing it.
+
+    Return a dictionary with "functions", "deferred", "depends_on" and
+    "touches", or ``None`` if the migration can only be understood by
+    importing it.
+    """
+    with open(path, 'rb') as f:
+        try:
+            tree = ast.parse(f.read(), path)
+        except SyntaxError:
+            return None
+
+    # names bound by imports, with what they're bound to
+    bindings = {}
+    # the names which, if bound in an unexpected way, mean the migration
+    # has to be imported
+    names = set(MIGRATION_FUNCTIONS + MIGRATION_METADATA + ('*',))
+    result = {'functions': [], 'deferred': False}
+    result.update((name, []) for name in MIGRATION_METADATA)
+    for node in tree.body:
+        if isinstance(node, (ast.Import, ast.ImportFrom)):
+            if _bound_names(node) & names:
+                return None
+            bindings.update(_import_bindings(node))
+        elif isinstance(node, ast.FunctionDef):
+            if node.name not in MIGRATION_FUNCTIONS:
+                bindings[node.name] = None
+                continue
+            result['functions'].append(node.name)
+            if node.name == 'up':
+                decorators = [_resolve_decorator(d, bindings)
+                              for d in node.decorator_list]
+                if None in decorators:
+                    # e.g. a decorator of the migration's own
+                    return None
+                result['deferred'] = any(decorators)
+        elif isinstance(node, ast.ClassDef):
+            if node.name in MIGRATION_FUNCTIONS:
+                return None
+            bindings[node.name] = None
+        elif isinstance(node, ast.Assign) and len(node.targets) == 1 and \
+                isinstance(node.targets[0], ast.Name) and \
+                node.targets[0].id in MIGRATION_METADATA:
+            try:
+                value = ast.literal_eval(node.value)
+            except ValueError:
+                return None
+            result[node.targets[0].id] = _metadata_value(value)
+        else:
+            # conditional definitions, assignments, imports etc.
+            bound = _bound_names(node)
+            if bound & (names | set(['deferred'])):
+                return None
+            for name in bound:
+                bindings[name] = None
+    result['functions'].sort()
+    return result
+
+
+_NOT_INSPECTED = object()
+
+
+class LazyMigration(object):
+    """A migration module that is imported the first time one of its
+    functions is used.
+
+    Which functions are defined, whether ``up`` is deferred and the
+    migration metadata (``depends_on`` and ``touches``) are found by reading
+    the source of the migration, see ``is_repeat`` and ``is_deferred``.
+    """
+
+    def __init__(self, path, inspected=_NOT_INSPECTED):
+        self.path = path
+        self._module = None
+        if inspected is _NOT_INSPECTED:
+            inspected = inspect_migration(path)
+        if inspected is None:
+            module = self.module
+            inspected = {
+                'functions': [name for name in MIGRATION_FUNCTIONS
+                              if hasattr(module, name)],
+                'deferred': hasattr(getattr(module, 'up', None),
+                                    'dbmigrator_deferred'),
+                }
+            for name in MIGRATION_METADATA:
+                inspected[name] = _metadata_value(getattr(module, name, None))
+        self.functions = set(inspected['functions'])
+        self.dbmigrator_deferred = inspected['deferred']
+        self.depends_on = inspected['depends_on']
+        self.touches = inspected['touches']
+
+    @property
+    def module(self):
+        if self._module is None:
+            logger.debug('Importing migration {}'.format(self.path))
+            with profiling.span('import', path=self.path):
+                self._module = import_migration(self.path)
+        return self._module
+
+    def __getattr__(self, name):
+        if name.startswith('_'):
+            raise AttributeError(name)
+        if name in MIGRATION_FUNCTIONS and name not in self.functions:
+            raise AttributeError(name)
+        return getattr(self.module, name)
+
+    def __repr__(self):
+        return '<LazyMigration {}>'.format(self.path)
+
+
 def get_migrations(migration_directories, import_modules=False, reverse=False):
-    paths = [os.path.join(md, '*.py') for md in migration_directories]
-    python_files = functools.reduce(
-        lambda a, b: a + b,
-        [glob.glob(path) for path in paths], [])
+    """Yield (version, migration_name) for every migration, sorted by
+    filename.  With ``import_modules``, also yield the migration as a
+    ``LazyMigration``, which is only imported when it is run.  What is known
+    about the migrations is cached in their directory's manifest.
+    """
+    inspected = {}
+    with profiling.span('discovery'):
+        if import_modules:
+            for md in migration_directories:
+                inspected.update(manifest.inspect_directory(
+                    md, inspect_migration))
+            python_files = list(inspected)
+        else:
+            paths = [os.path.join(md, '*.py')
+                     for md in migration_directories]
+            python_files = functools.reduce(
+                lambda a, b: a + b,
+                [glob.glob(path) for path in paths], [])
     for path in sorted(python_files,
                        key=lambda path: os.path.basename(path),
                        reverse=reverse):
@@ -177,13 +689,15 @@ def get_migrations(migration_directories, import_modules=False, reverse=False):
         if m:
             version, migration_name = m.groups()
             if import_modules:
-                yield version, migration_name, import_migration(path)
+                yield (version, migration_name,
+                       LazyMigration(path, inspected[path]))
             else:
                 yield version, migration_name
 
 
 def get_schema_versions(cursor, versions_only=True, raise_error=True,
                         include_deferred=True, order_by='version'):
+    driver = get_driver()
     try:
         cursor.execute('SELECT * FROM schema_migrations ORDER BY {}'
                        .format(order_by))
@@ -194,7 +708,7 @@ def get_schema_versions(cursor, versions_only=True, raise_error=True,
                 yield i[0]
             else:
                 yield i
-    except psycopg2.ProgrammingError as e:
+    except driver.ProgrammingError as e:
         if raise_error:
             raise
         logger.warning(str(e))
@@ -202,11 +716,50 @@ def get_schema_versions(cursor, versions_only=True, raise_error=True,
                        'dbmigrator init --help')
 
 
+class MigrationState(dict):
+    """The contents of schema_migrations, version -> applied timestamp
+    (``None`` if deferred).
+
+    Load it once per command with ``MigrationState.load`` and pass it to the
+    functions that need it, ``mark_migration`` keeps it up to date.
+    ``columns`` are the columns of the schema_migrations table and
+    ``details`` the other columns of each version, e.g. its duration.
+    """
+
+    columns = ()
+
+    def __init__(self, *args, **kwargs):
+        super(MigrationState, self).__init__(*args, **kwargs)
+        self.details = {}
+
+    @classmethod
+    def load(cls, cursor, raise_error=True):
+        # ordered by applied, so the latest row of a version wins
+        rows = list(get_schema_versions(
+            cursor, versions_only=False, raise_error=raise_error,
+            order_by='applied'))
+        state = cls((i[0], i[1]) for i in rows)
+        state.columns = tuple(c[0] for c in cursor.description or ())
+        state.details = dict((i[0], dict(zip(state.columns[2:], i[2:])))
+                             for i in rows)
+        return state
+
+    def versions(self, include_deferred=True):
+        """Return the versions ordered by applied timestamp, deferred
+        versions last.
+        """
+        items = sorted(self.items(),
+                       key=lambda i: (i[1] is None, i[1], i[0]))
+        return [version for version, applied in items
+                if include_deferred or applied is not None]
+
+
 def get_pending_migrations(migration_directories, cursor, import_modules=False,
-                           up_to_version=None, include_defers=False):
-    migrated_versions = {i[0]: i[1]
-                         for i in get_schema_versions(
-                             cursor, versions_only=False)}
+                           up_to_version=None, include_defers=False,
+                           state=None):
+    if state is None:
+        state = MigrationState.load(cursor)
+    migrated_versions = state
 
     migrations = list(get_migrations(migration_directories,
                                      import_modules=True))
@@ -223,7 +776,7 @@ def get_pending_migrations(migration_directories, cursor, import_modules=False,
             migration = migration[:-1]
         deferred = is_deferred(version, mod, migrated_versions)
         if not deferred or include_defers:
-            if hasattr(mod, 'should_run'):
+            if is_repeat(mod):
                 # repeat migrations are always included
                 yield migration
             elif deferred and include_defers or \
@@ -231,6 +784,81 @@ def get_pending_migrations(migration_directories, cursor, import_modules=False,
                 yield migration
 
 
+def _fingerprint(versions):
+    versions = sorted(set(versions))
+    return (len(versions), versions[-1] if versions else None,
+            hashlib.md5(','.join(versions).encode('utf-8')).hexdigest())
+
+
+def get_schema_fingerprint(cursor):
+    """Return (count, max, md5) of the versions in schema_migrations, or
+    ``None`` if there is no schema_migrations table.
+    """
+    driver = get_driver()
+    try:
+        cursor.execute("""\
+            SELECT count(DISTINCT version), max(version),
+                   md5(coalesce(string_agg(DISTINCT version, ','
+                                           ORDER BY version), ''))
+            FROM schema_migrations""")
+    except driver.ProgrammingError as e:
+        cursor.connection.rollback()
+        logger.debug(str(e))
+        return None
+    return tuple(cursor.fetchone())
+
+
+def get_migrations_fingerprint(migration_directories):
+    """Return (count, max, md5) of the versions of the migration files."""
+    return _fingerprint(version for version, _ in
+                        get_migrations(migration_directories))
+
+
+def _should_run(cursor, migration):
+    cursor.execute('SAVEPOINT pre_should_run')
+    try:
+        return migration.should_run(wrap_cursor(cursor))
+    finally:
+        cursor.execute('ROLLBACK TO pre_should_run')
+        cursor.execute('RELEASE SAVEPOINT pre_should_run')
+
+
+def get_unapplied_migrations(migration_directories, cursor, state=None):
+    """Return (version, migration_name, migration) for the migrations that
+    "migrate" would run, except the repeat migrations that have already run
+    once.
+    """
+    if state is None:
+        state = MigrationState.load(cursor)
+    unapplied = []
+    for version, migration_name, migration in get_pending_migrations(
+            migration_directories, cursor, import_modules=True, state=state):
+        if is_repeat(migration) and (version in state or
+                                     not _should_run(cursor, migration)):
+            continue
+        unapplied.append((version, migration_name, migration))
+    return unapplied
+
+
+def is_up_to_date(cursor, migration_directories):
+    """Return whether all the migrations have been applied or deferred.
+
+    When the versions in schema_migrations are the versions of the
+    migration files, this only takes one query and a directory listing per
+    migrations directory.  Otherwise the migrations are inspected as in
+    ``get_unapplied_migrations``.
+    """
+    fingerprint = get_schema_fingerprint(cursor)
+    if fingerprint is None:
+        return False
+    if fingerprint == get_migrations_fingerprint(migration_directories):
+        return True
+    logger.debug('schema_migrations fingerprint {} does not match the '
+                 'migrations, looking for unapplied migrations'
+                 .format(fingerprint))
+    return not get_unapplied_migrations(migration_directories, cursor)
+
+
 def compare_schema(db_connection_string, callback, *args, **kwargs):
     old_schema = subprocess.check_output(
         ['pg_dump', '-s', db_connection_string]).decode('utf-8')
@@ -243,40 +871,195 @@ def compare_schema(db_connection_string, callback, *args, **kwargs):
                              n=10))).encode('utf-8'))
 
 
+@contextmanager
+def savepoint(cursor, name):
+    """Roll back to a savepoint called ``name`` if the block raises an
+    exception, release it otherwise.
+    """
+    cursor.execute('SAVEPOINT {}'.format(name))
+    try:
+        yield
+    except Exception:
+        cursor.execute('ROLLBACK TO SAVEPOINT {}'.format(name))
+        raise
+    cursor.execute('RELEASE SAVEPOINT {}'.format(name))
+
+
+@contextmanager
+def migration_lock(cursor, timeout=None, poll_interval=0.5):
+    """Hold the advisory lock serialising dbmigrator commands on a database
+    while in this context, waiting at most ``timeout`` seconds (forever if
+    None) for another dbmigrator to release it.
+
+    What the block did is committed before the lock is released, so the next
+    holder of the lock sees it.
+    """
+    start = time.time()
+    waiting = False
+    while True:
+        cursor.execute('SELECT pg_try_advisory_lock(%s)',
+                       (MIGRATION_LOCK_KEY,))
+        if cursor.fetchone()[0]:
+            break
+        if not waiting:
+            logger.info('Waiting for another dbmigrator to finish')
+            waiting = True
+        if timeout is not None and time.time() - start >= timeout:
+            raise Exception('Timed out waiting for the migration lock after '
+                            '{} seconds'.format(timeout))
+        time.sleep(poll_interval)
+    if waiting:
+        logger.debug('Acquired the migration lock after {:.1f} seconds'
+                     .format(time.time() - start))
+
+    # the lock is held by the session, which outlives the command when the
+    # connection is pooled, so it's released even if the block fails
+    try:
+        yield
+    except BaseException:
+        if not cursor.connection.closed:
+            cursor.connection.rollback()
+            _unlock_migrations(cursor)
+        raise
+    cursor.connection.commit()
+    _unlock_migrations(cursor)
+
+
+def _unlock_migrations(cursor):
+    cursor.execute('SELECT pg_advisory_unlock(%s)', (MIGRATION_LOCK_KEY,))
+    cursor.connection.commit()
+
+
+def with_migration_lock(func):
+    """Run the command holding the migration lock, for commands decorated
+    with ``with_cursor``.
+    """
+    @functools.wraps(func)
+    def wrapper(cursor, *args, **kwargs):
+        with migration_lock(cursor, kwargs.get('lock_wait_timeout')):
+            return func(cursor, *args, **kwargs)
+    return wrapper
+
+
 def run_migration(cursor, version, migration_name, migration,
-                  run_deferred=False):
+                  run_deferred=False, commit=True, state=None):
+    """Run ``migration`` unless it's deferred or its should_run is false,
+    and return its ``metrics.MigrationMetrics`` if it was run.
+    """
     if not run_deferred:
-        migrated_versions = dict(list(
-            get_schema_versions(cursor, versions_only=False,
-                                raise_error=False)))
-        if is_deferred(version, migration, migrated_versions):
+        if state is None:
+            state = MigrationState.load(cursor, raise_error=False)
+        if is_deferred(version, migration, state):
             logger.info('Skipping deferred migration {} {}'
                         .format(version, migration_name))
             return
 
-    try:
-        cursor.execute('SAVEPOINT pre_should_run')
-        if not migration.should_run(cursor):
+    migration_cursor = _MigrationCursor(wrap_cursor(cursor))
+    if is_repeat(migration):
+        with profiling.span('should_run', version=version):
+            cursor.execute('SAVEPOINT pre_should_run')
+            should_run = migration.should_run(migration_cursor)
+        if not should_run:
             logger.info('Skipping migration {} {}: should_run is false'
                         .format(version, migration_name))
             cursor.execute('ROLLBACK TO pre_should_run')
             cursor.execute('RELEASE SAVEPOINT pre_should_run')
             return
-    except AttributeError:
-        # not a repeat migration
-        pass
 
     logger.info('Running migration {} {}'.format(version, migration_name))
-    migration.up(cursor)
-    mark_migration(cursor, version, True)
-    cursor.connection.commit()
+    measure = metrics.measure(migration_cursor,
+                              get_settings().get('measure_memory'))
+    with profiling.span('up', version=version), _running_migration(version):
+        with measure as (measuring_cursor, migration_metrics):
+            _run_up(cursor, version, migration, measuring_cursor)
+    logger.debug('Migration {} {}: {}'.format(version, migration_name,
+                                              migration_metrics))
+    with profiling.span('bookkeeping', version=version):
+        mark_migration(cursor, version, True, state, _migration_details(
+            migration, migration_metrics, state))
+    if commit:
+        with profiling.span('commit', version=version):
+            cursor.connection.commit()
+    return migration_metrics
+
+
+def _get_timeouts(migration):
+    """Return the lock_timeout, statement_timeout and retries of
+    ``migration`` from its ``timeouts`` decorator or the settings.
+    """
+    settings = get_settings()
+    up = getattr(migration.up, 'dbmigrator_timeouts', {})
+    return [up.get(name) if up.get(name) is not None else settings.get(name)
+            for name in ('lock_timeout', 'statement_timeout', 'retries')]
+
+
+def _run_up(cursor, version, migration, migration_cursor):
+    """Run ``migration.up`` with its timeouts, retrying it from a savepoint
+    on a lock timeout, deadlock or serialization failure.  It can't commit
+    then.
+    """
+    lock_timeout, statement_timeout, retries = _get_timeouts(migration)
+    if lock_timeout is None and statement_timeout is None and not retries:
+        _call_migration(migration.up, migration_cursor)
+        return
+
+    timeouts = [(name, value) for name, value in (
+        ('lock_timeout', lock_timeout),
+        ('statement_timeout', statement_timeout)) if value is not None]
+    cursor.execute('SHOW lock_timeout')
+    previous = [('lock_timeout', cursor.fetchone()[0])]
+    cursor.execute('SHOW statement_timeout')
+    previous.append(('statement_timeout', cursor.fetchone()[0]))
+
+    driver = get_driver()
+    attempt = 0
+    while True:
+        cursor.execute('SAVEPOINT pre_up')
+        try:
+            for name, value in timeouts:
+                cursor.execute('SELECT set_config(%s, %s, true)',
+                               (name, str(value)))
+            # a commit would end the savepoint and the timeouts with it
+            with forbid_commits('with @timeouts, --lock-timeout, '
+                                '--statement-timeout or --retries'):
+                _call_migration(migration.up, migration_cursor)
+        except driver.Error as e:
+            if (driver.error_code(e) not in RETRY_ERRORS or
+                    attempt >= (retries or 0)):
+                raise
+            cursor.execute('ROLLBACK TO SAVEPOINT pre_up')
+            delay = min(RETRY_MAX_DELAY, RETRY_DELAY * 2 ** attempt)
+            delay = random.uniform(delay / 2, delay)
+            attempt += 1
+            logger.warning('Migration {} failed ({}), retrying in {:.1f}s '
+                           '({} of {})'.format(
+                               version, str(e).strip().splitlines()[0],
+                               delay, attempt, retries))
+            time.sleep(delay)
+        else:
+            break
+    cursor.execute('RELEASE SAVEPOINT pre_up')
+    # set_config(..., true) lasts until the end of the transaction
+    for name, value in previous:
+        cursor.execute('SELECT set_config(%s, %s, true)', (name, value))
 
 
-def rollback_migration(cursor, version, migration_name, migration):
+def rollback_migration(cursor, version, migration_name, migration,
+                       state=None):
     logger.info('Rolling back migration {} {}'.format(version, migration_name))
-    migration.down(cursor)
-    mark_migration(cursor, version, False)
-    cursor.connection.commit()
+    measure = metrics.measure(_MigrationCursor(wrap_cursor(cursor)),
+                              get_settings().get('measure_memory'))
+    with profiling.span('down', version=version), \
+            _running_migration(version):
+        with measure as (measuring_cursor, migration_metrics):
+            _call_migration(migration.down, measuring_cursor)
+    # the row is deleted, so the metrics are only logged
+    logger.debug('Rolled back migration {} {}: {}'.format(
+        version, migration_name, migration_metrics))
+    with profiling.span('bookkeeping', version=version):
+        mark_migration(cursor, version, False, state)
+    with profiling.span('commit', version=version):
+        cursor.connection.commit()
 
 
 def timestamp():
@@ -284,25 +1067,89 @@ def timestamp():
     return now.strftime('%Y%m%d%H%M%S')
 
 
-def mark_migration(cursor, version, completed):
-    if completed == 'deferred':
-        cursor.execute('INSERT INTO schema_migrations (version, applied) '
-                       'VALUES (%s, NULL)', (version,))
-    elif completed:
-        cursor.execute('INSERT INTO schema_migrations VALUES (%s)', (version,))
-    else:
+def _migration_details(migration, migration_metrics, state):
+    """Return the extra columns of schema_migrations to set after running
+    ``migration``, those the table has.
+    """
+    if state is None or 'checksum' not in state.columns:
+        return None
+    path = getattr(migration, 'path', None) or migration.__file__
+    if path.endswith('.pyc'):
+        path = path[:-1]
+    with open(path, 'rb') as f:
+        checksum = hashlib.sha1(f.read()).hexdigest()
+    details = {
+        'duration': datetime.timedelta(seconds=migration_metrics.duration),
+        'checksum': checksum,
+        'host': socket.gethostname(),
+        'db_time': datetime.timedelta(seconds=migration_metrics.db_time),
+        'row_count': migration_metrics.row_count,
+        'peak_memory': migration_metrics.peak_memory,
+        }
+    return dict((column, value) for column, value in details.items()
+                if column in state.columns)
+
+
+def mark_migration(cursor, version, completed, state=None, details=None):
+    """Mark ``version`` as completed (True), not completed (False) or
+    'deferred', updating ``state`` if given.  ``details`` sets the other
+    columns of schema_migrations, e.g. duration, checksum and host.
+    """
+    if not completed:
         cursor.execute('DELETE FROM schema_migrations WHERE version = %s',
                        (version,))
+    else:
+        details = dict(details or {}, version=version)
+        columns = sorted(c for c in details if c != 'version')
+        applied = completed == 'deferred' and 'NULL' or 'CURRENT_TIMESTAMP'
+        cursor.execute(
+            'UPDATE schema_migrations SET applied = {}{} '
+            'WHERE version = %(version)s RETURNING applied'.format(
+                applied, ''.join(', {0} = %({0})s'.format(c)
+                                 for c in columns)),
+            details)
+        rows = cursor.fetchall()
+        if not rows:
+            cursor.execute(
+                'INSERT INTO schema_migrations (version, applied{}) '
+                'VALUES (%(version)s, {}{}) RETURNING applied'.format(
+                    ''.join(', {}'.format(c) for c in columns), applied,
+                    ''.join(', %({})s'.format(c) for c in columns)),
+                details)
+            rows = cursor.fetchall()
+        applied = rows[0][0]
+    if state is not None:
+        if not completed:
+            state.pop(version, None)
+            state.details.pop(version, None)
+        else:
+            state[version] = applied
+            state.details[version] = dict(
+                (c, details[c]) for c in columns)
 
 
 def is_deferred(version, migration, migrated_versions):
-    # migrated versions: version -> applied timestamp
+    # migrated versions: version -> applied timestamp, e.g. MigrationState
     timestamp = migrated_versions.get(version, '')
     if timestamp == '':
-        return hasattr(migration.up, 'dbmigrator_deferred')
+        return _is_deferred_up(migration)
     elif timestamp is None:
         return True
-    elif hasattr(migration, 'should_run') and \
-            hasattr(migration.up, 'dbmigrator_deferred'):
+    elif is_repeat(migration) and _is_deferred_up(migration):
         return True
     return False
+
+
+def is_repeat(migration):
+    """Return whether ``migration`` is a repeat migration, i.e. it has
+    ``should_run``.
+    """
+    if isinstance(migration, LazyMigration):
+        return 'should_run' in migration.functions
+    return hasattr(migration, 'should_run')
+
+
+def _is_deferred_up(migration):
+    if isinstance(migration, LazyMigration):
+        return migration.dbmigrator_deferred
+    return hasattr(migration.up, 'dbmigrator_deferred')
@@ -15,6 +15,10 @@ install_requires = (
     'psycopg2>=2.7',
     )
 
+extras_require = {
+    'psycopg': ['psycopg>=3.1'],
+    }
+
 tests_require = [
     ]
 
@@ -50,6 +54,7 @@ setup(
     long_description=LONG_DESC,
     packages=find_packages(),
     install_requires=install_requires,
+    extras_require=extras_require,
     tests_require=tests_require,
     test_suite='dbmigrator.tests',
     include_package_data=True,
@@ -57,5 +62,8 @@ setup(
         'console_scripts': [
             'dbmigrator = dbmigrator.cli:main',
             ],
+        'pytest11': [
+            'dbmigrator = dbmigrator.pytest_plugin',
+            ],
         },
     )